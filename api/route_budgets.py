@@ -1,27 +1,49 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from typing import List
-from schemas.budget import BudgetCreate, BudgetResponse
+from typing import List, Optional
+from schemas.budget import BudgetCreate, BudgetResponse, BudgetStatus
 from models.budget import Budget
-from utils.dependencies import get_db, ensure_default_user, current_user_id
+from services.budget_service import get_budget_alerts, get_budget_statuses
+from utils.dependencies import get_db, get_current_user_id
+from app.ai import invalidate_user_cache
 
 router = APIRouter()
 
+@router.post("", response_model=BudgetResponse, include_in_schema=False)
 @router.post("/", response_model=BudgetResponse)
-def create_budget(budget: BudgetCreate, db: Session = Depends(get_db)):
-    ensure_default_user(db)
+def create_budget(budget: BudgetCreate, db: Session = Depends(get_db), user_id: int = Depends(get_current_user_id)):
     db_budget = Budget(
         category=budget.category,
         amount=budget.amount,
         month=budget.month,
-        user_id=current_user_id
+        user_id=user_id
     )
     db.add(db_budget)
     db.commit()
     db.refresh(db_budget)
+    invalidate_user_cache(user_id)
     return db_budget
 
+@router.get("", response_model=List[BudgetResponse], include_in_schema=False)
 @router.get("/", response_model=List[BudgetResponse])
-def get_budgets(db: Session = Depends(get_db)):
-    ensure_default_user(db)
-    return db.query(Budget).filter(Budget.user_id == current_user_id).all()
+def get_budgets(db: Session = Depends(get_db), user_id: int = Depends(get_current_user_id)):
+    return db.query(Budget).filter(Budget.user_id == user_id).all()
+
+MONTH_PATTERN = r"^\d{4}-(0[1-9]|1[0-2])$"
+
+@router.get("/status", response_model=List[BudgetStatus])
+def get_budget_status(
+    month: Optional[str] = Query(None, pattern=MONTH_PATTERN, description="YYYY-MM; all months when omitted"),
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    return get_budget_statuses(db, user_id, month)
+
+@router.get("/alerts", response_model=List[BudgetStatus])
+def get_budget_alerts_route(
+    threshold: float = Query(80, ge=0, description="Percent of the budget already spent"),
+    month: Optional[str] = Query(None, pattern=MONTH_PATTERN, description="YYYY-MM; defaults to the current month"),
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    return get_budget_alerts(db, user_id, threshold, month)
@@ -1,18 +1,103 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from schemas.expense import ExpenseCreate, ExpenseResponse
-from services.expense_crud import create_expense, get_user_expenses
-from utils.dependencies import get_db, ensure_default_user
+from typing import List, Optional
+from datetime import datetime
+from schemas.expense import ExpenseCreate, ExpenseResponse, ExpenseImportResponse
+from config.settings import config
+from services.expense_crud import create_expense, create_expense_async, get_user_expenses
+from services.expense_export import EXPORT_FORMATS, ExportUnavailableError, stream_export
+from services.expense_import import IMPORT_FORMATS, detect_format, import_expenses, read_csv_rows, read_ndjson_rows
+from utils.money import MAX_AMOUNT
+from utils.dependencies import get_db, get_async_db, get_current_user_id, get_current_user_id_async
+from app import ai
 
 router = APIRouter()
 
-@router.post("/", response_model=ExpenseResponse)
-def add_expense(expense: ExpenseCreate, db: Session = Depends(get_db)):
-    ensure_default_user(db)
-    return create_expense(db, expense)
+def add_expense(expense: ExpenseCreate, db: Session = Depends(get_db), user_id: int = Depends(get_current_user_id)):
+    return create_expense(db, expense, user_id)
+
+async def add_expense_async(
+    expense: ExpenseCreate,
+    db: AsyncSession = Depends(get_async_db),
+    user_id: int = Depends(get_current_user_id_async)
+):
+    return await create_expense_async(db, expense, user_id)
+
+def build_router() -> APIRouter:
+    """The expense routes, with POST / served sync or async per ASYNC_MODE at build time.
+
+    The collection is served at /expenses as well as /expenses/, as the
+    frontend calls it without the slash.
+    """
+    built = APIRouter()
+    for path in ("", "/"):
+        built.add_api_route(
+            path, add_expense_async if config["ASYNC_MODE"] else add_expense,
+            methods=["POST"], response_model=ExpenseResponse, include_in_schema=bool(path)
+        )
+    # Here rather than on `router`: include_router() without a prefix refuses an empty path
+    built.add_api_route("", list_expenses, methods=["GET"], response_model=List[ExpenseResponse], include_in_schema=False)
+    built.include_router(router)
+    return built
+
+@router.post("/import", response_model=ExpenseImportResponse)
+def import_expense_file(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, description="csv or ndjson; detected from the upload when omitted"),
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    file_format = format or detect_format(file.filename, file.content_type)
+    if file_format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{file_format}'")
+    reader = read_ndjson_rows if file_format == "ndjson" else read_csv_rows
+    try:
+        return import_expenses(db, reader(file.file), user_id, ai.model)
+    except UnicodeDecodeError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Upload must be UTF-8 encoded")
 
 @router.get("/", response_model=List[ExpenseResponse])
-def list_expenses(db: Session = Depends(get_db)):
-    ensure_default_user(db)
-    return get_user_expenses(db)
+def list_expenses(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    category: Optional[str] = None,
+    min_amount: Optional[float] = Query(None, gt=-MAX_AMOUNT, lt=MAX_AMOUNT),
+    max_amount: Optional[float] = Query(None, gt=-MAX_AMOUNT, lt=MAX_AMOUNT),
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    try:
+        expenses, next_cursor = get_user_expenses(
+            db, user_id, limit, cursor, start, end, category, min_amount, max_amount
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return expenses
+
+@router.get("/export", response_class=StreamingResponse)
+def export_expenses(
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet|arrow)$", description="parquet and arrow need pyarrow"),
+    start: Optional[datetime] = Query(None, description="Inclusive"),
+    end: Optional[datetime] = Query(None, description="Exclusive"),
+    category: Optional[str] = None,
+    user_id: int = Depends(get_current_user_id)
+):
+    """Every matching expense, oldest first, streamed in constant memory."""
+    try:
+        body = stream_export(user_id, format, start, end, category)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExportUnavailableError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    media_type, extension = EXPORT_FORMATS[format]
+    return StreamingResponse(body, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="expenses.{extension}"'
+    })
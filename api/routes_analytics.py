@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from services.analytics import get_spending_analytics
+from utils.dependencies import get_db, get_current_user_id
+
+router = APIRouter()
+
+@router.get("", include_in_schema=False)
+@router.get("/")
+def get_analytics(
+    bucket: str = Query("day", pattern="^(day|week|month)$", description="Weeks start on Monday"),
+    start: Optional[datetime] = Query(None, description="Inclusive; rounded down to its bucket. Default: 30 days, 12 weeks or 12 months before end"),
+    end: Optional[datetime] = Query(None, description="Exclusive; rounded up to a bucket boundary. Default: end of the current bucket"),
+    category: Optional[str] = None,
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Spending per bucket and per category, as arrays aligned with `periods`."""
+    try:
+        return get_spending_analytics(db, user_id, bucket, start, end, category)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,12 +1,56 @@
 from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from config.settings import config
 from schemas.chat import ChatMessage, ChatResponse
-from services.chat_service import chat_with_ai_service
-from utils.dependencies import get_db, ensure_default_user
+from services.chat_service import (
+    build_chat_context, chat_with_ai_service, chat_with_ai_service_async,
+    stream_chat_events, stream_chat_events_async
+)
+from utils.dependencies import chat_rate_limit, get_db, get_async_db, get_current_user_id, get_current_user_id_async
 
-router = APIRouter()
+def chat_with_ai(message: ChatMessage, db: Session = Depends(get_db), user_id: int = Depends(get_current_user_id)):
+    return chat_with_ai_service(message.message, db, user_id)
 
-@router.post("/", response_model=ChatResponse)
-def chat_with_ai(message: ChatMessage, db: Session = Depends(get_db)):
-    ensure_default_user(db)
-    return chat_with_ai_service(message.message, db)
+async def chat_with_ai_async(
+    message: ChatMessage,
+    db: AsyncSession = Depends(get_async_db),
+    user_id: int = Depends(get_current_user_id_async)
+):
+    return await chat_with_ai_service_async(message.message, db, user_id)
+
+# Streaming variant: tokens as Server-Sent Events, then the insights
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def chat_with_ai_stream(
+    message: ChatMessage,
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    built = build_chat_context(message.message, db, user_id)
+    return StreamingResponse(stream_chat_events(built, user_id), media_type="text/event-stream", headers=SSE_HEADERS)
+
+async def chat_with_ai_stream_async(
+    message: ChatMessage,
+    db: AsyncSession = Depends(get_async_db),
+    user_id: int = Depends(get_current_user_id_async)
+):
+    built = await db.run_sync(lambda session: build_chat_context(message.message, session, user_id))
+    return StreamingResponse(
+        stream_chat_events_async(built, user_id), media_type="text/event-stream", headers=SSE_HEADERS
+    )
+
+def build_router() -> APIRouter:
+    """The chat routes, served sync or async per ASYNC_MODE at build time."""
+    router = APIRouter()
+    for path in ("", "/"):
+        router.add_api_route(
+            path, chat_with_ai_async if config["ASYNC_MODE"] else chat_with_ai, methods=["POST"],
+            response_model=ChatResponse, dependencies=[Depends(chat_rate_limit)], include_in_schema=bool(path)
+        )
+    router.add_api_route(
+        "/stream", chat_with_ai_stream_async if config["ASYNC_MODE"] else chat_with_ai_stream,
+        methods=["POST"], response_class=StreamingResponse, dependencies=[Depends(chat_rate_limit)]
+    )
+    return router
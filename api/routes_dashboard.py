@@ -1,11 +1,11 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from utils.dependencies import get_db, ensure_default_user
+from utils.dependencies import get_db, get_current_user_id
 from services.dashboard_service import get_dashboard_service
 
 router = APIRouter()
 
+@router.get("", include_in_schema=False)
 @router.get("/")
-def get_dashboard(db: Session = Depends(get_db)):
-    ensure_default_user(db)
-    return get_dashboard_service(db)
+def get_dashboard(db: Session = Depends(get_db), user_id: int = Depends(get_current_user_id)):
+    return get_dashboard_service(db, user_id)
@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from app import ai, jobs
+
+router = APIRouter()
+
+@router.get("/cache")
+def get_cache_stats():
+    return ai.llm_cache.stats()
+
+@router.get("/ai")
+def get_ai_status():
+    return ai.ai_status()
+
+@router.get("/jobs")
+def get_job_status():
+    if jobs.job_runner is None:
+        return {"backend": "none"}
+    return jobs.job_runner.stats()
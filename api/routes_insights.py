@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from services.spending_patterns import get_spending_patterns
+from utils.dependencies import get_db, get_current_user_id
+
+router = APIRouter()
+
+@router.get("", include_in_schema=False)
+@router.get("/")
+def get_insights(
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Recurring charges, unusual expenses and category spikes across the user's whole history."""
+    return get_spending_patterns(db, user_id)
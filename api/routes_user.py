@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from utils.dependencies import get_db, ensure_default_user
+from utils import dependencies
+from utils.dependencies import get_db, provision_user, requested_user_id
 
 router = APIRouter()
 
 @router.post("/init")
-def init_user(db: Session = Depends(get_db)):
-    return ensure_default_user(db)
+def init_user(db: Session = Depends(get_db), user_id: int = Depends(requested_user_id)):
+    user = provision_user(db, user_id)
+    dependencies.user_cache.add(user.id)
+    return user
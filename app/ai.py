@@ -1,38 +1,415 @@
-import google.generativeai as genai
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict, defaultdict
+from typing import Optional
 from config.settings import config
+from app import state
+from app.guard import CircuitBreaker, GuardedModel
+from app.metrics import InstrumentedModel
+from app.providers import LLMResponse, build_provider
 
-# Configure Google AI
-api_key = config["GOOGLE_AI_API_KEY"]
-if not api_key:
-    print("GOOGLE_AI_API_KEY not found in environment variables")
-    model = None
-else:
-    try:
-        genai.configure(api_key=api_key)
-        
-        # Try different model names that are currently available
-        model_names = [
-            'gemini-1.5-flash',
-            'gemini-1.5-pro',
-            'gemini-1.0-pro'
-        ]
-        
-        model = None
-        for model_name in model_names:
+logger = logging.getLogger(__name__)
+
+
+class LLMBusyError(RuntimeError):
+    """Raised when no LLM slot frees up within LLM_QUEUE_TIMEOUT."""
+
+
+class ConcurrencyLimitedModel:
+    """Wraps an LLMProvider so at most `limit` calls run at once.
+
+    Callers that cannot get a slot in time fail fast with LLMBusyError and
+    take their existing fallback, instead of tying up workers that cheap
+    requests need.
+    """
+
+    def __init__(self, model, limit: int, queue_timeout: float):
+        self.model = model
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(limit)
+        self._async_slots = weakref.WeakKeyDictionary()
+
+    @property
+    def model_name(self):
+        return self.model.model_name
+
+    def generate_content(self, contents, **kwargs):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise LLMBusyError(f"All {self.limit} LLM slots busy")
+        try:
+            return self.model.generate_content(contents, **kwargs)
+        finally:
+            self._slots.release()
+
+    def stream_content(self, contents, **kwargs):
+        """Yield response text chunks, holding a slot until the stream ends."""
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise LLMBusyError(f"All {self.limit} LLM slots busy")
+        try:
+            for chunk in self.model.generate_content(contents, stream=True, **kwargs):
+                yield chunk.text
+        finally:
+            self._slots.release()
+
+    def _loop_slots(self) -> asyncio.Semaphore:
+        # asyncio primitives are bound to the loop that first uses them
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_slots:
+            self._async_slots[loop] = asyncio.Semaphore(self.limit)
+        return self._async_slots[loop]
+
+    async def generate_content_async(self, contents, **kwargs):
+        slots = self._loop_slots()
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise LLMBusyError(f"All {self.limit} LLM slots busy")
+        try:
+            return await self.model.generate_content_async(contents, **kwargs)
+        finally:
+            slots.release()
+
+    async def stream_content_async(self, contents, **kwargs):
+        slots = self._loop_slots()
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise LLMBusyError(f"All {self.limit} LLM slots busy")
+        try:
+            response = await self.model.generate_content_async(contents, stream=True, **kwargs)
+            async for chunk in response:
+                yield chunk.text
+        finally:
+            slots.release()
+
+
+class MemoryLRUCache:
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value, tag)
+        self._tags = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: str, tag: Optional[str] = None):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + self.ttl, value, tag)
+            if tag:
+                self._tags[tag].add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, tag: str) -> int:
+        with self._lock:
+            keys = self._tags.pop(tag, set())
+            for key in keys:
+                self._entries.pop(key, None)
+            return len(keys)
+
+    def _remove(self, key: str):
+        _, _, tag = self._entries.pop(key)
+        if tag:
+            self._tags[tag].discard(key)
+            if not self._tags[tag]:
+                del self._tags[tag]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class NullCache:
+    """Backend for LLM_CACHE_BACKEND=none: stores nothing, so every lookup misses."""
+
+    max_entries = 0
+    ttl = 0
+    evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        return None
+
+    def set(self, key: str, value: str, tag: Optional[str] = None):
+        pass
+
+    def invalidate(self, tag: str) -> int:
+        return 0
+
+    def __len__(self):
+        return 0
+
+
+class SQLiteCache:
+    """Cache entries in a SQLite file so they survive restarts."""
+
+    def __init__(self, path: str, max_entries: int, ttl: float):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._writes = 0
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, tag TEXT, "
+                "expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_tag ON llm_cache (tag)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_last_used ON llm_cache (last_used)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value FROM llm_cache WHERE key = ? AND expires_at >= ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key: str, value: str, tag: Optional[str] = None):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, tag, expires_at, last_used) VALUES (?, ?, ?, ?, ?)",
+            (key, value, tag, now + self.ttl, now),
+        )
+        self._writes += 1
+        # Prune every so often rather than on every write
+        if self._writes % 100 == 0:
+            self.prune()
+
+    def prune(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+        overflow = len(self) - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY last_used LIMIT ?)", (overflow,)
+            )
+            self.evictions += overflow
+
+    def invalidate(self, tag: str) -> int:
+        return self._connect().execute("DELETE FROM llm_cache WHERE tag = ?", (tag,)).rowcount
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+class LLMCache:
+    """Response cache keyed on (model name, normalized prompt), with hit/miss counters."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(model_name: str, prompt: str, generation: int = 0) -> str:
+        normalized = " ".join(prompt.split()).casefold()
+        return hashlib.sha256(f"{model_name}\0{generation}\0{normalized}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: str, tag: Optional[str] = None):
+        self.backend.set(key, value, tag)
+
+    def invalidate(self, tag: str):
+        self.invalidations += self.backend.invalidate(tag)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "max_entries": self.backend.max_entries,
+            "ttl_seconds": self.backend.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.backend.evictions,
+            "invalidated_entries": self.invalidations,
+        }
+
+
+def user_cache_tag(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+class CachedModel:
+    """Serves repeated prompts from an LLMCache before calling the wrapped model.
+
+    Pass cache_tag for answers that depend on user data. The tag's shared
+    generation is part of the key, so invalidate_user_cache() in any worker
+    process makes them miss everywhere.
+    """
+
+    def __init__(self, model, cache: LLMCache):
+        self.model = model
+        self.cache = cache
+
+    @property
+    def model_name(self):
+        return self.model.model_name
+
+    def _key(self, contents: str, cache_tag: Optional[str]) -> str:
+        generation = state.shared_state.generation(cache_tag) if cache_tag else 0
+        return self.cache.key(self.model_name, contents, generation)
+
+    def generate_content(self, contents: str, cache_tag: Optional[str] = None, **kwargs):
+        key = self._key(contents, cache_tag)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return LLMResponse(cached)
+        response = self.model.generate_content(contents, **kwargs)
+        self.cache.set(key, response.text, cache_tag)
+        return response
+
+    async def generate_content_async(self, contents: str, cache_tag: Optional[str] = None, **kwargs):
+        key = self._key(contents, cache_tag)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return LLMResponse(cached)
+        response = await self.model.generate_content_async(contents, **kwargs)
+        self.cache.set(key, response.text, cache_tag)
+        return response
+
+    def stream_content(self, contents: str, cache_tag: Optional[str] = None, **kwargs):
+        key = self._key(contents, cache_tag)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        for text in self.model.stream_content(contents, **kwargs):
+            parts.append(text)
+            yield text
+        self.cache.set(key, "".join(parts), cache_tag)
+
+    async def stream_content_async(self, contents: str, cache_tag: Optional[str] = None, **kwargs):
+        key = self._key(contents, cache_tag)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        async for text in self.model.stream_content_async(contents, **kwargs):
+            parts.append(text)
+            yield text
+        self.cache.set(key, "".join(parts), cache_tag)
+
+
+def build_cache() -> LLMCache:
+    backend = config["LLM_CACHE_BACKEND"]
+    if backend == "none":
+        return LLMCache(NullCache())
+    if backend == "sqlite":
+        return LLMCache(SQLiteCache(config["LLM_CACHE_PATH"], config["LLM_CACHE_MAX_ENTRIES"], config["LLM_CACHE_TTL"]))
+    return LLMCache(MemoryLRUCache(config["LLM_CACHE_MAX_ENTRIES"], config["LLM_CACHE_TTL"]))
+
+
+# Set by init_ai(); read them as attributes of this module (ai.model), not by import
+llm_cache = LLMCache(NullCache())
+provider = None
+guard: Optional[GuardedModel] = None
+model = None
+
+
+def init_ai():
+    """Build the provider, the model wrapper chain and the response cache from config.
+
+    Cheap and offline: providers configure their client on first call.
+    """
+    global llm_cache, provider, guard, model
+    llm_cache = build_cache()
+    provider = build_provider()
+    if provider is None:
+        guard = model = None
+        return
+    guard = GuardedModel(
+        InstrumentedModel(ConcurrencyLimitedModel(provider, config["LLM_MAX_CONCURRENCY"], config["LLM_QUEUE_TIMEOUT"])),
+        CircuitBreaker(config["LLM_BREAKER_FAILURES"], config["LLM_BREAKER_RESET_SECONDS"]),
+        config["LLM_TIMEOUT_SECONDS"],
+    )
+    model = CachedModel(guard, llm_cache)
+
+
+def invalidate_user_cache(user_id: int):
+    """Drop cached answers built from this user's expenses or budgets, in every worker."""
+    tag = user_cache_tag(user_id)
+    state.shared_state.bump(tag)
+    # Entries under the old generation can no longer hit; free them here at least
+    llm_cache.invalidate(tag)
+
+
+_probe_thread = None
+
+
+def start_health_probe():
+    """Probe model availability in a daemon thread; repeats every AI_HEALTH_INTERVAL seconds."""
+    global _probe_thread
+    if provider is None or (_probe_thread and _probe_thread.is_alive()):
+        return
+
+    def run():
+        while True:
             try:
-                test_model = genai.GenerativeModel(model_name)
-                test_response = test_model.generate_content("Hello")
-                print(f"Success with {model_name}: {test_response.text[:50]}...")
-                model = test_model
-                break
+                provider.probe()
             except Exception as e:
-                print(f"Model {model_name} failed: {e}")
-                continue
-        
-        if model:
-            print("Google AI configured successfully")
-        else:
-            print("All model attempts failed")
-    except Exception as e:
-        print(f"Error configuring Google AI: {e}")
-        model = None
+                logger.warning("AI health probe failed", extra={"error": str(e)})
+            if config["AI_HEALTH_INTERVAL"] <= 0:
+                return
+            time.sleep(config["AI_HEALTH_INTERVAL"])
+
+    _probe_thread = threading.Thread(target=run, name="ai-health-probe", daemon=True)
+    _probe_thread.start()
+
+
+def ai_status() -> dict:
+    return {
+        "configured": provider is not None,
+        "provider": provider.name if provider else config["LLM_PROVIDER"],
+        "active_model": provider.model_name if provider else None,
+        **(provider.health.snapshot() if provider else {}),
+        "guard": guard.stats() if guard else None,
+    }
+
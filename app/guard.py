@@ -0,0 +1,255 @@
+"""Guard layer between the response cache and the model.
+
+For every call that misses the cache, GuardedModel
+1. coalesces it with an identical prompt already in flight (the followers
+   share the leader's answer and spend nothing),
+2. takes a token from the caller's bucket and from the global one
+   (shared state, so the limits hold across workers),
+3. asks the circuit breaker, which fails fast while the provider is
+   unhealthy, and
+4. calls the model with LLM_TIMEOUT_SECONDS as its deadline.
+
+Rejections raise LLMGuardError subclasses, which callers treat like any
+other model failure: chat answers with its apology, categorization keeps
+the local result and background jobs retry with backoff.
+"""
+import asyncio
+import threading
+import time
+import weakref
+from collections import Counter
+from concurrent.futures import Future
+from typing import Dict, Optional
+from config.settings import config
+from app import state
+
+
+class LLMGuardError(RuntimeError):
+    """The call was refused before reaching the model."""
+
+
+class LLMRateLimitedError(LLMGuardError):
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__(f"LLM rate limit reached ({scope}); retry in {retry_after:.1f}s")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(LLMGuardError):
+    """The breaker is open: recent calls failed, so this one is not attempted."""
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures; after
+    `reset_timeout` seconds one trial call is let through (half-open) and its
+    outcome closes or re-opens the circuit.
+
+    State is per process: each worker notices an outage from its own calls.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.CLOSED or (self.state == self.HALF_OPEN and not self._trial_running):
+                self._trial_running = self.state == self.HALF_OPEN
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def release_trial(self):
+        """End a half-open trial without judging the provider; the next call becomes the trial."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self, error: Exception):
+        with self._lock:
+            self.failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"[:200]
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry_in = None
+            if self.state == self.OPEN:
+                retry_in = round(max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)), 1)
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "failure_threshold": self.failure_threshold,
+                "retry_in_seconds": retry_in,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+                "last_error": self.last_error,
+            }
+
+
+def _counts_as_failure(error: Exception) -> bool:
+    # A full local queue (LLMBusyError) is our own back-pressure, not a sick provider
+    return type(error).__name__ != "LLMBusyError"
+
+
+class GuardedModel:
+    """Coalescing, per-user and global token buckets, and a circuit breaker around a model.
+
+    Takes `user_id` on every call (None for work not done for one user,
+    which only draws on the global bucket).
+    """
+
+    def __init__(self, model, breaker: CircuitBreaker, timeout: Optional[float]):
+        self.model = model
+        self.breaker = breaker
+        self.timeout = timeout
+        self.counts = Counter()
+        self._inflight: Dict[str, Future] = {}
+        self._async_inflight = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @property
+    def model_name(self):
+        return self.model.model_name
+
+    def _admit(self, user_id: Optional[int]):
+        """Spend rate-limit tokens and pass the breaker, or raise."""
+        buckets = []
+        if user_id is not None and config["LLM_USER_RATE_PER_MINUTE"] > 0:
+            buckets.append(("user", f"llm:user:{user_id}", config["LLM_USER_RATE_PER_MINUTE"], config["LLM_USER_RATE_BURST"]))
+        if config["LLM_GLOBAL_RATE_PER_MINUTE"] > 0:
+            buckets.append(("global", "llm:global", config["LLM_GLOBAL_RATE_PER_MINUTE"], config["LLM_GLOBAL_RATE_BURST"]))
+        for scope, key, per_minute, burst in buckets:
+            wait = state.shared_state.take(key, per_minute / 60, burst)
+            if wait:
+                self.counts[f"rate_limited_{scope}"] += 1
+                raise LLMRateLimitedError(scope, wait)
+        if not self.breaker.allow():
+            self.counts["circuit_open"] += 1
+            raise CircuitOpenError("LLM circuit breaker is open")
+
+    def _record(self, error: Optional[Exception]):
+        if error is None:
+            self.breaker.record_success()
+            return
+        if isinstance(error, TimeoutError):
+            self.counts["timeouts"] += 1
+        if _counts_as_failure(error):
+            self.breaker.record_failure(error)
+        else:
+            self.breaker.release_trial()
+
+    def _call(self, contents, user_id, **kwargs):
+        self._admit(user_id)
+        try:
+            response = self.model.generate_content(contents, timeout=self.timeout, **kwargs)
+        except Exception as e:
+            self._record(e)
+            raise
+        self._record(None)
+        return response
+
+    def generate_content(self, contents, user_id: Optional[int] = None, **kwargs):
+        if kwargs:
+            return self._call(contents, user_id, **kwargs)
+        with self._lock:
+            leader = self._inflight.get(contents)
+            if leader is None:
+                future = self._inflight[contents] = Future()
+        if leader is not None:
+            self.counts["coalesced"] += 1
+            return leader.result()
+        try:
+            response = self._call(contents, user_id)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[contents]
+
+    async def _call_async(self, contents, user_id, **kwargs):
+        # The token bucket may touch SQLite; keep it off the event loop
+        await asyncio.to_thread(self._admit, user_id)
+        try:
+            response = await self.model.generate_content_async(contents, timeout=self.timeout, **kwargs)
+        except Exception as e:
+            self._record(e)
+            raise
+        self._record(None)
+        return response
+
+    async def generate_content_async(self, contents, user_id: Optional[int] = None, **kwargs):
+        if kwargs:
+            return await self._call_async(contents, user_id, **kwargs)
+        inflight = self._async_inflight.setdefault(asyncio.get_running_loop(), {})
+        leader = inflight.get(contents)
+        if leader is not None:
+            self.counts["coalesced"] += 1
+            # shield: a follower that gives up must not cancel the leader's call
+            return await asyncio.shield(leader)
+        task = inflight[contents] = asyncio.ensure_future(self._call_async(contents, user_id))
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if inflight.get(contents) is task:
+                del inflight[contents]
+
+    def stream_content(self, contents, user_id: Optional[int] = None, **kwargs):
+        self._admit(user_id)
+        error = None
+        try:
+            yield from self.model.stream_content(contents, timeout=self.timeout, **kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # Also runs when the client goes away mid-stream, so a half-open trial always ends
+            self._record(error)
+
+    async def stream_content_async(self, contents, user_id: Optional[int] = None, **kwargs):
+        await asyncio.to_thread(self._admit, user_id)
+        error = None
+        try:
+            async for text in self.model.stream_content_async(contents, timeout=self.timeout, **kwargs):
+                yield text
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._record(error)
+
+    def stats(self) -> dict:
+        return {
+            "breaker": self.breaker.snapshot(),
+            "timeout_seconds": self.timeout,
+            "coalesced": self.counts["coalesced"],
+            "timeouts": self.counts["timeouts"],
+            "rejected": {
+                reason: self.counts[reason] for reason in ("rate_limited_user", "rate_limited_global", "circuit_open")
+            },
+        }
@@ -0,0 +1,325 @@
+"""In-process background jobs: a queue, a worker pool and retry with backoff.
+
+Handlers are registered per job kind and receive micro-batches, so slow work
+such as LLM categorization is done with one call per batch rather than
+per request. The queue is in memory by default; JOB_QUEUE_BACKEND=sqlite
+keeps jobs in a file so they survive restarts and are shared by every
+worker process.
+"""
+import heapq
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+from config.settings import config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    kind: str
+    payload: dict
+    attempts: int = 0
+    id: Optional[int] = None
+    last_error: Optional[str] = field(default=None, compare=False)
+
+
+class MemoryJobQueue:
+    """Jobs ordered by the time they become runnable; lost on restart."""
+
+    durable = False
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def put(self, job: Job, delay: float = 0.0):
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), job))
+            self._cond.notify()
+
+    def retry(self, job: Job, delay: float):
+        self.put(job, delay)
+
+    def complete(self, jobs: List[Job]):
+        pass
+
+    def take(self, max_items: int, timeout: float, linger: float) -> List[Job]:
+        """Block until a job is runnable, then wait up to `linger` seconds for a fuller batch."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._ready_count():
+                wait = deadline - time.monotonic()
+                if wait <= 0:
+                    return []
+                next_ready = self._heap[0][0] - time.monotonic() if self._heap else wait
+                self._cond.wait(min(wait, max(next_ready, 0.01)))
+            fill_by = time.monotonic() + linger
+            while self._ready_count() < max_items and time.monotonic() < fill_by:
+                self._cond.wait(fill_by - time.monotonic())
+            jobs = []
+            while self._heap and len(jobs) < max_items and self._heap[0][0] <= time.monotonic():
+                jobs.append(heapq.heappop(self._heap)[2])
+            return jobs
+
+    def _ready_count(self) -> int:
+        now = time.monotonic()
+        return sum(1 for ready_at, _, _ in self._heap if ready_at <= now)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+class SQLiteJobQueue:
+    """Jobs in a SQLite file, shared by every worker process that opens it.
+
+    A claim is a lease: `claimed` holds the time it runs out (0 when
+    unclaimed), so jobs held by a worker that died become runnable again
+    without a restart resetting claims other live workers still hold.
+    """
+
+    durable = True
+    POLL_SECONDS = 0.5
+
+    def __init__(self, path: str, lease: float = 300.0):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.lease = lease
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, ready_at REAL NOT NULL, "
+            "claimed INTEGER NOT NULL DEFAULT 0, last_error TEXT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_ready ON jobs (claimed, ready_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def put(self, job: Job, delay: float = 0.0):
+        self._connect().execute(
+            "INSERT INTO jobs (kind, payload, attempts, ready_at) VALUES (?, ?, ?, ?)",
+            (job.kind, json.dumps(job.payload), job.attempts, time.time() + delay),
+        )
+        with self._cond:
+            self._cond.notify()
+
+    def retry(self, job: Job, delay: float):
+        self._connect().execute(
+            "UPDATE jobs SET claimed = 0, attempts = ?, ready_at = ?, last_error = ? WHERE id = ?",
+            (job.attempts, time.time() + delay, job.last_error, job.id),
+        )
+
+    def complete(self, jobs: List[Job]):
+        self._connect().executemany("DELETE FROM jobs WHERE id = ?", [(job.id,) for job in jobs])
+
+    def _claim(self, max_items: int) -> List[Job]:
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Expired leases belong to workers that died mid-batch; handlers are idempotent
+            rows = conn.execute(
+                "SELECT id, kind, payload, attempts, last_error FROM jobs "
+                "WHERE claimed < ? AND ready_at <= ? ORDER BY ready_at LIMIT ?",
+                (now, now, max_items),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET claimed = ? WHERE id = ?", [(now + self.lease, row[0]) for row in rows]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [Job(kind, json.loads(payload), attempts, job_id, error) for job_id, kind, payload, attempts, error in rows]
+
+    def take(self, max_items: int, timeout: float, linger: float) -> List[Job]:
+        deadline = time.monotonic() + timeout
+        while True:
+            if self._ready_count():
+                # Give a burst of writes a moment to arrive so it shares one batch
+                if linger and self._ready_count() < max_items:
+                    time.sleep(linger)
+                jobs = self._claim(max_items)
+                if jobs:
+                    return jobs
+            wait = deadline - time.monotonic()
+            if wait <= 0:
+                return []
+            # Other processes may enqueue too, so poll as well as wait for local puts
+            with self._cond:
+                self._cond.wait(min(wait, self.POLL_SECONDS))
+
+    def _ready_count(self) -> int:
+        now = time.time()
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM jobs WHERE claimed < ? AND ready_at <= ?", (now, now)
+        ).fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+
+class JobRunner:
+    """Worker threads that feed micro-batches of each job kind to its handler.
+
+    A handler takes a list of payloads. If it raises, every job in the batch
+    is retried with exponential backoff until it reaches max_attempts. Then
+    the kind's give-up hook (if any) is called with the payloads.
+    """
+
+    def __init__(self, queue, workers: int, batch_size: int, linger: float,
+                 max_attempts: int, retry_base: float, retry_max: float):
+        self.queue = queue
+        self.workers = workers
+        self.batch_size = batch_size
+        self.linger = linger
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.handlers: Dict[str, Callable[[List[dict]], None]] = {}
+        self.give_up: Dict[str, Callable[[List[dict]], None]] = {}
+        self.counts = Counter()
+        self.recent_errors = deque(maxlen=10)
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def register(self, kind: str, handler: Callable[[List[dict]], None],
+                 give_up: Optional[Callable[[List[dict]], None]] = None):
+        self.handlers[kind] = handler
+        if give_up:
+            self.give_up[kind] = give_up
+
+    def submit(self, kind: str, payload: dict):
+        self.queue.put(Job(kind, payload))
+        self._count("submitted")
+
+    def backoff(self, attempts: int) -> float:
+        return min(self.retry_base * 2 ** (attempts - 1), self.retry_max)
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self.counts[key] += n
+
+    def run_batch(self, jobs: List[Job]):
+        by_kind: Dict[str, List[Job]] = {}
+        for job in jobs:
+            by_kind.setdefault(job.kind, []).append(job)
+        for kind, batch in by_kind.items():
+            started = time.perf_counter()
+            try:
+                self.handlers[kind]([job.payload for job in batch])
+            except Exception as e:
+                self._failed(kind, batch, f"{type(e).__name__}: {e}")
+                continue
+            self.queue.complete(batch)
+            self._count("batches")
+            self._count("completed", len(batch))
+            self._count("busy_ms", int((time.perf_counter() - started) * 1000))
+
+    def _failed(self, kind: str, batch: List[Job], error: str):
+        logger.warning("Background batch failed", extra={"kind": kind, "jobs": len(batch), "error": error})
+        self.recent_errors.append({"kind": kind, "error": error, "at": time.time()})
+        exhausted = []
+        for job in batch:
+            job.attempts += 1
+            job.last_error = error
+            if job.attempts >= self.max_attempts:
+                exhausted.append(job)
+            else:
+                self.queue.retry(job, self.backoff(job.attempts))
+                self._count("retried")
+        if exhausted:
+            self.queue.complete(exhausted)
+            self._count("gave_up", len(exhausted))
+            if kind in self.give_up:
+                try:
+                    self.give_up[kind]([job.payload for job in exhausted])
+                except Exception as e:
+                    logger.exception("Background give-up hook failed", extra={"kind": kind})
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                jobs = self.queue.take(self.batch_size, timeout=1.0, linger=self.linger)
+            except Exception as e:
+                logger.exception("Job queue read failed")
+                time.sleep(1)
+                continue
+            if jobs:
+                self.run_batch(jobs)
+
+    def start(self):
+        if any(thread.is_alive() for thread in self._threads):
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"job-worker-{n}", daemon=True)
+            for n in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        return {
+            "backend": type(self.queue).__name__,
+            "workers_alive": sum(thread.is_alive() for thread in self._threads),
+            "queued": len(self.queue),
+            **{key: counts.get(key, 0) for key in ("submitted", "completed", "batches", "retried", "gave_up")},
+            "avg_batch_ms": round(counts.get("busy_ms", 0) / counts["batches"], 1) if counts.get("batches") else None,
+            "recent_errors": list(self.recent_errors),
+        }
+
+
+def build_job_runner() -> Optional[JobRunner]:
+    backend = config["JOB_QUEUE_BACKEND"]
+    if backend == "none":
+        return None
+    if backend == "sqlite":
+        queue = SQLiteJobQueue(config["JOB_QUEUE_PATH"], config["JOB_LEASE_SECONDS"])
+    else:
+        queue = MemoryJobQueue()
+    return JobRunner(
+        queue,
+        workers=config["JOB_WORKERS"],
+        batch_size=config["JOB_BATCH_SIZE"],
+        linger=config["JOB_BATCH_WAIT_MS"] / 1000,
+        max_attempts=config["JOB_MAX_ATTEMPTS"],
+        retry_base=config["JOB_RETRY_BASE_SECONDS"],
+        retry_max=config["JOB_RETRY_MAX_SECONDS"],
+    )
+
+
+# Set by init_job_runner() at app startup; None when JOB_QUEUE_BACKEND=none (or
+# outside the server, e.g. manage.py), and slow work then runs inline
+job_runner: Optional[JobRunner] = None
+
+
+def init_job_runner() -> Optional[JobRunner]:
+    global job_runner
+    job_runner = build_job_runner()
+    return job_runner
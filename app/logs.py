@@ -0,0 +1,46 @@
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+from config.settings import config
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in _RECORD_FIELDS})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extra = " ".join(f"{k}={v}" for k, v in vars(record).items() if k not in _RECORD_FIELDS)
+        return f"{line} {extra}" if extra else line
+
+
+def configure_logging():
+    """Route the app's loggers to stderr in LOG_FORMAT; safe to call more than once."""
+    handler = logging.StreamHandler(sys.stderr)
+    if config["LOG_FORMAT"] == "text":
+        handler.setFormatter(TextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    else:
+        handler.setFormatter(JSONFormatter())
+    root = logging.getLogger()
+    for existing in [h for h in root.handlers if getattr(h, "_finance_app", False)]:
+        root.removeHandler(existing)
+    handler._finance_app = True
+    root.addHandler(handler)
+    root.setLevel(config["LOG_LEVEL"])
@@ -1,27 +1,126 @@
-from fastapi import FastAPI
+"""Application factory.
+
+`uvicorn app.main:app` serves the app built from config/settings.py;
+`uvicorn --factory app.main:create_app` or create_app({...}) builds one
+with overrides. Building does no I/O: engines connect on first use, the LLM
+client is configured on its first call, and the schema is brought up to
+date by the startup hook (MIGRATE_ON_STARTUP) or `python manage.py migrate`.
+"""
+import logging
+from typing import Optional
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from config.database import Base, engine
-from config.settings import config
-from api import route_expenses, route_budgets, routes_chat
-
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title=config["PROJECT_NAME"])
-
-# CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Include routers
-app.include_router(route_expenses.router, prefix="/expenses", tags=["Expenses"])
-app.include_router(route_budgets.router, prefix="/budgets", tags=["Budgets"])
-app.include_router(routes_chat.router, prefix="/chat", tags=["Chat"])
-
-@app.get("/")
-def root():
-    return {"message": "Personal Finance Mentor API"}
+from config import database
+from config.migrations import run_migrations
+from config.settings import DEFAULTS, config
+from api import route_expenses, route_budgets, routes_analytics, routes_chat, routes_dashboard, routes_insights, routes_user, routes_health
+from services.aggregates import backfill_if_empty
+from services.categorization_jobs import start_categorization_workers
+from app import ai, jobs, state
+from app.logs import configure_logging
+from app.metrics import instrument_engines, render_metrics
+from app.middleware import ObservabilityMiddleware
+from utils import dependencies
+
+logger = logging.getLogger(__name__)
+
+
+def migrate():
+    """Create missing tables and indexes, then fill the rollups of an upgraded database."""
+    created = run_migrations(database.write_engine)
+    with database.SessionLocal() as db:
+        backfill_if_empty(db)
+    return created
+
+
+def create_app(settings: Optional[dict] = None) -> FastAPI:
+    """Build the API from config.settings.DEFAULTS with `settings` overriding entries.
+
+    The engines, caches and workers are process-wide, so the process serves
+    the app built last: building one replaces the previous app's settings as
+    a whole, and overrides never carry over from one build to the next.
+    """
+    unknown = set(settings or {}) - set(config)
+    if unknown:
+        raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+    # Same keys as before, so threads of an earlier app never miss one mid-swap
+    config.update({**DEFAULTS, **(settings or {})})
+    configure_logging()
+
+    engine, write_engine = database.init_database()
+    instrument_engines(engine, write_engine)
+    if database.async_engine is not None:
+        instrument_engines(database.async_engine.sync_engine, database.async_write_engine.sync_engine, prefix="async_")
+    state.init_shared_state()
+    dependencies.init_user_cache()
+    ai.init_ai()
+
+    app = FastAPI(title=config["PROJECT_NAME"])
+
+    # CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=config["CORS_ORIGINS"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
+    )
+    app.add_middleware(ObservabilityMiddleware, routes=app.routes)
+
+    # Include routers
+    app.include_router(route_expenses.build_router(), prefix="/expenses", tags=["Expenses"])
+    app.include_router(route_budgets.router, prefix="/budgets", tags=["Budgets"])
+    app.include_router(routes_chat.build_router(), prefix="/chat", tags=["Chat"])
+    app.include_router(routes_dashboard.router, prefix="/dashboard", tags=["Dashboard"])
+    app.include_router(routes_analytics.router, prefix="/analytics", tags=["Analytics"])
+    app.include_router(routes_insights.router, prefix="/insights", tags=["Insights"])
+    app.include_router(routes_user.router, prefix="/user", tags=["User"])
+    app.include_router(routes_health.router, prefix="/health", tags=["Health"])
+
+    @app.on_event("startup")
+    def migrate_schema():
+        if config["MIGRATE_ON_STARTUP"]:
+            created = migrate()
+            if created:
+                logger.info("Created indexes", extra={"indexes": created})
+
+    @app.on_event("startup")
+    def probe_ai_models():
+        # Runs in a background thread so startup never waits on the network
+        ai.start_health_probe()
+
+    @app.on_event("startup")
+    def start_job_workers():
+        jobs.init_job_runner()
+        start_categorization_workers()
+
+    @app.on_event("shutdown")
+    def stop_job_workers():
+        if jobs.job_runner:
+            jobs.job_runner.stop()
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        body, content_type = render_metrics()
+        return Response(body, media_type=content_type)
+
+    @app.get("/")
+    def root():
+        return {"message": "Personal Finance Mentor API"}
+
+    return app
+
+
+_default_app = None
+
+
+def __getattr__(name):
+    # `app` is built on first access, so importing this module for create_app()
+    # (tests, benchmarks, --factory) does not also build the default app
+    global _default_app
+    if name != "app":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if _default_app is None:
+        _default_app = create_app()
+    return _default_app
@@ -0,0 +1,210 @@
+"""Prometheus metrics: HTTP latency, SQL, LLM calls and cache effectiveness.
+
+Counters that the app already keeps (LLM and user cache hits, background
+jobs) are read at scrape time by AppStatsCollector instead of being
+counted twice.
+"""
+import contextvars
+import time
+from typing import Optional
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.providers import estimate_tokens
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to serve a request, by route template",
+    ["method", "route", "status"],
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time",
+    ["engine", "operation"],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5),
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_duration_seconds", "LLM call time, including waiting for a concurrency slot",
+    ["model", "method", "outcome"],
+    buckets=(.05, .1, .25, .5, 1, 2.5, 5, 10, 20, 40, 80),
+)
+LLM_TOKENS = Counter(
+    "llm_tokens", "LLM tokens sent and received (estimated when the provider reports no usage)",
+    ["model", "direction"],
+)
+
+# Per-request SQL totals for the access log; a mutable dict so worker threads
+# (which run with a copy of the request's context) can add to it
+request_stats: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("request_stats", default=None)
+
+
+_OPERATIONS = ("select", "insert", "update", "delete", "with")
+
+
+def _operation(statement: str) -> str:
+    head = statement.lstrip()[:7].split(None, 1)
+    verb = head[0].lower() if head else ""
+    return verb if verb in _OPERATIONS else "other"
+
+
+def instrument_engine(engine: Engine, name: str):
+    """Time every statement run on a (sync) engine; pass async_engine.sync_engine for async ones."""
+    # Label lookups take a lock; resolve each child once
+    histograms = {op: DB_QUERY_SECONDS.labels(name, op) for op in (*_OPERATIONS, "other")}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        histograms[_operation(statement)].observe(elapsed)
+        stats = request_stats.get()
+        if stats is not None:
+            stats["db_queries"] += 1
+            stats["db_ms"] += elapsed * 1000
+
+    @event.listens_for(engine, "handle_error")
+    def drop_timer(context):
+        started = context.connection.info.get("query_started") if context.connection else None
+        if started:
+            started.pop()
+
+
+def instrument_engines(reader: Engine, writer: Engine, prefix: str = ""):
+    if writer is reader:
+        instrument_engine(reader, f"{prefix}primary")
+    else:
+        instrument_engine(reader, f"{prefix}reader")
+        instrument_engine(writer, f"{prefix}writer")
+
+
+def _usage(response, prompt: str, completion: str):
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None and getattr(usage, "prompt_token_count", None) is not None:
+        return usage.prompt_token_count, usage.candidates_token_count or 0
+    return estimate_tokens(prompt), estimate_tokens(completion)
+
+
+class InstrumentedModel:
+    """Records latency, outcome and token usage of every call to the wrapped model."""
+
+    def __init__(self, model):
+        self.model = model
+
+    @property
+    def model_name(self):
+        return self.model.model_name
+
+    def _record(self, method: str, started: float, outcome: str, prompt_tokens: int = 0, completion_tokens: int = 0):
+        name = self.model_name or "none"
+        LLM_REQUEST_SECONDS.labels(name, method, outcome).observe(time.perf_counter() - started)
+        if prompt_tokens:
+            LLM_TOKENS.labels(name, "prompt").inc(prompt_tokens)
+        if completion_tokens:
+            LLM_TOKENS.labels(name, "completion").inc(completion_tokens)
+
+    @staticmethod
+    def _outcome(error: Exception) -> str:
+        if isinstance(error, TimeoutError):
+            return "timeout"
+        return "busy" if type(error).__name__ == "LLMBusyError" else "error"
+
+    def generate_content(self, contents, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.model.generate_content(contents, **kwargs)
+        except Exception as e:
+            self._record("generate", started, self._outcome(e))
+            raise
+        self._record("generate", started, "ok", *_usage(response, contents, response.text))
+        return response
+
+    async def generate_content_async(self, contents, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.model.generate_content_async(contents, **kwargs)
+        except Exception as e:
+            self._record("generate", started, self._outcome(e))
+            raise
+        self._record("generate", started, "ok", *_usage(response, contents, response.text))
+        return response
+
+    def stream_content(self, contents, **kwargs):
+        started = time.perf_counter()
+        parts = []
+        try:
+            for text in self.model.stream_content(contents, **kwargs):
+                parts.append(text)
+                yield text
+        except Exception as e:
+            self._record("stream", started, self._outcome(e))
+            raise
+        self._record("stream", started, "ok", estimate_tokens(contents), estimate_tokens("".join(parts)))
+
+    async def stream_content_async(self, contents, **kwargs):
+        started = time.perf_counter()
+        parts = []
+        try:
+            async for text in self.model.stream_content_async(contents, **kwargs):
+                parts.append(text)
+                yield text
+        except Exception as e:
+            self._record("stream", started, self._outcome(e))
+            raise
+        self._record("stream", started, "ok", estimate_tokens(contents), estimate_tokens("".join(parts)))
+
+
+class AppStatsCollector:
+    """Exposes counters kept elsewhere in the app (caches, LLM guard, background jobs)."""
+
+    def describe(self):
+        # Registering would otherwise call collect(), importing app.ai while it imports us
+        return []
+
+    def collect(self):
+        from app import ai, jobs
+        from utils import dependencies
+
+        llm_cache, job_runner, guard, user_cache = ai.llm_cache, jobs.job_runner, ai.guard, dependencies.user_cache
+
+        lookups = CounterMetricFamily("cache_lookups", "Cache lookups by result", labels=["cache", "result"])
+        lookups.add_metric(["llm", "hit"], llm_cache.hits)
+        lookups.add_metric(["llm", "miss"], llm_cache.misses)
+        lookups.add_metric(["user", "hit"], user_cache.hits)
+        lookups.add_metric(["user", "miss"], user_cache.misses)
+        yield lookups
+        entries = GaugeMetricFamily("cache_entries", "Entries currently cached", labels=["cache"])
+        entries.add_metric(["llm"], len(llm_cache.backend))
+        entries.add_metric(["user"], len(user_cache))
+        yield entries
+
+        if guard is not None:
+            stats = guard.stats()
+            breaker = GaugeMetricFamily(
+                "llm_circuit_state", "1 for the LLM circuit breaker's current state", labels=["state"]
+            )
+            for name in ("closed", "open", "half_open"):
+                breaker.add_metric([name], 1 if stats["breaker"]["state"] == name else 0)
+            yield breaker
+            rejected = CounterMetricFamily("llm_guard_rejections", "LLM calls refused by the guard", labels=["reason"])
+            for reason, count in stats["rejected"].items():
+                rejected.add_metric([reason], count)
+            yield rejected
+            yield CounterMetricFamily("llm_coalesced", "LLM calls answered by an identical in-flight call",
+                                      value=stats["coalesced"])
+
+        if job_runner is not None:
+            stats = job_runner.stats()
+            yield GaugeMetricFamily("jobs_queued", "Background jobs waiting or in progress", value=stats["queued"])
+            jobs = CounterMetricFamily("jobs", "Background jobs by outcome", labels=["outcome"])
+            for outcome in ("completed", "retried", "gave_up"):
+                jobs.add_metric([outcome], stats[outcome])
+            yield jobs
+
+
+REGISTRY.register(AppStatsCollector())
+
+
+def render_metrics():
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,66 @@
+import logging
+import time
+from typing import List
+from starlette.routing import BaseRoute, Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from config.settings import config
+from app.metrics import HTTP_REQUEST_SECONDS, request_stats
+from app.profiling import finish_request_profile, start_request_profile
+
+logger = logging.getLogger("app.requests")
+
+
+def route_template(routes: List[BaseRoute], scope: Scope) -> str:
+    """The matched route's path ("/expenses/{id}"), keeping metric labels low-cardinality."""
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
+
+
+class ObservabilityMiddleware:
+    """Times each request until its last body chunk is sent (streams included).
+
+    Records the latency histogram, logs one line per request (a warning above
+    SLOW_REQUEST_MS) with its SQL totals, and runs the sampling profiler
+    when it is enabled.
+    """
+
+    def __init__(self, app: ASGIApp, routes: List[BaseRoute]):
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = route_template(self.routes, scope)
+        status = 500
+        stats = {"db_queries": 0, "db_ms": 0.0}
+        token = request_stats.set(stats)
+        profiler = start_request_profile()
+        started = time.perf_counter()
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - started
+            request_stats.reset(token)
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route, str(status)).observe(duration)
+            fields = {
+                "method": scope["method"], "route": route, "status": status,
+                "duration_ms": round(duration * 1000, 1),
+                "db_queries": stats["db_queries"], "db_ms": round(stats["db_ms"], 1),
+            }
+            if profiler:
+                fields["profile"] = finish_request_profile(profiler, route, duration * 1000)
+            slow = duration * 1000 >= config["SLOW_REQUEST_MS"]
+            logger.log(logging.WARNING if slow else logging.DEBUG, "Slow request" if slow else "Request", extra=fields)
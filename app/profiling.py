@@ -0,0 +1,97 @@
+"""Opt-in sampling profiler for slow requests (PROFILE_REQUESTS=true).
+
+While a request runs, a thread samples the stacks of the event loop and
+the threadpool that runs sync handlers each PROFILE_INTERVAL_MS. When the
+request turns out slower than SLOW_REQUEST_MS the samples are written in
+collapsed-stack format
+("frame;frame;frame count" per line), which flamegraph.pl, speedscope and
+inferno all read. One request is profiled at a time, but the threads are
+shared, so profiles taken under concurrent load mix requests.
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+from config.settings import config
+
+# Stacks whose innermost frame is in one of these modules belong to idle threads
+_IDLE_MODULES = ("threading.py", "selectors.py", "queue.py", "thread.py", "base_events.py")
+# Starlette runs sync endpoints and dependencies on these threads
+_WORKER_THREAD_PREFIX = "AnyIO worker thread"
+
+_active = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", os.path.basename(code.co_filename))
+    return f"{module}:{code.co_name}"
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float, loop_thread: int):
+        self.interval = interval
+        self.loop_thread = loop_thread
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _watched(self) -> set:
+        return {self.loop_thread} | {
+            thread.ident for thread in threading.enumerate() if thread.name.startswith(_WORKER_THREAD_PREFIX)
+        }
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            watched = self._watched()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id not in watched or frame.f_code.co_filename.endswith(_IDLE_MODULES):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def start_request_profile() -> Optional[SamplingProfiler]:
+    """A running profiler, or None when profiling is off or another request holds it.
+
+    Call from the event loop thread.
+    """
+    if not config["PROFILE_REQUESTS"] or not _active.acquire(blocking=False):
+        return None
+    profiler = SamplingProfiler(config["PROFILE_INTERVAL_MS"] / 1000, threading.get_ident())
+    profiler.start()
+    return profiler
+
+
+def finish_request_profile(profiler: SamplingProfiler, route: str, duration_ms: float) -> Optional[str]:
+    """Stop sampling; returns the flamegraph file if the request was slow enough to keep."""
+    try:
+        profiler.stop()
+        if duration_ms < config["SLOW_REQUEST_MS"] or not profiler.samples:
+            return None
+        name = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+        path = os.path.join(config["PROFILE_DIR"], f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{int(duration_ms)}ms.folded")
+        profiler.write(path)
+        return path
+    finally:
+        _active.release()
@@ -0,0 +1,323 @@
+import abc
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+import zlib
+from concurrent import futures
+from typing import Optional
+from config.settings import config
+
+logger = logging.getLogger(__name__)
+
+# Rough size of an English token; good enough to bound prompts and meter usage
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+class LLMResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class LLMProvider(abc.ABC):
+    """What the rest of the app needs from a model backend.
+
+    Mirrors the subset of google.generativeai.GenerativeModel in use:
+    generate_content / generate_content_async return an object with .text,
+    or an (async) iterable of such chunks when stream=True. A call that
+    takes longer than `timeout` seconds raises TimeoutError. A provider
+    missing any of the abstract members cannot be instantiated.
+    """
+
+    name = "base"
+    health: "AIHealth"
+
+    @property
+    @abc.abstractmethod
+    def model_name(self) -> Optional[str]:
+        """Model the next call will use, or None when none is available."""
+
+    @abc.abstractmethod
+    def generate_content(self, contents, stream: bool = False, timeout: Optional[float] = None, **kwargs):
+        """Blocking call; used by sync routes and background jobs."""
+
+    @abc.abstractmethod
+    async def generate_content_async(self, contents, stream: bool = False, timeout: Optional[float] = None, **kwargs):
+        """Same as generate_content, awaited on the event loop in ASYNC_MODE."""
+
+    def probe(self):
+        """Refresh self.health; called from the background health probe."""
+
+
+class AIHealth:
+    """Availability of each candidate model, as last seen by the probe."""
+
+    def __init__(self, model_names):
+        self.model_names = list(model_names)
+        self.models = {name: {"status": "unknown"} for name in self.model_names}
+        self.last_probe = None
+        self._lock = threading.Lock()
+
+    def record(self, name: str, available: bool, latency_ms: float, error: Optional[str] = None):
+        with self._lock:
+            self.models[name] = {
+                "status": "available" if available else "unavailable",
+                "checked_at": time.time(),
+                "latency_ms": round(latency_ms, 1),
+                "error": error,
+            }
+
+    def preferred(self) -> Optional[str]:
+        """First candidate not known to be down (unknown counts as usable)."""
+        for name in self.model_names:
+            if self.models[name]["status"] != "unavailable":
+                return name
+        return None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"last_probe": self.last_probe, "models": {k: dict(v) for k, v in self.models.items()}}
+
+
+class GeminiProvider(LLMProvider):
+    """Configures google.generativeai and builds the GenerativeModel on first use.
+
+    Nothing here touches the network at import time; which model is used
+    follows the health probe's latest view of availability.
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, health: AIHealth, max_workers: int = 4):
+        self.api_key = api_key
+        self.health = health
+        self._models = {}
+        self._configured = False
+        self._lock = threading.Lock()
+        # google-generativeai 0.3 takes no per-call timeout (extra kwargs become
+        # request fields), so blocking calls run here and are waited on with one
+        self._calls = futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gemini")
+
+    @property
+    def model_name(self) -> Optional[str]:
+        return self.health.preferred()
+
+    def _genai(self):
+        import google.generativeai as genai
+        with self._lock:
+            if not self._configured:
+                genai.configure(api_key=self.api_key)
+                self._configured = True
+        return genai
+
+    def _current(self):
+        name = self.model_name
+        if name is None:
+            raise RuntimeError("No Gemini model is currently available")
+        if name not in self._models:
+            genai = self._genai()
+            with self._lock:
+                self._models.setdefault(name, genai.GenerativeModel(name))
+        return self._models[name]
+
+    @staticmethod
+    def _timed_out(error: Exception) -> bool:
+        return type(error).__name__ in ("DeadlineExceeded", "Timeout", "ReadTimeout")
+
+    @staticmethod
+    def _deadline(timeout: Optional[float]) -> Optional[float]:
+        return time.monotonic() + timeout if timeout else None
+
+    def _run(self, deadline: Optional[float], timeout: Optional[float], fn, *args, **kwargs):
+        """fn(*args, **kwargs), raising TimeoutError once `deadline` passes.
+
+        A call that misses it keeps its worker until the SDK returns; the
+        caller has moved on and the result is dropped.
+        """
+        try:
+            if deadline is None:
+                return fn(*args, **kwargs)
+            future = self._calls.submit(fn, *args, **kwargs)
+            try:
+                return future.result(max(0.0, deadline - time.monotonic()))
+            except futures.TimeoutError:
+                future.cancel()
+                raise TimeoutError(f"Gemini did not answer within {timeout}s") from None
+        except Exception as e:
+            if self._timed_out(e):
+                raise TimeoutError(f"Gemini did not answer within {timeout}s") from e
+            raise
+
+    async def _run_async(self, deadline: Optional[float], timeout: Optional[float], awaitable):
+        try:
+            if deadline is None:
+                return await awaitable
+            try:
+                return await asyncio.wait_for(awaitable, max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"Gemini did not answer within {timeout}s") from None
+        except Exception as e:
+            if self._timed_out(e):
+                raise TimeoutError(f"Gemini did not answer within {timeout}s") from e
+            raise
+
+    def _stream(self, chunks, deadline: Optional[float], timeout: Optional[float]):
+        # The deadline covers the whole reply, as it would for one RPC
+        chunks = iter(chunks)
+        while True:
+            chunk = self._run(deadline, timeout, next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+    async def _stream_async(self, chunks, deadline: Optional[float], timeout: Optional[float]):
+        chunks = chunks.__aiter__()
+        while True:
+            try:
+                chunk = await self._run_async(deadline, timeout, chunks.__anext__())
+            except StopAsyncIteration:
+                return
+            yield chunk
+
+    def generate_content(self, contents, stream: bool = False, timeout: Optional[float] = None, **kwargs):
+        deadline = self._deadline(timeout)
+        model = self._current()
+        response = self._run(deadline, timeout, model.generate_content, contents, stream=stream, **kwargs)
+        return self._stream(response, deadline, timeout) if stream else response
+
+    async def generate_content_async(self, contents, stream: bool = False, timeout: Optional[float] = None, **kwargs):
+        deadline = self._deadline(timeout)
+        model = self._current()
+        response = await self._run_async(deadline, timeout, model.generate_content_async(contents, stream=stream, **kwargs))
+        return self._stream_async(response, deadline, timeout) if stream else response
+
+    def probe(self):
+        """Check every candidate with a metadata lookup (no tokens generated)."""
+        genai = self._genai()
+        for name in self.health.model_names:
+            started = time.perf_counter()
+            try:
+                genai.get_model(f"models/{name}")
+                self.health.record(name, True, (time.perf_counter() - started) * 1000)
+            except Exception as e:
+                self.health.record(name, False, (time.perf_counter() - started) * 1000, str(e)[:200])
+        self.health.last_probe = time.time()
+        logger.info("AI health probe finished", extra={"preferred_model": self.health.preferred()})
+
+
+class StubProviderError(RuntimeError):
+    """Injected failure from StubProvider (STUB_FAILURE_RATE)."""
+
+
+class StubProvider(LLMProvider):
+    """Deterministic offline stand-in for load tests and CI.
+
+    Answers depend only on the prompt; latency, streaming pace and the
+    failure rate come from settings so benchmarks can model a slow or
+    flaky provider without network access.
+    """
+
+    name = "stub"
+    CATEGORIES = ["Food", "Transportation", "Entertainment", "Shopping", "Bills", "Other"]
+    ADVICE = (
+        "Your spending this month is mostly on {category}. Set a weekly limit for it, "
+        "review recurring charges, and move what you save into your budget goals."
+    )
+
+    def __init__(self, latency_ms: float = 0, chunk_delay_ms: float = 0, failure_rate: float = 0,
+                 chunk_words: int = 4, seed: int = 0):
+        self.latency = latency_ms / 1000
+        self.chunk_delay = chunk_delay_ms / 1000
+        self.failure_rate = failure_rate
+        self.chunk_words = max(1, chunk_words)
+        self.health = AIHealth(["stub"])
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def model_name(self) -> str:
+        return "stub"
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.failure_rate
+
+    def _category(self, text: str) -> str:
+        return self.CATEGORIES[zlib.crc32(text.encode()) % len(self.CATEGORIES)]
+
+    def reply(self, prompt: str) -> str:
+        if "Respond with one line per expense" in prompt:
+            items = re.findall(r"^(\d+)\. (.*)$", prompt, re.MULTILINE)
+            return "\n".join(f"{n}. {self._category(item)}" for n, item in items)
+        if prompt.startswith("Categorize this expense"):
+            return self._category(prompt)
+        return self.ADVICE.format(category=self._category(prompt))
+
+    def _chunks(self, text: str):
+        words = text.split(" ")
+        for i in range(0, len(words), self.chunk_words):
+            yield " ".join(words[i:i + self.chunk_words]) + (" " if i + self.chunk_words < len(words) else "")
+
+    def generate_content(self, contents, stream: bool = False, timeout: Optional[float] = None, **kwargs):
+        if timeout is not None and self.latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"stub provider did not answer within {timeout}s")
+        time.sleep(self.latency)
+        if self._should_fail():
+            raise StubProviderError("stub provider failure")
+        text = self.reply(contents)
+        if not stream:
+            return LLMResponse(text)
+
+        def chunks():
+            for i, chunk in enumerate(self._chunks(text)):
+                if i:
+                    time.sleep(self.chunk_delay)
+                yield LLMResponse(chunk)
+        return chunks()
+
+    async def generate_content_async(self, contents, stream: bool = False, timeout: Optional[float] = None, **kwargs):
+        if timeout is not None and self.latency > timeout:
+            await asyncio.sleep(timeout)
+            raise TimeoutError(f"stub provider did not answer within {timeout}s")
+        await asyncio.sleep(self.latency)
+        if self._should_fail():
+            raise StubProviderError("stub provider failure")
+        text = self.reply(contents)
+        if not stream:
+            return LLMResponse(text)
+
+        async def chunks():
+            for i, chunk in enumerate(self._chunks(text)):
+                if i:
+                    await asyncio.sleep(self.chunk_delay)
+                yield LLMResponse(chunk)
+        return chunks()
+
+    def probe(self):
+        self.health.record("stub", True, 0.0)
+        self.health.last_probe = time.time()
+
+
+def build_provider() -> Optional[LLMProvider]:
+    """Provider selected by LLM_PROVIDER, or None when it cannot be configured."""
+    if config["LLM_PROVIDER"] == "stub":
+        return StubProvider(
+            latency_ms=config["STUB_LATENCY_MS"],
+            chunk_delay_ms=config["STUB_CHUNK_DELAY_MS"],
+            failure_rate=config["STUB_FAILURE_RATE"],
+            seed=config["STUB_SEED"],
+        )
+    if not config["GOOGLE_AI_API_KEY"]:
+        logger.warning("GOOGLE_AI_API_KEY not found in environment variables")
+        return None
+    # Configured lazily; the first request (or the probe) pays the setup cost
+    return GeminiProvider(
+        config["GOOGLE_AI_API_KEY"], AIHealth(config["GEMINI_MODELS"]), max_workers=config["LLM_MAX_CONCURRENCY"],
+    )
@@ -0,0 +1,129 @@
+"""State that every worker process must agree on.
+
+Two primitives cover what the app shares between requests:
+
+* generations: a counter per key, bumped when data behind cached results
+  changes. Cache keys include the generation, so a bump in one worker makes
+  every worker's entries miss without having to reach into their memory.
+* token buckets: rate limits that hold across workers, not per process.
+
+SHARED_STATE_BACKEND=memory keeps them in the process (one worker only);
+sqlite keeps them in a file every worker on the machine opens.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Tuple
+from config.settings import config
+
+
+def refill(tokens: float, updated: float, now: float, rate: float, burst: float) -> float:
+    return min(burst, tokens + (now - updated) * rate)
+
+
+def wait_for(tokens: float, cost: float, rate: float) -> float:
+    """Seconds until a bucket holding `tokens` can pay `cost`."""
+    return (cost - tokens) / rate if rate > 0 else float("inf")
+
+
+class MemoryState:
+    def __init__(self):
+        self._generations: Dict[str, int] = {}
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def generation(self, key: str) -> int:
+        return self._generations.get(key, 0)
+
+    def bump(self, key: str) -> int:
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            return self._generations[key]
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        """Take `cost` tokens from a bucket refilled at `rate` per second up to `burst`.
+
+        Returns 0 when they were taken, otherwise how many seconds to wait
+        before asking again (nothing is taken then).
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = refill(tokens, updated, now, rate, burst)
+            if tokens < cost:
+                self._buckets[key] = (tokens, now)
+                return wait_for(tokens, cost, rate)
+            self._buckets[key] = (tokens - cost, now)
+            return 0.0
+
+
+class SQLiteState:
+    """The same primitives in a SQLite file, shared by the workers on one machine.
+
+    Each bucket update is one BEGIN IMMEDIATE transaction, so concurrent
+    workers cannot both spend the last token.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS generations (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def generation(self, key: str) -> int:
+        row = self._connect().execute("SELECT value FROM generations WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, key: str) -> int:
+        return self._connect().execute(
+            "INSERT INTO generations (key, value) VALUES (?, 1) "
+            "ON CONFLICT (key) DO UPDATE SET value = value + 1 RETURNING value", (key,)
+        ).fetchone()[0]
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        conn = self._connect()
+        # Wall clock: monotonic clocks are not comparable between processes
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = refill(*row, now, rate, burst) if row else burst
+            wait = 0.0 if tokens >= cost else wait_for(tokens, cost, rate)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens - cost if not wait else tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+def build_shared_state():
+    if config["SHARED_STATE_BACKEND"] == "sqlite":
+        return SQLiteState(config["SHARED_STATE_PATH"])
+    return MemoryState()
+
+
+# Replaced by init_shared_state() in create_app(); read it as state.shared_state
+shared_state = MemoryState()
+
+
+def init_shared_state():
+    global shared_state
+    shared_state = build_shared_state()
+    return shared_state
@@ -0,0 +1,121 @@
+"""Concurrent chat requests for one user on a cold cache, in ASYNC_MODE.
+
+Async chat builds its prompt through AsyncSession.run_sync, on the event
+loop's thread, so anything in that path that blocks on a lock held across
+database I/O stalls every request of the worker. This fires `--clients`
+chats at once for a user with `--rows` expenses and nothing cached, fails if
+they do not all answer within `--timeout` seconds, then checks that the
+spending patterns warmed in the background reach a later prompt:
+
+    python -m bench.chat_concurrency
+    python -m bench.chat_concurrency --clients 16 --rows 50000
+"""
+import argparse
+import asyncio
+import faulthandler
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+import httpx
+from sqlalchemy import insert
+from config import database
+from models.expense import Expense
+from services import spending_patterns
+from utils.dependencies import DEFAULT_USER_ID
+
+
+def settings(workdir: str) -> dict:
+    return {
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'chat.db')}",
+        "ASYNC_MODE": True,
+        "LLM_PROVIDER": "stub",
+        "LLM_CACHE_BACKEND": "memory",
+        "LLM_USER_RATE_PER_MINUTE": 0,
+        "SHARED_STATE_BACKEND": "memory",
+        "JOB_QUEUE_BACKEND": "none",
+        "AI_HEALTH_INTERVAL": 0,
+        "LOG_LEVEL": "WARNING",
+    }
+
+
+def seed(rows: int):
+    now = datetime.utcnow()
+    with database.SessionLocal() as db:
+        db.execute(insert(Expense), [{
+            "amount_cents": 1599 if i % 50 == 0 else 500 + i % 4000,
+            "description": "Streaming subscription" if i % 50 == 0 else f"shop {i % 300}",
+            "category": ["Food", "Bills", "Shopping"][i % 3],
+            "date": now - timedelta(days=30 * (i // 50)) if i % 50 == 0 else now - timedelta(minutes=7 * i),
+            "user_id": DEFAULT_USER_ID,
+        } for i in range(rows)])
+        db.commit()
+
+
+async def chat(client: httpx.AsyncClient, message: str) -> dict:
+    response = await client.post("/chat/", json={"message": message})
+    response.raise_for_status()
+    return response.json()
+
+
+async def run(args) -> list:
+    from app.main import create_app
+    failures = []
+    with tempfile.TemporaryDirectory(prefix="chat_bench_") as workdir:
+        app = create_app(settings(workdir))
+        await app.router.startup()
+        try:
+            seed(args.rows)
+            spending_patterns.forget(DEFAULT_USER_ID)
+            async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+                started = time.perf_counter()
+                try:
+                    await asyncio.wait_for(asyncio.gather(*(
+                        chat(client, f"Question {n}: where can I save?") for n in range(args.clients)
+                    )), args.timeout)
+                    print(f"{args.clients} concurrent chats answered in {(time.perf_counter() - started) * 1000:.0f} ms")
+                except asyncio.TimeoutError:
+                    failures.append(f"{args.clients} concurrent chats did not finish within {args.timeout:.0f}s")
+                    return failures
+
+                deadline = time.monotonic() + args.timeout
+                while time.monotonic() < deadline:
+                    insights = (await chat(client, "Any subscriptions?")).get("insights") or {}
+                    if "recurring_monthly_cost" in insights:
+                        print(f"patterns in the prompt after {(time.perf_counter() - started) * 1000:.0f} ms")
+                        break
+                    await asyncio.sleep(0.1)
+                else:
+                    failures.append("spending patterns never reached the chat prompt")
+        finally:
+            await app.router.shutdown()
+            database.engine.dispose()
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent async chats for one user on a cold cache")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--timeout", type=float, default=20)
+    args = parser.parse_args(argv)
+
+    # A blocked event loop cannot time itself out, so watch it from another thread
+    outcome = []
+    runner = threading.Thread(target=lambda: outcome.append(asyncio.run(run(args))), daemon=True)
+    runner.start()
+    runner.join(args.timeout * 3)
+    if runner.is_alive():
+        print("FAIL: the event loop is blocked; stacks:")
+        faulthandler.dump_traceback(all_threads=True)
+        os._exit(1)
+    failures = outcome[0] if outcome else ["the benchmark raised"]
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,347 @@
+"""Load benchmark for every API route at several data sizes.
+
+For each size the harness seeds a SQLite database, starts `app.main:app`
+under uvicorn with the stub LLM provider, drives each route from a pool of
+keep-alive HTTP clients and records latency percentiles, throughput and the
+server's peak RSS. Results can be compared against bench/baseline.json:
+
+    python -m bench.load --sizes 1k,100k
+    python -m bench.load --sizes 1k,100k --update-baseline
+
+A route or size the baseline has no numbers for, or a baseline taken with
+other settings or seed data, fails the comparison: regenerate the baseline.
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+from bench.seed import SEED_VERSION, parse_size, seed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "bench", "baseline.json")
+DATA_DIR = os.path.join(tempfile.gettempdir(), "finance_bench")
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: Callable[[int], str]
+    body: Optional[Callable[[int], dict]] = None
+    # NDJSON text posted as the multipart "file" field instead of a JSON body
+    upload: Optional[Callable[[int], str]] = None
+
+
+def import_file(i: int, rows: int = 50) -> str:
+    # Every fifth row has no category, so imports also pay for one batched LLM call
+    lines = []
+    for n in range(rows):
+        row = {"amount": 5 + n % 40, "description": f"import {i}-{n}", "date": "2024-06-01T12:00:00"}
+        if n % 5:
+            row["category"] = "Shopping"
+        lines.append(json.dumps(row))
+    return "\n".join(lines) + "\n"
+
+
+SCENARIOS = [
+    Scenario("GET /expenses", "GET", lambda i: "/expenses/?limit=50"),
+    Scenario("GET /expenses (filtered)", "GET",
+             lambda i: "/expenses/?limit=50&category=Food&min_amount=20&start=2024-01-01T00:00:00"),
+    Scenario("GET /expenses/export", "GET", lambda i: "/expenses/export?format=csv"),
+    Scenario("POST /expenses/import", "POST", lambda i: "/expenses/import", upload=import_file),
+    Scenario("POST /expenses", "POST", lambda i: "/expenses/",
+             # Every fifth description is unknown to the local categorizer and reaches the LLM
+             lambda i: {"amount": 5 + i % 40, "description": f"vendor {i}" if i % 5 == 0 else "Starbucks coffee"}),
+    Scenario("GET /budgets", "GET", lambda i: "/budgets/"),
+    Scenario("GET /budgets/status", "GET", lambda i: "/budgets/status"),
+    Scenario("GET /budgets/alerts", "GET", lambda i: "/budgets/alerts?threshold=50"),
+    Scenario("POST /budgets", "POST", lambda i: "/budgets/",
+             lambda i: {"category": "Food", "amount": 300, "month": "2030-01"}),
+    Scenario("GET /dashboard", "GET", lambda i: "/dashboard/"),
+    Scenario("GET /analytics (daily, 1 year)", "GET",
+             lambda i: "/analytics/?bucket=day&start=2024-01-01T00:00:00&end=2025-01-01T00:00:00"),
+    Scenario("GET /analytics (monthly)", "GET", lambda i: "/analytics/?bucket=month&start=2020-01-01T00:00:00"),
+    Scenario("GET /insights", "GET", lambda i: "/insights/"),
+    Scenario("POST /chat", "POST", lambda i: "/chat/",
+             # Distinct questions so the response cache doesn't hide LLM cost
+             lambda i: {"message": f"How can I spend less this month? ({i})"}),
+    # Latency is to the last event of the stream
+    Scenario("POST /chat/stream", "POST", lambda i: "/chat/stream",
+             lambda i: {"message": f"Where does my money go? ({i})"}),
+]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def peak_rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+class Server:
+    def __init__(self, db_path: str, env: dict):
+        self.port = free_port()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--host", "127.0.0.1", "--port", str(self.port), "--log-level", "warning"],
+            cwd=ROOT,
+            env={**os.environ, "DATABASE_URL": f"sqlite:///{db_path}", **env},
+        )
+
+    def wait_ready(self, timeout: float = 60):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("Server exited during startup")
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=2)
+                conn.request("GET", "/")
+                if conn.getresponse().status == 200:
+                    return
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError("Server did not become ready")
+
+    def stop(self) -> Optional[float]:
+        rss = peak_rss_mb(self.process.pid)
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        return rss
+
+
+def drive(port: int, scenario: Scenario, duration: float, concurrency: int, warmup: int = 10) -> dict:
+    latencies: List[float] = []
+    errors = [0]
+    counter = iter(range(10**9))
+    lock = threading.Lock()
+    stop_at = [0.0]
+
+    def one(conn, i):
+        body, headers = None, {}
+        if scenario.body:
+            body, headers = json.dumps(scenario.body(i)), {"Content-Type": "application/json"}
+        elif scenario.upload:
+            boundary = uuid.uuid4().hex
+            body = (
+                f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"expenses.ndjson\"\r\n"
+                f"Content-Type: application/x-ndjson\r\n\r\n{scenario.upload(i)}\r\n--{boundary}--\r\n"
+            ).encode()
+            headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        started = time.perf_counter()
+        conn.request(scenario.method, scenario.path(i), body=body, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        return time.perf_counter() - started, response.status
+
+    def worker():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        while time.perf_counter() < stop_at[0]:
+            with lock:
+                i = next(counter)
+            try:
+                elapsed, status = one(conn, i)
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                latencies.append(elapsed)
+                if status >= 400:
+                    errors[0] += 1
+        conn.close()
+
+    warm = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    for i in range(warmup):
+        one(warm, 10**8 + i)
+    warm.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    stop_at[0] = started + duration
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "throughput_rps": round(len(latencies) / wall, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def seeded_copy(size: str, users: int, workdir: str) -> str:
+    """Seed once per size (cached in the temp dir) and hand out a fresh copy per run."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    template = os.path.join(DATA_DIR, f"seed_v{SEED_VERSION}_{size}_{users}.db")
+    if not os.path.exists(template):
+        print(f"Seeding {size} rows ...", flush=True)
+        print(f"  {seed(template, parse_size(size), users)}", flush=True)
+    path = os.path.join(workdir, f"bench_{size}.db")
+    shutil.copyfile(template, path)
+    return path
+
+
+def run(sizes: List[str], duration: float, concurrency: int, users: int, llm_latency_ms: float,
+        routes: Optional[List[str]] = None) -> dict:
+    env = {
+        "LLM_PROVIDER": "stub",
+        "STUB_LATENCY_MS": str(llm_latency_ms),
+        "AI_HEALTH_INTERVAL": "0",
+        # A few users send every request; per-user limits would turn LLM calls into instant refusals
+        "LLM_USER_RATE_PER_MINUTE": "0",
+    }
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="finance_bench_run_")
+    try:
+        for size in sizes:
+            db_path = seeded_copy(size, users, workdir)
+            server = Server(db_path, env)
+            try:
+                server.wait_ready()
+                size_results = {}
+                for scenario in SCENARIOS:
+                    if routes and scenario.name not in routes:
+                        continue
+                    size_results[scenario.name] = drive(server.port, scenario, duration, concurrency)
+                    print(f"[{size}] {scenario.name}: {size_results[scenario.name]}", flush=True)
+            finally:
+                size_results["_server"] = {"peak_rss_mb": server.stop()}
+            results[size] = size_results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "meta": {
+            "duration_s": duration, "concurrency": concurrency, "users": users,
+            "llm_latency_ms": llm_latency_ms, "seed_version": SEED_VERSION, "python": sys.version.split()[0],
+        },
+        "results": results,
+    }
+
+
+# Settings that change what a run measures; numbers taken under others don't compare
+COMPARABLE_META = ("duration_s", "concurrency", "users", "llm_latency_ms", "seed_version")
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Routes whose p95 latency rose or throughput fell by more than `tolerance`.
+
+    Also reports every route the baseline has no numbers for and every
+    setting the two runs differ in, since neither can be checked.
+    """
+    regressions = []
+    for key in COMPARABLE_META:
+        ran, base = current["meta"].get(key), baseline.get("meta", {}).get(key)
+        if ran != base:
+            regressions.append(f"{key} is {ran} but the baseline was taken with {base}")
+    for size, routes in current["results"].items():
+        for route, stats in routes.items():
+            if route == "_server":
+                continue
+            base = baseline.get("results", {}).get(size, {}).get(route)
+            if not base:
+                regressions.append(f"[{size}] {route}: no baseline")
+                continue
+            if stats["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+                regressions.append(f"[{size}] {route}: p95 {base['p95_ms']} -> {stats['p95_ms']} ms")
+            if stats["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+                regressions.append(
+                    f"[{size}] {route}: throughput {base['throughput_rps']} -> {stats['throughput_rps']} rps"
+                )
+        base_rss = baseline.get("results", {}).get(size, {}).get("_server", {}).get("peak_rss_mb")
+        rss = routes.get("_server", {}).get("peak_rss_mb")
+        if base_rss and rss and rss > base_rss * (1 + tolerance):
+            regressions.append(f"[{size}] peak RSS {base_rss} -> {rss} MB")
+    return regressions
+
+
+def print_table(report: dict):
+    print(f"\n{'size':<6} {'route':<30} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'rps':>8} {'errors':>7}")
+    for size, routes in report["results"].items():
+        for route, stats in routes.items():
+            if route == "_server":
+                continue
+            print(f"{size:<6} {route:<30} {stats['p50_ms']:>8} {stats['p95_ms']:>8} "
+                  f"{stats['p99_ms']:>8} {stats['throughput_rps']:>8} {stats['errors']:>7}")
+        print(f"{size:<6} {'peak RSS (MB)':<30} {routes['_server']['peak_rss_mb']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every API route at several data sizes")
+    parser.add_argument("--sizes", default="1k,100k", help="comma separated: 1k, 100k, 1m or row counts")
+    parser.add_argument("--duration", type=float, default=5, help="seconds per route")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--llm-latency-ms", type=float, default=200, help="stub provider latency")
+    parser.add_argument("--route", action="append", help="only run this route (repeatable)")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes.split(","), args.duration, args.concurrency, args.users,
+                 args.llm_latency_ms, args.route)
+    print_table(report)
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(report, out, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as out:
+            json.dump(report, out, indent=2)
+            out.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("\nNo baseline to compare against; run with --update-baseline")
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(report, json.load(f), args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    print(f"\n{len(regressions)} regressions or gaps against the baseline ({args.tolerance:.0%} tolerance)")
+    if regressions:
+        print("Run with --update-baseline once a change is expected")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
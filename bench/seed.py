@@ -0,0 +1,97 @@
+"""Synthetic data for benchmarks: users, expenses and budgets in a SQLite file."""
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from config.migrations import run_migrations
+from services import aggregates
+
+CATEGORIES = ["Food", "Transportation", "Entertainment", "Shopping", "Bills", "Other"]
+DESCRIPTIONS = {
+    "Food": ["Starbucks coffee", "Lunch at cafe", "Groceries", "Pizza night", "Dinner"],
+    "Transportation": ["Uber ride", "Metro card", "Gas station", "Parking", "Train ticket"],
+    "Entertainment": ["Netflix", "Movie tickets", "Concert", "Steam game", "Museum"],
+    "Shopping": ["Amazon order", "Shoes", "Target run", "Gift", "Electronics"],
+    "Bills": ["Rent", "Electricity bill", "Internet", "Phone bill", "Insurance"],
+    "Other": ["Haircut", "Donation", "Gym membership", "Pet supplies", "Laundry"],
+}
+
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+# Bump when the schema changes so cached seed databases are regenerated
+SEED_VERSION = 3
+
+
+def parse_size(size: str) -> int:
+    return SIZES.get(size.lower()) or int(size)
+
+
+def seed(path: str, rows: int, users: int = 10, seed_value: int = 42, days: int = 730) -> dict:
+    """Create a fresh database at `path` with `rows` expenses spread over `users` users."""
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    run_migrations(engine)
+
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    started = time.perf_counter()
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executemany(
+        "INSERT INTO users (id, username, created_at) VALUES (?, ?, ?)",
+        [(uid, f"bench_user_{uid}", str(now)) for uid in range(1, users + 1)],
+    )
+
+    def expense_rows():
+        for i in range(rows):
+            category = rng.choice(CATEGORIES)
+            yield (
+                round(rng.lognormvariate(3, 1) * 100),
+                rng.choice(DESCRIPTIONS[category]),
+                category,
+                str(now - timedelta(seconds=rng.randrange(days * 86400))),
+                1 + i % users,
+            )
+
+    conn.executemany(
+        "INSERT INTO expenses (amount_cents, description, category, date, user_id) VALUES (?, ?, ?, ?, ?)",
+        expense_rows(),
+    )
+    months = sorted({(now - timedelta(days=d)).strftime("%Y-%m") for d in range(0, days, 28)})
+    conn.executemany(
+        "INSERT INTO budgets (category, amount_cents, month, user_id) VALUES (?, ?, ?, ?)",
+        [
+            (category, rng.randrange(100, 1000) * 100, month, uid)
+            for uid in range(1, users + 1)
+            for month in months[-12:]
+            for category in CATEGORIES[:5]
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+    with Session(engine) as db:
+        aggregates.rebuild(db)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    engine.dispose()
+    return {"rows": rows, "users": users, "seconds": round(time.perf_counter() - started, 2)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed a benchmark database")
+    parser.add_argument("path")
+    parser.add_argument("--size", default="1k", help="1k, 100k, 1m or a row count")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    print(seed(args.path, parse_size(args.size), args.users, args.seed))
+
+
+if __name__ == "__main__":
+    main()
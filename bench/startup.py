@@ -0,0 +1,125 @@
+"""Cold-start benchmark: import cost, app construction and startup hooks.
+
+Each run is a fresh interpreter, as a newly spawned worker would be. It
+times `import app.main`, `create_app()` and the startup hooks (schema
+creation on an empty database, AI probe, job workers), checks that the
+import and the factory have no side effects (no database file, no threads)
+and breaks the import time down by package with `python -X importtime`:
+
+    python -m bench.startup
+    python -m bench.startup --runs 10 --max-import-ms 1500 --max-startup-ms 300
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from typing import List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Median limits, also enforced by tests/test_startup.py
+MAX_IMPORT_MS = 2000
+MAX_STARTUP_MS = 500
+
+CHILD = """
+import asyncio, json, os, threading, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+app = app.main.create_app()
+created = time.perf_counter()
+side_effects = []
+if os.path.exists(os.environ["BENCH_DB_PATH"]):
+    side_effects.append("database file created before startup")
+if threading.active_count() > 1:
+    side_effects.append(f"{threading.active_count() - 1} threads started before startup")
+asyncio.run(app.router.startup())
+ready = time.perf_counter()
+asyncio.run(app.router.shutdown())
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "create_ms": (created - imported) * 1000,
+    "startup_ms": (ready - created) * 1000,
+    "side_effects": side_effects,
+}))
+"""
+
+
+def child_env(workdir: str, run: int) -> dict:
+    db_path = os.path.join(workdir, f"startup_{run}.db")
+    return {
+        **os.environ,
+        "PYTHONPATH": ROOT,
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "BENCH_DB_PATH": db_path,
+        "LLM_PROVIDER": "stub",
+        "LLM_CACHE_BACKEND": "memory",
+        "JOB_QUEUE_BACKEND": "memory",
+        "AI_HEALTH_INTERVAL": "0",
+        "LOG_LEVEL": "WARNING",
+    }
+
+
+def measure(runs: int) -> List[dict]:
+    results = []
+    with tempfile.TemporaryDirectory(prefix="startup_bench_") as workdir:
+        for run in range(runs):
+            out = subprocess.run(
+                [sys.executable, "-c", CHILD], cwd=ROOT, env=child_env(workdir, run),
+                capture_output=True, text=True, check=True,
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return results
+
+
+def import_cost_by_package(limit: int) -> List[tuple]:
+    """(ms, package) of the most expensive top-level packages loaded by `import app.main`."""
+    with tempfile.TemporaryDirectory(prefix="startup_bench_") as workdir:
+        out = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=ROOT,
+            env=child_env(workdir, 0), capture_output=True, text=True, check=True,
+        )
+    cost = defaultdict(int)
+    for line in out.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        cost[name.strip().split(".")[0]] += int(self_us)
+    return sorted(((us / 1000, package) for package, us in cost.items()), reverse=True)[:limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure import and startup time of the API")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="packages to list by import cost")
+    parser.add_argument("--max-import-ms", type=float, default=MAX_IMPORT_MS, help="fail above this median")
+    parser.add_argument("--max-startup-ms", type=float, default=MAX_STARTUP_MS,
+                        help="fail when create_app plus startup hooks take longer (median)")
+    args = parser.parse_args(argv)
+
+    results = measure(args.runs)
+    medians = {key: statistics.median(r[key] for r in results) for key in ("import_ms", "create_ms", "startup_ms")}
+    for key, value in medians.items():
+        spread = [r[key] for r in results]
+        print(f"{key:<11} median {value:8.1f}  min {min(spread):8.1f}  max {max(spread):8.1f}")
+    print("import cost by package (ms):")
+    for ms, name in import_cost_by_package(args.top):
+        print(f"  {ms:8.1f}  {name}")
+
+    failures = sorted({effect for r in results for effect in r["side_effects"]})
+    if medians["import_ms"] > args.max_import_ms:
+        failures.append(f"import took {medians['import_ms']:.0f} ms (limit {args.max_import_ms:.0f})")
+    if medians["create_ms"] + medians["startup_ms"] > args.max_startup_ms:
+        failures.append(f"create_app + startup took {medians['create_ms'] + medians['startup_ms']:.0f} ms "
+                        f"(limit {args.max_startup_ms:.0f})")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""Concurrent write throughput under each SQLite profile.
+
+Writer threads run the same transactions as POST /expenses (expense row plus
+monthly rollup upsert) and POST /budgets while reader threads run the
+dashboard queries. Each profile gets a fresh database; the report shows
+committed writes per second and how many transactions failed with
+"database is locked":
+
+    python -m bench.write_concurrency --writers 8 --readers 4 --duration 5
+
+Exits non-zero when the production profile hits a lock error or does not
+out-write the default profile. tests/test_write_concurrency.py runs the same
+transactions for a fixed count and checks that every one commits.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from config.database import create_engines, session_class
+from config.migrations import run_migrations
+from models.budget import Budget
+from models.expense import Expense
+from models.user import User
+from services.aggregates import month_key, monthly_breakdown, record_expense
+
+PROFILES = ["default", "production"]
+USERS = 10
+
+
+def write_expense(db, rng):
+    expense = Expense(
+        amount=round(rng.uniform(1, 100), 2), description="Starbucks coffee",
+        category="Food", user_id=rng.randint(1, USERS),
+    )
+    db.add(expense)
+    db.flush()
+    record_expense(db, expense)
+    db.commit()
+
+
+def write_budget(db, rng):
+    db.add(Budget(category="Food", amount=300.0, month="2030-01", user_id=rng.randint(1, USERS)))
+    db.commit()
+
+
+def read_dashboard(db, rng):
+    user_id = rng.randint(1, USERS)
+    now = datetime.now()
+    monthly_breakdown(db, user_id, month_key(now))
+    db.query(Expense).filter(
+        Expense.user_id == user_id, Expense.date >= now.replace(day=1)
+    ).order_by(Expense.date.desc()).limit(5).all()
+    db.rollback()
+
+
+def run_profile(profile: str, writers: int, readers: int, duration: float) -> dict:
+    workdir = tempfile.mkdtemp(prefix="write_concurrency_")
+    reader_engine, writer_engine = create_engines(f"sqlite:///{os.path.join(workdir, 'bench.db')}", profile)
+    Session = sessionmaker(class_=session_class(reader_engine, writer_engine), bind=reader_engine, autoflush=False)
+    counts = {"writes": 0, "reads": 0, "locked": 0, "other_errors": 0}
+    lock = threading.Lock()
+    try:
+        run_migrations(writer_engine)
+        with Session() as db:
+            db.execute(insert(User), [{"id": uid, "username": f"user_{uid}"} for uid in range(1, USERS + 1)])
+            db.commit()
+
+        stop_at = time.perf_counter() + duration
+
+        def loop(seed: int, actions, counter: str):
+            rng = random.Random(seed)
+            while time.perf_counter() < stop_at:
+                with Session() as db:
+                    try:
+                        rng.choice(actions)(db, rng)
+                        key = counter
+                    except OperationalError as e:
+                        db.rollback()
+                        key = "locked" if "locked" in str(e.orig) else "other_errors"
+                with lock:
+                    counts[key] += 1
+
+        threads = [
+            threading.Thread(target=loop, args=(n, [write_expense, write_expense, write_budget], "writes"))
+            for n in range(writers)
+        ] + [
+            threading.Thread(target=loop, args=(1000 + n, [read_dashboard], "reads"))
+            for n in range(readers)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+    finally:
+        reader_engine.dispose()
+        writer_engine.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        **counts,
+        "writes_per_second": round(counts["writes"] / wall, 1),
+        "reads_per_second": round(counts["reads"] / wall, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare concurrent write throughput of the SQLite profiles")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5, help="seconds per profile")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for profile in PROFILES:
+        results[profile] = run_profile(profile, args.writers, args.readers, args.duration)
+        print(f"{profile:<11} {results[profile]}", flush=True)
+
+    default, production = results["default"], results["production"]
+    problems = []
+    if production["locked"]:
+        problems.append(f"production profile hit {production['locked']} 'database is locked' errors")
+    if production["writes_per_second"] <= default["writes_per_second"]:
+        problems.append("production profile did not improve write throughput")
+    for problem in problems:
+        print(f"FAIL {problem}")
+    if not problems:
+        speedup = production["writes_per_second"] / max(default["writes_per_second"], 0.1)
+        print(f"OK production profile: {speedup:.1f}x writes/s, no lock errors")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,171 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event, Delete, Insert, Update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from config.settings import config
 import tempfile, os
 
-# Use a temporary directory for SQLite
-db_dir = os.path.join(tempfile.gettempdir(), "finance_app")
-os.makedirs(db_dir, exist_ok=True)
-db_path = os.path.join(db_dir, "finance_app.db")
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
 
-SQLALCHEMY_DATABASE_URL = f"sqlite:///{db_path}"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    echo=False
-)
+def async_url(url: str) -> str:
+    """Same database through the dialect's asyncio driver."""
+    scheme, rest = url.split("://", 1)
+    return f"{ASYNC_DRIVERS.get(scheme.split('+')[0], scheme)}://{rest}"
+
+
+def database_url() -> str:
+    """DATABASE_URL, or a SQLite file in the temp directory when it is unset."""
+    if config["DATABASE_URL"]:
+        return config["DATABASE_URL"]
+    db_dir = os.path.join(tempfile.gettempdir(), "finance_app")
+    os.makedirs(db_dir, exist_ok=True)
+    return f"sqlite:///{os.path.join(db_dir, 'finance_app.db')}"
+
+
+def sqlite_pragmas() -> list:
+    return [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={config['SQLITE_BUSY_TIMEOUT_MS']}",
+        f"PRAGMA mmap_size={config['SQLITE_MMAP_SIZE']}",
+        # Negative cache_size is in KiB rather than pages
+        f"PRAGMA cache_size=-{config['SQLITE_CACHE_SIZE_KB']}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def apply_sqlite_profile(sync_engine, immediate: bool):
+    """Run the production pragmas on every new connection and take over BEGIN.
+
+    The writer opens transactions with BEGIN IMMEDIATE so it claims the
+    write lock up front instead of failing to upgrade a read lock later.
+    """
+    @event.listens_for(sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        # Stop the driver from issuing its own BEGIN so the "begin" hook below decides
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for pragma in sqlite_pragmas():
+            cursor.execute(pragma)
+        cursor.close()
+
+    @event.listens_for(sync_engine, "begin")
+    def begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE" if immediate else "BEGIN")
+
+
+class RoutingSession(Session):
+    """Sends reads to the reader pool and writes to the writer engine.
+
+    Once a transaction has written (a flush or an INSERT/UPDATE/DELETE) it
+    stays on the writer until it ends, so later statements see its own
+    uncommitted rows.
+    """
+
+    reader = None
+    writer = None
+    _writing = False
+
+    def execute(self, statement, *args, **kw):
+        # ORM bulk DML only hands get_bind() the mapper, so mark the write here
+        if isinstance(statement, (Insert, Update, Delete)):
+            self._writing = True
+        return super().execute(statement, *args, **kw)
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.writer is None:
+            return super().get_bind(mapper=mapper, clause=clause, **kw)
+        if self._writing or self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            self._writing = True
+            return self.writer
+        return self.reader
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _release_writer(session, transaction):
+    if transaction.parent is None:
+        session._writing = False
+
+
+def create_engines(url: str, profile: str, create=create_engine):
+    """(reader, writer) engines for `url`; the same engine twice unless the
+    SQLite production profile is active."""
+    sqlite = url.startswith("sqlite")
+    if not sqlite:
+        # Server databases handle concurrent writers themselves: one pooled engine
+        engine = create(
+            url, echo=False,
+            pool_size=config["DB_POOL_SIZE"], max_overflow=config["DB_MAX_OVERFLOW"],
+            pool_timeout=config["DB_POOL_TIMEOUT"], pool_recycle=config["DB_POOL_RECYCLE"],
+            pool_pre_ping=config["DB_POOL_PRE_PING"],
+        )
+        return engine, engine
+
+    connect_args = {"check_same_thread": False}
+    if profile != "production":
+        engine = create(url, connect_args=connect_args, echo=False)
+        return engine, engine
+
+    connect_args["timeout"] = config["SQLITE_BUSY_TIMEOUT_MS"] / 1000
+    poolclass = AsyncAdaptedQueuePool if create is create_async_engine else QueuePool
+    reader = create(
+        url, connect_args=connect_args, echo=False, poolclass=poolclass,
+        pool_size=config["SQLITE_READ_POOL_SIZE"], max_overflow=config["SQLITE_READ_POOL_SIZE"],
+    )
+    # One pooled connection: writes queue for it instead of fighting over the file lock
+    writer = create(
+        url, connect_args=connect_args, echo=False, poolclass=poolclass,
+        pool_size=1, max_overflow=0, pool_timeout=config["SQLITE_WRITE_QUEUE_TIMEOUT"],
+    )
+    apply_sqlite_profile(getattr(reader, "sync_engine", reader), immediate=False)
+    apply_sqlite_profile(getattr(writer, "sync_engine", writer), immediate=True)
+    return reader, writer
+
+
+def session_class(reader, writer):
+    """RoutingSession bound to these engines, or plain Session for a single engine."""
+    if reader is writer:
+        return Session
+    return type("BoundRoutingSession", (RoutingSession,), {
+        "reader": getattr(reader, "sync_engine", reader),
+        "writer": getattr(writer, "sync_engine", writer),
+    })
+
+
+# Unbound until init_database(); modules import these names and use them per request
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = async_sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+engine = write_engine = async_engine = async_write_engine = None
+
+
+def init_database():
+    """Create the engines from config and bind the session factories to them.
+
+    No connection is opened here; pools connect on first use. The async
+    engines are only built in ASYNC_MODE. Returns (reader, writer).
+    """
+    global engine, write_engine, async_engine, async_write_engine
+    # Re-initialising (a second create_app) closes the previous pools
+    for old in {engine, write_engine} - {None}:
+        old.dispose()
+
+    url = database_url()
+    engine, write_engine = create_engines(url, config["SQLITE_PROFILE"])
+    SessionLocal.configure(bind=engine)
+    SessionLocal.class_ = session_class(engine, write_engine)
+
+    async_engine = async_write_engine = None
+    if config["ASYNC_MODE"]:
+        async_engine, async_write_engine = create_engines(
+            async_url(url), config["SQLITE_PROFILE"], create=create_async_engine
+        )
+        AsyncSessionLocal.configure(
+            bind=async_engine, sync_session_class=session_class(async_engine, async_write_engine)
+        )
+    return engine, write_engine
+
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-import models  # Ensure models are imported for Alembic
\ No newline at end of file
+import models  # Ensure models are imported for Alembic
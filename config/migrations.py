@@ -0,0 +1,91 @@
+import logging
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from config.database import Base
+
+logger = logging.getLogger(__name__)
+
+# Float dollar columns from older databases and their integer-cents replacements
+MONEY_COLUMNS = [
+    ("expenses", "amount", "amount_cents BIGINT"),
+    ("budgets", "amount", "amount_cents BIGINT"),
+    ("monthly_aggregates", "total", "total_cents BIGINT NOT NULL DEFAULT 0"),
+]
+
+
+def ensure_indexes(engine: Engine) -> list:
+    """Create indexes declared on the models but missing from existing tables.
+
+    create_all only builds indexes for tables it creates itself, so databases
+    that predate an index never get it without this step.
+    """
+    created = []
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(bind=conn)
+                    created.append(index.name)
+        if created:
+            # Refresh planner statistics so the new indexes are picked up
+            conn.exec_driver_sql("ANALYZE")
+    return created
+
+
+def migrate_money_columns(engine: Engine) -> list:
+    """Move float amounts to integer cents: add the column, backfill, drop the float.
+
+    The monthly rollup is recomputed from the converted expenses instead of
+    converting its float totals, which may already carry rounding drift.
+    """
+    migrated = []
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        existing = set(inspector.get_table_names())
+        for table, old, new_ddl in MONEY_COLUMNS:
+            if table not in existing or old not in {c["name"] for c in inspector.get_columns(table)}:
+                continue
+            new = new_ddl.split()[0]
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {new_ddl}")
+            if table != "monthly_aggregates":
+                conn.exec_driver_sql(f"UPDATE {table} SET {new} = CAST(ROUND({old} * 100) AS BIGINT)")
+            # DROP COLUMN needs SQLite 3.35+
+            conn.exec_driver_sql(f"ALTER TABLE {table} DROP COLUMN {old}")
+            migrated.append(f"{table}.{new}")
+    if "monthly_aggregates.total_cents" in migrated:
+        from services import aggregates
+        with Session(engine) as db:
+            aggregates.rebuild(db)
+    if migrated:
+        logger.info("Migrated money columns to integer cents", extra={"tables": migrated})
+    return migrated
+
+
+def sync_sequences(engine: Engine):
+    """Move Postgres id sequences past rows inserted with explicit ids.
+
+    The default user, imports from SQLite and the benchmark seeders write ids
+    directly, which leaves the serial sequence behind and makes the next
+    autoincrement insert collide.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if "id" in table.c:
+                conn.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {table.name}), 0) + 1, false)"
+                )
+
+
+def run_migrations(engine: Engine) -> list:
+    """Bring the schema of an existing database up to date with the models."""
+    Base.metadata.create_all(bind=engine)
+    migrate_money_columns(engine)
+    created = ensure_indexes(engine)
+    sync_sequences(engine)
+    return created
@@ -1,10 +1,138 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
 config = {
     "PROJECT_NAME": os.getenv("PROJECT_NAME", "Personal Finance Mentor API"),
+    # Browser origins allowed to call the API, comma-separated
+    "CORS_ORIGINS": [
+        origin.strip() for origin in
+        os.getenv("CORS_ORIGINS", "http://localhost:3000,https://finance-mentor-frontend.vercel.app").split(",")
+        if origin.strip()
+    ],
     "API_VERSION": "/api/v1",
+    # SQLAlchemy URL; empty means a SQLite file in the system temp directory.
+    # postgresql:// URLs use psycopg2 (asyncpg in ASYNC_MODE)
+    "DATABASE_URL": os.getenv("DATABASE_URL", ""),
+    # Connection pool for server databases (Postgres), per worker process
+    "DB_POOL_SIZE": int(os.getenv("DB_POOL_SIZE", "10")),
+    "DB_MAX_OVERFLOW": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    "DB_POOL_TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    # Seconds before a pooled connection is replaced, ahead of server/proxy idle timeouts
+    "DB_POOL_RECYCLE": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "DB_POOL_PRE_PING": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+    # "production" (WAL, tuned pragmas, pooled readers and one serialized writer)
+    # or "default" (a single engine with SQLite's stock settings)
+    "SQLITE_PROFILE": os.getenv("SQLITE_PROFILE", "production").lower(),
+    "SQLITE_BUSY_TIMEOUT_MS": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "SQLITE_MMAP_SIZE": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "SQLITE_CACHE_SIZE_KB": int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536")),
+    "SQLITE_READ_POOL_SIZE": int(os.getenv("SQLITE_READ_POOL_SIZE", "8")),
+    # Seconds a write waits for the writer connection before failing
+    "SQLITE_WRITE_QUEUE_TIMEOUT": float(os.getenv("SQLITE_WRITE_QUEUE_TIMEOUT", "30")),
+    # Create missing tables/indexes when the app starts. Turn off when several
+    # workers share a database and run `python manage.py migrate` once before them
+    "MIGRATE_ON_STARTUP": os.getenv("MIGRATE_ON_STARTUP", "true").lower() in ("1", "true", "yes"),
     "GOOGLE_AI_API_KEY": os.getenv("GOOGLE_AI_API_KEY", ""),
+    # "gemini" or "stub" (deterministic offline provider for load tests and CI)
+    "LLM_PROVIDER": os.getenv("LLM_PROVIDER", "gemini").lower(),
+    "STUB_LATENCY_MS": float(os.getenv("STUB_LATENCY_MS", "0")),
+    "STUB_CHUNK_DELAY_MS": float(os.getenv("STUB_CHUNK_DELAY_MS", "0")),
+    "STUB_FAILURE_RATE": float(os.getenv("STUB_FAILURE_RATE", "0")),
+    "STUB_SEED": int(os.getenv("STUB_SEED", "0")),
+    # Candidate Gemini models in order of preference
+    "GEMINI_MODELS": [
+        name.strip() for name in
+        os.getenv("GEMINI_MODELS", "gemini-2.5-flash,gemini-2.5-pro,gemini-1.0-pro").split(",")
+        if name.strip()
+    ],
+    # Take the acting user from the X-User-Id header. Only enable behind a front
+    # end that authenticates the caller and sets (or strips) that header itself;
+    # otherwise every request acts as the demo user
+    "TRUST_USER_HEADER": os.getenv("TRUST_USER_HEADER", "false").lower() == "true",
+    # Seconds a resolved user id is trusted without a lookup (0 disables the cache)
+    "USER_CACHE_TTL": float(os.getenv("USER_CACHE_TTL", "300")),
+    "USER_CACHE_MAX_ENTRIES": int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000")),
+    # Seconds between background model availability probes (0 = probe once at startup)
+    "AI_HEALTH_INTERVAL": float(os.getenv("AI_HEALTH_INTERVAL", "300")),
+    # Serve the LLM-bound routes (POST /expenses, POST /chat) as async handlers
+    "ASYNC_MODE": os.getenv("ASYNC_MODE", "false").lower() in ("1", "true", "yes"),
+    # Concurrent LLM requests allowed per worker, and how long (seconds) a
+    # request waits for a free slot before giving up
+    "LLM_MAX_CONCURRENCY": int(os.getenv("LLM_MAX_CONCURRENCY", "4")),
+    "LLM_QUEUE_TIMEOUT": float(os.getenv("LLM_QUEUE_TIMEOUT", "2")),
+    # Seconds a model call may take before it is abandoned and counted as a failure
+    "LLM_TIMEOUT_SECONDS": float(os.getenv("LLM_TIMEOUT_SECONDS", "20")),
+    # Circuit breaker: consecutive failures that open it, and seconds before a trial call
+    "LLM_BREAKER_FAILURES": int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+    "LLM_BREAKER_RESET_SECONDS": float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30")),
+    # Token buckets for model calls (cache hits are free): per user and across
+    # all users and workers, in calls per minute (0 = no limit) and burst size
+    "LLM_USER_RATE_PER_MINUTE": float(os.getenv("LLM_USER_RATE_PER_MINUTE", "30")),
+    "LLM_USER_RATE_BURST": float(os.getenv("LLM_USER_RATE_BURST", "10")),
+    "LLM_GLOBAL_RATE_PER_MINUTE": float(os.getenv("LLM_GLOBAL_RATE_PER_MINUTE", "0")),
+    "LLM_GLOBAL_RATE_BURST": float(os.getenv("LLM_GLOBAL_RATE_BURST", "20")),
+    # Approximate token budget for the chat prompt, and how many recent expenses it may list
+    "CHAT_CONTEXT_TOKENS": int(os.getenv("CHAT_CONTEXT_TOKENS", "800")),
+    "CHAT_RECENT_EXPENSES": int(os.getenv("CHAT_RECENT_EXPENSES", "5")),
+    # Spending patterns: rows per chunk read from the streaming cursor, and how
+    # many users' histories each process keeps in memory
+    "PATTERNS_CHUNK_ROWS": int(os.getenv("PATTERNS_CHUNK_ROWS", "5000")),
+    "PATTERNS_CACHE_USERS": int(os.getenv("PATTERNS_CACHE_USERS", "256")),
+    # Users whose learned (description, category) counts the local categorizer keeps
+    "CATEGORIZER_CACHE_USERS": int(os.getenv("CATEGORIZER_CACHE_USERS", "1024")),
+    # Rows fetched from the server-side cursor per chunk of GET /expenses/export
+    "EXPORT_CHUNK_ROWS": int(os.getenv("EXPORT_CHUNK_ROWS", "5000")),
+    # LLM response cache: "memory" (per-process LRU), "sqlite" or "none"
+    "LLM_CACHE_BACKEND": os.getenv("LLM_CACHE_BACKEND", "memory").lower(),
+    "LLM_CACHE_MAX_ENTRIES": int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000")),
+    "LLM_CACHE_TTL": float(os.getenv("LLM_CACHE_TTL", "3600")),
+    "LLM_CACHE_PATH": os.getenv(
+        "LLM_CACHE_PATH", os.path.join(tempfile.gettempdir(), "finance_app", "llm_cache.db")
+    ),
+    # State worker processes must share (cache invalidation, rate limits):
+    # "memory" (one process) or "sqlite" (a file every worker on the machine opens)
+    "SHARED_STATE_BACKEND": os.getenv("SHARED_STATE_BACKEND", "memory").lower(),
+    "SHARED_STATE_PATH": os.getenv(
+        "SHARED_STATE_PATH", os.path.join(tempfile.gettempdir(), "finance_app", "state.db")
+    ),
+    # Per-user limit on POST /chat and /chat/stream: requests per minute (0 = off) and burst size
+    "CHAT_RATE_PER_MINUTE": float(os.getenv("CHAT_RATE_PER_MINUTE", "0")),
+    "CHAT_RATE_BURST": float(os.getenv("CHAT_RATE_BURST", "5")),
+    # Worker processes started by `python manage.py serve` (0 = one per CPU core)
+    "WEB_CONCURRENCY": int(os.getenv("WEB_CONCURRENCY", "0")),
+    # Background jobs: "memory", "sqlite" (survives restarts) or "none" (LLM
+    # categorization runs inside the POST /expenses request)
+    "JOB_QUEUE_BACKEND": os.getenv("JOB_QUEUE_BACKEND", "memory").lower(),
+    "JOB_QUEUE_PATH": os.getenv(
+        "JOB_QUEUE_PATH", os.path.join(tempfile.gettempdir(), "finance_app", "jobs.db")
+    ),
+    "JOB_WORKERS": int(os.getenv("JOB_WORKERS", "2")),
+    # Jobs per micro-batch (one LLM call), and how long (ms) a worker waits to fill one
+    "JOB_BATCH_SIZE": int(os.getenv("JOB_BATCH_SIZE", "20")),
+    "JOB_BATCH_WAIT_MS": float(os.getenv("JOB_BATCH_WAIT_MS", "200")),
+    # Attempts before a job gives up, and the exponential backoff (seconds) between them
+    "JOB_MAX_ATTEMPTS": int(os.getenv("JOB_MAX_ATTEMPTS", "5")),
+    "JOB_RETRY_BASE_SECONDS": float(os.getenv("JOB_RETRY_BASE_SECONDS", "1")),
+    "JOB_RETRY_MAX_SECONDS": float(os.getenv("JOB_RETRY_MAX_SECONDS", "60")),
+    # Seconds a claimed SQLite job stays hidden from other workers; a job whose
+    # worker died is picked up again once its lease runs out
+    "JOB_LEASE_SECONDS": float(os.getenv("JOB_LEASE_SECONDS", "300")),
+    # Logging: level, and "json" (one object per line) or "text"
+    "LOG_LEVEL": os.getenv("LOG_LEVEL", "INFO").upper(),
+    "LOG_FORMAT": os.getenv("LOG_FORMAT", "json").lower(),
+    # Requests slower than this (ms) are logged as warnings (and profiled, if enabled)
+    "SLOW_REQUEST_MS": float(os.getenv("SLOW_REQUEST_MS", "1000")),
+    # Sample stacks while requests run and keep a flamegraph of the slow ones
+    "PROFILE_REQUESTS": os.getenv("PROFILE_REQUESTS", "false").lower() in ("1", "true", "yes"),
+    "PROFILE_INTERVAL_MS": float(os.getenv("PROFILE_INTERVAL_MS", "5")),
+    "PROFILE_DIR": os.getenv(
+        "PROFILE_DIR", os.path.join(tempfile.gettempdir(), "finance_app", "profiles")
+    ),
 }
+
+# The values above as read from the environment. create_app() starts every
+# app from these, so one app's overrides never carry over to the next
+DEFAULTS = dict(config)
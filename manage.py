@@ -0,0 +1,112 @@
+import argparse
+import logging
+import os
+import sys
+from config.database import SessionLocal, init_database
+from config.migrations import run_migrations
+from config.settings import config
+from app.logs import configure_logging
+from services import aggregates
+
+
+def migrate(args):
+    from app.main import migrate as migrate_schema
+    created = migrate_schema()
+    print(f"Schema up to date ({len(created)} indexes created{': ' + ', '.join(created) if created else ''})")
+
+
+# Backends that keep their state inside one process; with several workers each
+# would hold its own copy (and every memory job queue would requeue the same
+# pending expenses)
+SHARED_BACKENDS = ("LLM_CACHE_BACKEND", "JOB_QUEUE_BACKEND", "SHARED_STATE_BACKEND")
+
+
+def cpu_count() -> int:
+    # Cores this process may run on, which a container or taskset can limit
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def serve(args):
+    import uvicorn
+
+    workers = args.workers or config["WEB_CONCURRENCY"] or cpu_count()
+    if workers > 1:
+        for key in SHARED_BACKENDS:
+            if key not in os.environ:
+                os.environ[key] = "sqlite"
+            elif os.environ[key].lower() == "memory":
+                logging.getLogger(__name__).warning(
+                    "Backend is per process; workers will not share it", extra={"setting": key, "workers": workers}
+                )
+    # Migrate once here rather than racing to do it in every worker
+    migrate(args)
+    os.environ["MIGRATE_ON_STARTUP"] = "false"
+    uvicorn.run(
+        "app.main:app", host=args.host, port=args.port, workers=workers,
+        # Requests are logged by ObservabilityMiddleware; keep uvicorn's logs on our handler
+        log_config=None, access_log=False, proxy_headers=True,
+        forwarded_allow_ips=args.forwarded_allow_ips, timeout_keep_alive=args.keep_alive,
+    )
+
+
+def rebuild_aggregates(args):
+    with SessionLocal() as db:
+        rows = aggregates.rebuild(db, args.user_id)
+    print(f"Rebuilt monthly aggregates: {rows} rows")
+
+
+def verify_aggregates(args):
+    with SessionLocal() as db:
+        drift = aggregates.verify(db, args.user_id)
+        for row in drift:
+            print(
+                f"user {row['user_id']} {row['month']} {row['category']}: "
+                f"stored {row['stored_total']:.2f}/{row['stored_count']} "
+                f"expected {row['expected_total']:.2f}/{row['expected_count']}"
+            )
+        if not drift:
+            print("Monthly aggregates match the expenses table")
+            return 0
+        if args.repair:
+            rows = aggregates.rebuild(db, args.user_id)
+            print(f"Repaired {len(drift)} drifted groups ({rows} rows rebuilt)")
+            return 0
+    return 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Finance Mentor maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("migrate", help="Create missing tables and indexes").set_defaults(handler=migrate)
+
+    server = commands.add_parser("serve", help="Run the API with one worker process per CPU core")
+    server.add_argument("--host", default="0.0.0.0")
+    server.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    server.add_argument("--workers", type=int, help="default: WEB_CONCURRENCY, else the number of CPU cores")
+    server.add_argument("--forwarded-allow-ips", default="127.0.0.1",
+                        help="proxies trusted for X-Forwarded-* headers ('*' for any)")
+    server.add_argument("--keep-alive", type=int, default=5, help="idle keep-alive timeout, seconds")
+    server.set_defaults(handler=serve)
+
+    rebuild = commands.add_parser("rebuild-aggregates", help="Recompute monthly aggregates from expenses")
+    rebuild.add_argument("--user-id", type=int)
+    rebuild.set_defaults(handler=rebuild_aggregates)
+
+    verify = commands.add_parser("verify-aggregates", help="Report monthly aggregate drift")
+    verify.add_argument("--user-id", type=int)
+    verify.add_argument("--repair", action="store_true", help="Rebuild when drift is found")
+    verify.set_defaults(handler=verify_aggregates)
+
+    args = parser.parse_args(argv)
+    configure_logging()
+    _, write_engine = init_database()
+    if args.command not in ("migrate", "serve"):
+        run_migrations(write_engine)
+    return args.handler(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
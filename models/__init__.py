@@ -1,3 +1,4 @@
 from .user import User
 from .expense import Expense
-from .budget import Budget
\ No newline at end of file
+from .budget import Budget
+from .monthly_aggregate import MonthlyAggregate
@@ -1,14 +1,32 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import BigInteger, Column, Integer, String, ForeignKey, Index
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 from config.database import Base
+from utils.money import from_cents, to_cents
 
 class Budget(Base):
     __tablename__ = "budgets"
 
     id = Column(Integer, primary_key=True, index=True)
     category = Column(String)
-    amount = Column(Float)
+    amount_cents = Column(BigInteger)  # exact integer cents; `amount` is the dollar view
     month = Column(String)  # Format: "2024-01"
     user_id = Column(Integer, ForeignKey("users.id"))
 
     owner = relationship("User", back_populates="budgets")
+
+    @hybrid_property
+    def amount(self):
+        return from_cents(self.amount_cents)
+
+    @amount.setter
+    def amount(self, value):
+        self.amount_cents = None if value is None else to_cents(value)
+
+    @amount.expression
+    def amount(cls):
+        return cls.amount_cents / 100.0
+
+    __table_args__ = (
+        Index("ix_budgets_user_month", "user_id", "month"),
+    )
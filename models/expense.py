@@ -1,16 +1,37 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from config.database import Base
+from utils.money import from_cents, to_cents
 
 class Expense(Base):
     __tablename__ = "expenses"
 
     id = Column(Integer, primary_key=True, index=True)
-    amount = Column(Float)
+    amount_cents = Column(BigInteger)  # exact integer cents; `amount` is the dollar view
     description = Column(String)
     category = Column(String)
     date = Column(DateTime, default=datetime.utcnow)
     user_id = Column(Integer, ForeignKey("users.id"))
 
     owner = relationship("User", back_populates="expenses")
+
+    @hybrid_property
+    def amount(self):
+        return from_cents(self.amount_cents)
+
+    @amount.setter
+    def amount(self, value):
+        self.amount_cents = None if value is None else to_cents(value)
+
+    @amount.expression
+    def amount(cls):
+        return cls.amount_cents / 100.0
+
+    __table_args__ = (
+        # Every hot query filters on user_id, then ranges or sorts on date
+        Index("ix_expenses_user_date", "user_id", "date"),
+        # Covers the categorizer's per-user (description, category) counts
+        Index("ix_expenses_user_description_category", "user_id", "description", "category"),
+    )
@@ -0,0 +1,27 @@
+from sqlalchemy import BigInteger, Column, Integer, String, ForeignKey, UniqueConstraint
+from sqlalchemy.ext.hybrid import hybrid_property
+from config.database import Base
+from utils.money import from_cents
+
+class MonthlyAggregate(Base):
+    """Running (user, month, category) totals, kept in step with expenses."""
+    __tablename__ = "monthly_aggregates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    month = Column(String, nullable=False)  # Format: "2024-01"
+    category = Column(String, nullable=False)
+    total_cents = Column(BigInteger, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "month", "category", name="uq_monthly_aggregates_user_month_category"),
+    )
+
+    @hybrid_property
+    def total(self):
+        return from_cents(self.total_cents)
+
+    @total.expression
+    def total(cls):
+        return cls.total_cents / 100.0
@@ -1,9 +1,11 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Optional
+from utils.money import MAX_AMOUNT
 
 class BudgetCreate(BaseModel):
     category: str
-    amount: float
-    month: str
+    amount: float = Field(allow_inf_nan=False, gt=-MAX_AMOUNT, lt=MAX_AMOUNT)
+    month: str = Field(pattern=r"^\d{4}-(0[1-9]|1[0-2])$")  # "2024-01"
 
 class BudgetResponse(BaseModel):
     id: int
@@ -13,3 +15,14 @@ class BudgetResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+class BudgetStatus(BaseModel):
+    budget_id: int
+    category: str
+    month: str
+    budget: float
+    spent: float
+    remaining: float
+    percent_used: Optional[float] = None
+    projected_spend: float
+    projected_overspend: float
@@ -1,11 +1,20 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
+from utils.dates import naive_utc
+from utils.money import MAX_AMOUNT
 
 class ExpenseCreate(BaseModel):
-    amount: float
+    amount: float = Field(allow_inf_nan=False, gt=-MAX_AMOUNT, lt=MAX_AMOUNT)
     description: str
     category: Optional[str] = None
+    date: Optional[datetime] = None
+
+    @field_validator("date")
+    @classmethod
+    def date_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        # Stored as naive UTC, so the expense counts toward the right month
+        return naive_utc(value)
 
 class ExpenseResponse(BaseModel):
     id: int
@@ -13,6 +22,20 @@ class ExpenseResponse(BaseModel):
     description: str
     category: str
     date: datetime
+    category_source: Optional[str] = None
 
     class Config:
         from_attributes = True
+
+class ExpenseImportError(BaseModel):
+    row: int
+    error: str
+
+class ExpenseImportResponse(BaseModel):
+    imported: int
+    failed: int
+    categorized_by: Dict[str, int]
+    errors: List[ExpenseImportError]
+    errors_truncated: bool = False
+    elapsed_seconds: float
+    rows_per_second: float
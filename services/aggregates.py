@@ -0,0 +1,142 @@
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, func, insert, literal_column, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from models.expense import Expense
+from models.monthly_aggregate import MonthlyAggregate
+from utils.money import from_cents
+
+logger = logging.getLogger(__name__)
+
+
+def month_key(date: datetime) -> str:
+    return date.strftime("%Y-%m")
+
+
+def previous_month(month: str) -> str:
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{year - 1}-12" if number == 1 else f"{year}-{number - 1:02d}"
+
+
+def month_expr(column, dialect_name: str):
+    """SQL expression formatting a datetime column as "YYYY-MM".
+
+    Format strings are inlined rather than bound: Postgres only matches a
+    SELECT expression to its GROUP BY when both are textually identical.
+    """
+    if dialect_name == "postgresql":
+        return func.to_char(column, literal_column("'YYYY-MM'"))
+    return func.strftime(literal_column("'%Y-%m'"), column)
+
+
+def _upsert(dialect_name: str):
+    dialect_insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    stmt = dialect_insert(MonthlyAggregate)
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "month", "category"],
+        set_={
+            "total_cents": MonthlyAggregate.total_cents + stmt.excluded.total_cents,
+            "count": MonthlyAggregate.count + stmt.excluded.count,
+        },
+    )
+
+
+def record_expenses(db: Session, rows: Iterable[Tuple[int, datetime, str, int]], sign: int = 1):
+    """Fold (user_id, date, category, amount_cents) rows into the rollup.
+
+    sign=-1 takes the rows back out, e.g. when an expense changes category.
+    Runs in the caller's transaction so the rollup commits (or rolls back)
+    together with the expenses themselves.
+    """
+    deltas: Dict[Tuple[int, str, str], List[int]] = defaultdict(lambda: [0, 0])
+    for user_id, date, category, amount_cents in rows:
+        delta = deltas[(user_id, month_key(date), category)]
+        delta[0] += sign * amount_cents
+        delta[1] += sign
+    if not deltas:
+        return
+    db.execute(_upsert(db.bind.dialect.name), [
+        {"user_id": user_id, "month": month, "category": category, "total_cents": total, "count": count}
+        for (user_id, month, category), (total, count) in deltas.items()
+    ])
+
+
+def record_expense(db: Session, expense: Expense):
+    record_expenses(db, [(expense.user_id, expense.date, expense.category, expense.amount_cents)])
+
+
+def monthly_breakdown(db: Session, user_id: int, month: str) -> List[MonthlyAggregate]:
+    return monthly_breakdowns(db, user_id, [month])
+
+
+def monthly_breakdowns(db: Session, user_id: int, months: List[str]) -> List[MonthlyAggregate]:
+    """Rollup rows for several months in one indexed query (categories x months rows)."""
+    return db.query(MonthlyAggregate).filter(
+        MonthlyAggregate.user_id == user_id,
+        MonthlyAggregate.month.in_(months),
+        MonthlyAggregate.count > 0
+    ).all()
+
+
+def _expected_query(dialect_name: str, user_id: Optional[int] = None):
+    month = month_expr(Expense.date, dialect_name)
+    category = func.coalesce(Expense.category, literal_column("'Other'"))
+    query = select(
+        Expense.user_id,
+        month.label("month"),
+        category.label("category"),
+        func.sum(Expense.amount_cents).label("total_cents"),
+        func.count(Expense.id).label("count"),
+    ).where(Expense.user_id.isnot(None), Expense.date.isnot(None))
+    if user_id is not None:
+        query = query.where(Expense.user_id == user_id)
+    return query.group_by(Expense.user_id, month, category)
+
+
+def rebuild(db: Session, user_id: Optional[int] = None) -> int:
+    """Recompute the rollup from the expenses table. Returns the number of rows written."""
+    clear = delete(MonthlyAggregate)
+    if user_id is not None:
+        clear = clear.where(MonthlyAggregate.user_id == user_id)
+    db.execute(clear)
+    expected = _expected_query(db.bind.dialect.name, user_id).subquery()
+    result = db.execute(insert(MonthlyAggregate).from_select(
+        ["user_id", "month", "category", "total_cents", "count"],
+        select(expected.c.user_id, expected.c.month, expected.c.category, expected.c.total_cents, expected.c.count)
+    ))
+    db.commit()
+    return result.rowcount
+
+
+def verify(db: Session, user_id: Optional[int] = None) -> List[dict]:
+    """Compare the rollup with the expenses table and return every mismatch."""
+    expected = {
+        (row.user_id, row.month, row.category): (row.total_cents or 0, row.count)
+        for row in db.execute(_expected_query(db.bind.dialect.name, user_id))
+    }
+    stored_query = db.query(MonthlyAggregate)
+    if user_id is not None:
+        stored_query = stored_query.filter(MonthlyAggregate.user_id == user_id)
+    stored = {(a.user_id, a.month, a.category): (a.total_cents, a.count) for a in stored_query}
+
+    drift = []
+    for key in sorted(expected.keys() | stored.keys()):
+        want_total, want_count = expected.get(key, (0, 0))
+        have_total, have_count = stored.get(key, (0, 0))
+        if (want_total, want_count) != (have_total, have_count):
+            drift.append({
+                "user_id": key[0], "month": key[1], "category": key[2],
+                "expected_total": from_cents(want_total), "stored_total": from_cents(have_total),
+                "expected_count": want_count, "stored_count": have_count,
+            })
+    return drift
+
+
+def backfill_if_empty(db: Session):
+    """Populate the rollup once for databases that predate it."""
+    if db.query(MonthlyAggregate.id).first() is None and db.query(Expense.id).first() is not None:
+        rows = rebuild(db)
+        logger.info("Backfilled monthly aggregates", extra={"rows": rows})
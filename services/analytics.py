@@ -0,0 +1,145 @@
+"""Spending time series and category breakdowns over arbitrary date ranges.
+
+Grouping happens in SQL, so a response costs one query whose result has
+at most (buckets x categories) rows, however many expenses the range
+covers. Month buckets are read from the monthly_aggregates rollup. Results
+are columnar: parallel arrays aligned with `periods`, with empty buckets
+filled with zeros so charts need no client-side gap filling.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, literal_column
+from sqlalchemy.orm import Session
+from models.expense import Expense
+from models.monthly_aggregate import MonthlyAggregate
+from services.aggregates import month_expr, month_key
+from utils.dates import naive_utc
+from utils.money import from_cents
+
+BUCKETS = ("day", "week", "month")
+# Ten years of daily points
+MAX_BUCKETS = 3660
+# Range used when the caller gives no start
+DEFAULT_BUCKETS = {"day": 30, "week": 12, "month": 12}
+
+
+def bucket_start(date: datetime, bucket: str) -> datetime:
+    day = date.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start: datetime, bucket: str) -> datetime:
+    if bucket == "day":
+        return start + timedelta(days=1)
+    if bucket == "week":
+        return start + timedelta(weeks=1)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def bucket_key(start: datetime, bucket: str) -> str:
+    return month_key(start) if bucket == "month" else start.strftime("%Y-%m-%d")
+
+
+def bucket_expr(column, bucket: str, dialect_name: str):
+    """SQL expression giving bucket_key() of a datetime column (weeks start on Monday)."""
+    if bucket == "month":
+        return month_expr(column, dialect_name)
+    if dialect_name == "postgresql":
+        if bucket == "week":
+            column = func.date_trunc(literal_column("'week'"), column)
+        return func.to_char(column, literal_column("'YYYY-MM-DD'"))
+    if bucket == "week":
+        # 'weekday 0' moves forward to Sunday (or stays on one); six days back is that week's Monday
+        return func.date(column, literal_column("'weekday 0'"), literal_column("'-6 days'"))
+    return func.date(column)
+
+
+def resolve_range(bucket: str, start: Optional[datetime], end: Optional[datetime],
+                  now: Optional[datetime] = None) -> Tuple[datetime, datetime, List[str]]:
+    """Widen [start, end) to whole buckets; returns it with every bucket key in order.
+
+    Raises ValueError for an empty range or one with more than MAX_BUCKETS buckets.
+    """
+    start, end = naive_utc(start), naive_utc(end)
+    now = now or datetime.now()
+    end = end or next_bucket(bucket_start(now, bucket), bucket)
+    if start is None:
+        start = bucket_start(end - timedelta(microseconds=1), bucket)
+        for _ in range(DEFAULT_BUCKETS[bucket] - 1):
+            start = bucket_start(start - timedelta(days=1), bucket)
+    if start >= end:
+        raise ValueError("start must be before end")
+
+    start = bucket_start(start, bucket)
+    keys, cursor = [], start
+    while cursor < end:
+        if len(keys) == MAX_BUCKETS:
+            raise ValueError(f"Range spans more than {MAX_BUCKETS} {bucket} buckets")
+        keys.append(bucket_key(cursor, bucket))
+        cursor = next_bucket(cursor, bucket)
+    return start, cursor, keys
+
+
+def _grouped_rows(db: Session, user_id: int, bucket: str, start: datetime, end: datetime,
+                  category: Optional[str]):
+    """(period, category, total_cents, count) for the range, one row per non-empty pair."""
+    if bucket == "month":
+        query = db.query(
+            MonthlyAggregate.month, MonthlyAggregate.category, MonthlyAggregate.total_cents, MonthlyAggregate.count
+        ).filter(
+            MonthlyAggregate.user_id == user_id,
+            MonthlyAggregate.month >= month_key(start),
+            MonthlyAggregate.month < month_key(end),
+            MonthlyAggregate.count > 0
+        )
+        if category:
+            query = query.filter(MonthlyAggregate.category == category)
+        return query.all()
+
+    period = bucket_expr(Expense.date, bucket, db.bind.dialect.name)
+    expense_category = func.coalesce(Expense.category, literal_column("'Other'"))
+    query = db.query(
+        period, expense_category, func.sum(Expense.amount_cents), func.count(Expense.id)
+    ).filter(Expense.user_id == user_id, Expense.date >= start, Expense.date < end)
+    if category:
+        query = query.filter(Expense.category == category)
+    return query.group_by(period, expense_category).all()
+
+
+def get_spending_analytics(db: Session, user_id: int, bucket: str = "day", start: Optional[datetime] = None,
+                           end: Optional[datetime] = None, category: Optional[str] = None) -> dict:
+    start, end, periods = resolve_range(bucket, start, end)
+    position = {key: i for i, key in enumerate(periods)}
+    totals = [0] * len(periods)
+    counts = [0] * len(periods)
+    by_category: Dict[str, List[int]] = defaultdict(lambda: [0] * len(periods))
+    category_totals: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+
+    for period, row_category, total_cents, count in _grouped_rows(db, user_id, bucket, start, end, category):
+        i = position[period]
+        totals[i] += total_cents or 0
+        counts[i] += count
+        by_category[row_category][i] += total_cents or 0
+        category_totals[row_category][0] += total_cents or 0
+        category_totals[row_category][1] += count
+
+    ranked = sorted(category_totals, key=lambda c: (-category_totals[c][0], c))
+    return {
+        "bucket": bucket,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "periods": periods,
+        "total": [from_cents(cents) for cents in totals],
+        "count": counts,
+        "by_category": {c: [from_cents(cents) for cents in by_category[c]] for c in ranked},
+        "categories": {
+            "category": ranked,
+            "total": [from_cents(category_totals[c][0]) for c in ranked],
+            "count": [category_totals[c][1] for c in ranked],
+        },
+    }
@@ -0,0 +1,84 @@
+import calendar
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+from models.budget import Budget
+from models.monthly_aggregate import MonthlyAggregate
+from services.aggregates import month_key
+from utils.money import from_cents
+
+
+SPENT_CENTS = func.coalesce(MonthlyAggregate.total_cents, 0)
+
+
+def _with_spending(db: Session, user_id: int):
+    """Budgets joined to their month's running category total.
+
+    monthly_aggregates is updated in the same transaction as every expense
+    insert, so this is one index lookup per budget and never reads expenses.
+    """
+    return db.query(Budget, SPENT_CENTS.label("spent_cents")).outerjoin(
+        MonthlyAggregate,
+        and_(
+            MonthlyAggregate.user_id == Budget.user_id,
+            MonthlyAggregate.month == Budget.month,
+            MonthlyAggregate.category == Budget.category,
+        ),
+    ).filter(Budget.user_id == user_id)
+
+
+def _elapsed_fraction(month: str, now: datetime) -> float:
+    """Share of `month` that has passed: 0 for future months, 1 for past ones."""
+    try:
+        start = datetime.strptime(month, "%Y-%m")
+    except ValueError:
+        return 1.0
+    days = calendar.monthrange(start.year, start.month)[1]
+    elapsed_days = (now - start).total_seconds() / 86400
+    if elapsed_days <= 0:
+        return 0.0
+    # Count at least one day so a purchase on the 1st isn't projected thirtyfold
+    return min(max(elapsed_days, 1.0) / days, 1.0)
+
+
+def budget_status(budget: Budget, spent_cents: int, now: datetime) -> dict:
+    fraction = _elapsed_fraction(budget.month, now)
+    projected_cents = round(spent_cents / fraction) if 0 < fraction < 1 else spent_cents
+    return {
+        "budget_id": budget.id,
+        "category": budget.category,
+        "month": budget.month,
+        "budget": budget.amount,
+        "spent": from_cents(spent_cents),
+        "remaining": from_cents(budget.amount_cents - spent_cents),
+        "percent_used": round(spent_cents * 100 / budget.amount_cents, 1) if budget.amount_cents else None,
+        "projected_spend": from_cents(projected_cents),
+        "projected_overspend": from_cents(max(projected_cents - budget.amount_cents, 0)),
+    }
+
+
+def get_budget_statuses(db: Session, user_id: int, month: Optional[str] = None) -> List[dict]:
+    """Spent, remaining and projected month-end spend for each budget (one month, or all)."""
+    query = _with_spending(db, user_id)
+    if month:
+        query = query.filter(Budget.month == month)
+    now = datetime.now()
+    return [
+        budget_status(budget, spent_cents, now)
+        for budget, spent_cents in query.order_by(Budget.month, Budget.category, Budget.id)
+    ]
+
+
+def get_budget_alerts(db: Session, user_id: int, threshold: float, month: Optional[str] = None) -> List[dict]:
+    """Budgets whose spending has reached `threshold` percent, worst first.
+
+    The comparison runs in SQL so only crossing budgets are loaded.
+    """
+    month = month or month_key(datetime.now())
+    query = _with_spending(db, user_id).filter(
+        Budget.month == month, SPENT_CENTS * 100 >= Budget.amount_cents * threshold
+    )
+    now = datetime.now()
+    statuses = [budget_status(budget, spent_cents, now) for budget, spent_cents in query]
+    return sorted(statuses, key=lambda s: s["percent_used"] if s["percent_used"] is not None else float("inf"), reverse=True)
@@ -0,0 +1,113 @@
+"""Background categorization of expenses stored as Pending.
+
+POST /expenses stores an expense the local categorizer is unsure about
+under PENDING_CATEGORY and queues its id. Workers then take micro-batches,
+ask the LLM about the whole batch in one call and move each row and its
+rollup totals from Pending to the answer. Updates only touch rows that
+are still Pending, so a job can run twice without harm.
+"""
+import logging
+from typing import List
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from config.database import SessionLocal
+from models.expense import Expense
+from services.aggregates import record_expenses
+from services.categorizer import (
+    PENDING_CATEGORY, CategoryResult, ask_llm_categories, categorizer, ensure_history_loaded
+)
+from app import ai, jobs
+from app.ai import invalidate_user_cache
+
+logger = logging.getLogger(__name__)
+
+CATEGORIZE_JOB = "categorize"
+
+
+def enqueue_categorization(expense: Expense):
+    jobs.job_runner.submit(CATEGORIZE_JOB, {"expense_id": expense.id, "user_id": expense.user_id})
+
+
+def _pending_rows(db: Session, payloads: List[dict]) -> List[Expense]:
+    return db.query(Expense).filter(
+        Expense.id.in_([p["expense_id"] for p in payloads]),
+        Expense.category == PENDING_CATEGORY
+    ).order_by(Expense.id).all()
+
+
+def _local_results(db: Session, rows: List[Expense]) -> List[CategoryResult]:
+    results = []
+    for expense in rows:
+        ensure_history_loaded(db, expense.user_id)
+        results.append(categorizer.categorize(expense.description, expense.user_id))
+    return results
+
+
+def apply_categories(db: Session, rows: List[Expense], categories: List[str]):
+    """Move rows out of Pending, with their rollup totals, in one transaction."""
+    moved = []
+    for expense, category in zip(rows, categories):
+        result = db.execute(
+            update(Expense)
+            .where(Expense.id == expense.id, Expense.category == PENDING_CATEGORY)
+            .values(category=category)
+            .execution_options(synchronize_session=False)
+        )
+        # Another worker got there first
+        if result.rowcount:
+            moved.append((expense, category))
+    record_expenses(db, [(e.user_id, e.date, PENDING_CATEGORY, e.amount_cents) for e, _ in moved], sign=-1)
+    record_expenses(db, [(e.user_id, e.date, category, e.amount_cents) for e, category in moved])
+    db.commit()
+    for user_id in {e.user_id for e, _ in moved}:
+        invalidate_user_cache(user_id)
+    for expense, category in moved:
+        categorizer.learn(expense.user_id, expense.description, category)
+
+
+def categorize_pending(payloads: List[dict]):
+    """Job handler: one LLM call for every still-uncertain expense in the batch.
+
+    Errors propagate so the runner retries the batch with backoff.
+    """
+    with SessionLocal() as db:
+        rows = _pending_rows(db, payloads)
+        if not rows:
+            return
+        # Earlier jobs may have taught the categorizer enough to skip the LLM
+        local = _local_results(db, rows)
+        categories = [r.category for r in local]
+        unsure = [i for i, r in enumerate(local) if r.confidence < categorizer.threshold]
+        if unsure and ai.model:
+            answers = ask_llm_categories([(rows[i].description, rows[i].amount) for i in unsure], ai.model)
+            for n, category in answers.items():
+                categories[unsure[n]] = category
+        apply_categories(db, rows, categories)
+
+
+def categorize_locally_after_failures(payloads: List[dict]):
+    """Give-up hook: settle for the local categorizer's best guess."""
+    with SessionLocal() as db:
+        rows = _pending_rows(db, payloads)
+        apply_categories(db, rows, [r.category for r in _local_results(db, rows)])
+
+
+def requeue_pending(db: Session) -> int:
+    """Queue every Pending expense again; jobs in a memory queue die with the process."""
+    ids = db.query(Expense.id, Expense.user_id).filter(Expense.category == PENDING_CATEGORY).all()
+    for expense_id, user_id in ids:
+        jobs.job_runner.submit(CATEGORIZE_JOB, {"expense_id": expense_id, "user_id": user_id})
+    return len(ids)
+
+
+def start_categorization_workers():
+    job_runner = jobs.job_runner
+    if job_runner is None:
+        return
+    job_runner.register(CATEGORIZE_JOB, categorize_pending, give_up=categorize_locally_after_failures)
+    if not job_runner.queue.durable:
+        with SessionLocal() as db:
+            requeued = requeue_pending(db)
+        if requeued:
+            logger.info("Requeued pending expenses for categorization", extra={"expenses": requeued})
+    job_runner.start()
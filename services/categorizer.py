@@ -0,0 +1,308 @@
+import logging
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from config.settings import config
+from models.expense import Expense
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ["Food", "Transportation", "Entertainment", "Shopping", "Bills", "Other"]
+
+# Placeholder for expenses whose category a background job is still working out
+PENDING_CATEGORY = "Pending"
+
+# "Other" says nothing about a description, so it is never learned
+LEARNED_CATEGORIES = [category for category in CATEGORIES if category != "Other"]
+
+# Below this confidence the local answer is not trusted and the LLM is asked
+CONFIDENCE_THRESHOLD = 0.6
+
+MERCHANTS = {
+    "starbucks": "Food", "mcdonalds": "Food", "mcdonald's": "Food", "burger king": "Food",
+    "chipotle": "Food", "dunkin": "Food", "domino's": "Food", "dominos": "Food",
+    "pizza hut": "Food", "kfc": "Food", "taco bell": "Food", "whole foods": "Food",
+    "trader joe's": "Food", "safeway": "Food", "kroger": "Food", "uber eats": "Food",
+    "doordash": "Food", "grubhub": "Food", "swiggy": "Food", "zomato": "Food",
+    "uber": "Transportation", "lyft": "Transportation", "ola": "Transportation",
+    "shell": "Transportation", "chevron": "Transportation", "exxon": "Transportation",
+    "amtrak": "Transportation", "delta": "Transportation", "united airlines": "Transportation",
+    "netflix": "Entertainment", "spotify": "Entertainment", "hulu": "Entertainment",
+    "disney+": "Entertainment", "hbo": "Entertainment", "steam": "Entertainment",
+    "playstation": "Entertainment", "xbox": "Entertainment", "amc": "Entertainment",
+    "ticketmaster": "Entertainment",
+    "amazon": "Shopping", "walmart": "Shopping", "target": "Shopping", "ikea": "Shopping",
+    "best buy": "Shopping", "costco": "Shopping", "ebay": "Shopping", "etsy": "Shopping",
+    "zara": "Shopping", "h&m": "Shopping", "nike": "Shopping", "flipkart": "Shopping",
+    "comcast": "Bills", "verizon": "Bills", "at&t": "Bills", "t-mobile": "Bills",
+    "pg&e": "Bills", "xfinity": "Bills", "geico": "Bills",
+}
+
+KEYWORDS = {
+    "Food": {"coffee", "lunch", "dinner", "breakfast", "brunch", "restaurant", "cafe",
+             "grocery", "groceries", "pizza", "burger", "snack", "snacks", "food", "meal",
+             "bakery", "takeout", "tea", "drinks", "bar"},
+    "Transportation": {"taxi", "cab", "bus", "train", "metro", "fuel", "gas", "petrol",
+                       "diesel", "parking", "toll", "flight", "airfare", "ride", "car"},
+    "Entertainment": {"movie", "movies", "cinema", "concert", "game", "games", "tickets",
+                      "theatre", "theater", "show", "music", "streaming", "museum"},
+    "Shopping": {"clothes", "clothing", "shoes", "shirt", "jeans", "electronics", "mall",
+                 "gift", "gifts", "furniture", "shopping", "store", "book", "books"},
+    "Bills": {"rent", "electricity", "electric", "water", "internet", "wifi", "phone",
+              "mobile", "utility", "utilities", "insurance", "bill", "mortgage", "loan"},
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9&'+-]+")
+# Longest names first so "uber eats" wins over "uber"
+_MERCHANT_RE = re.compile(
+    r"(?<![a-z0-9])("
+    + "|".join(re.escape(m) for m in sorted(MERCHANTS, key=len, reverse=True))
+    + r")(?![a-z0-9])"
+)
+
+
+@dataclass
+class CategoryResult:
+    category: str
+    confidence: float
+    source: str  # "user", "history", "merchant", "keyword", "llm" or "default"
+
+
+def normalize_description(description: str) -> str:
+    return " ".join(_TOKEN_RE.findall((description or "").lower()))
+
+
+def normalize_category(text: Optional[str]) -> Optional[str]:
+    """Map free-form model output onto one of CATEGORIES."""
+    if not text:
+        return None
+    cleaned = text.strip().strip(".\"'*` ").lower()
+    for category in CATEGORIES:
+        if cleaned == category.lower():
+            return category
+    for category in CATEGORIES:
+        if category.lower() in cleaned:
+            return category
+    return None
+
+
+class _UserHistory:
+    """Category counts per normalized description and per token, for one user."""
+
+    __slots__ = ("exact", "tokens")
+
+    def __init__(self):
+        self.exact: Dict[str, Counter] = defaultdict(Counter)
+        self.tokens: Dict[str, Counter] = defaultdict(Counter)
+
+    def learn(self, description: str, category: str, count: int = 1):
+        if category not in LEARNED_CATEGORIES:
+            return
+        normalized = normalize_description(description)
+        if not normalized:
+            return
+        self.exact[normalized][category] += count
+        for token in set(normalized.split()):
+            self.tokens[token][category] += count
+
+
+class Categorizer:
+    """In-process expense categorizer.
+
+    Combines a merchant table and keyword lists with what each user has
+    already assigned, so most expenses are categorized without an LLM. The
+    histories of the CATEGORIZER_CACHE_USERS most recently seen users are
+    kept; an evicted user's is loaded again on their next expense.
+    """
+
+    def __init__(self, threshold: float = CONFIDENCE_THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._users: "OrderedDict[int, _UserHistory]" = OrderedDict()
+
+    def is_loaded(self, user_id: int) -> bool:
+        with self._lock:
+            return user_id in self._users
+
+    def load_history(self, user_id: int, rows: Iterable[Tuple[str, str, int]]):
+        """Take a user's (description, category, count) rows, unless already loaded."""
+        history = _UserHistory()
+        for description, category, count in rows:
+            history.learn(description, category, count)
+        with self._lock:
+            if user_id in self._users:
+                return
+            self._users[user_id] = history
+            while len(self._users) > config["CATEGORIZER_CACHE_USERS"]:
+                self._users.popitem(last=False)
+
+    def forget(self, user_id: int):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def learn(self, user_id: int, description: str, category: str):
+        with self._lock:
+            # Unloaded users pick this row up from the table on first load
+            history = self._users.get(user_id)
+            if history is not None:
+                history.learn(description, category)
+
+    def _history(self, user_id: Optional[int]) -> Optional[_UserHistory]:
+        if user_id is None:
+            return None
+        with self._lock:
+            history = self._users.get(user_id)
+            if history is not None:
+                self._users.move_to_end(user_id)
+            return history
+
+    def categorize(self, description: str, user_id: Optional[int] = None) -> CategoryResult:
+        normalized = normalize_description(description)
+        if not normalized:
+            return CategoryResult("Other", 0.0, "default")
+
+        history = self._history(user_id)
+        if history is not None:
+            seen = history.exact.get(normalized)
+            if seen:
+                category, count = seen.most_common(1)[0]
+                share = count / sum(seen.values())
+                if share >= 0.8:
+                    return CategoryResult(category, share, "history")
+
+        merchant = _MERCHANT_RE.search(normalized)
+        if merchant:
+            return CategoryResult(MERCHANTS[merchant.group(1)], 0.95, "merchant")
+
+        keyword_scores = Counter()
+        history_scores = Counter()
+        user_tokens = history.tokens if history is not None else {}
+        for token in normalized.split():
+            for category, words in KEYWORDS.items():
+                if token in words:
+                    keyword_scores[category] += 1.0
+            seen = user_tokens.get(token)
+            if seen:
+                total = sum(seen.values())
+                for category, count in seen.items():
+                    history_scores[category] += count / total
+
+        scores = keyword_scores + history_scores
+        if not scores:
+            return CategoryResult("Other", 0.0, "default")
+
+        category, top = scores.most_common(1)[0]
+        # The 0.5 prior keeps a single weak signal from looking certain
+        confidence = top / (sum(scores.values()) + 0.5)
+        source = "keyword" if keyword_scores[category] >= history_scores[category] else "history"
+        return CategoryResult(category, round(confidence, 3), source)
+
+
+categorizer = Categorizer()
+
+CATEGORIZE_PROMPT = (
+    "Categorize this expense into one of these categories: Food, Transportation, "
+    "Entertainment, Shopping, Bills, Other. Expense: '{description} ${amount}'. "
+    "Respond with only the category name."
+)
+
+BATCH_CATEGORIZE_PROMPT = (
+    "Categorize each expense below into one of these categories: Food, Transportation, "
+    "Entertainment, Shopping, Bills, Other. Respond with one line per expense in the "
+    "form '<number>. <category>' and nothing else.\n{items}"
+)
+
+_NUMBERED_LINE_RE = re.compile(r"^\s*(\d+)\s*[.):-]\s*(.+?)\s*$", re.MULTILINE)
+
+
+def ensure_history_loaded(db: Session, user_id: int):
+    if categorizer.is_loaded(user_id):
+        return
+    # One row per distinct (description, category), read from the covering index
+    rows = db.execute(
+        select(Expense.description, Expense.category, func.count())
+        .where(Expense.user_id == user_id, Expense.category.in_(LEARNED_CATEGORIES))
+        .group_by(Expense.description, Expense.category)
+    ).all()
+    categorizer.load_history(user_id, rows)
+
+
+def categorize_locally(db: Session, description: str, user_id: int) -> CategoryResult:
+    ensure_history_loaded(db, user_id)
+    return categorizer.categorize(description, user_id)
+
+
+def categorize_expense(db: Session, description: str, amount: float, user_id: int, model=None) -> CategoryResult:
+    """Categorize locally and only fall back to the LLM for low-confidence results."""
+    result = categorize_locally(db, description, user_id)
+    if result.confidence >= categorizer.threshold or not model:
+        return result
+
+    try:
+        response = model.generate_content(CATEGORIZE_PROMPT.format(description=description, amount=amount), user_id=user_id)
+        category = normalize_category(response.text)
+        if category:
+            return CategoryResult(category, 1.0, "llm")
+    except Exception as e:
+        logger.warning("LLM categorization failed", extra={"error": str(e)})
+
+    return result
+
+
+async def categorize_expense_async(db: AsyncSession, description: str, amount: float, user_id: int, model=None) -> CategoryResult:
+    """categorize_expense for async sessions; the LLM call does not block a thread."""
+    result = await db.run_sync(categorize_locally, description, user_id)
+    if result.confidence >= categorizer.threshold or not model:
+        return result
+
+    try:
+        response = await model.generate_content_async(
+            CATEGORIZE_PROMPT.format(description=description, amount=amount), user_id=user_id
+        )
+        category = normalize_category(response.text)
+        if category:
+            return CategoryResult(category, 1.0, "llm")
+    except Exception as e:
+        logger.warning("LLM categorization failed", extra={"error": str(e)})
+
+    return result
+
+
+def ask_llm_categories(items: List[Tuple[str, float]], model, user_id: Optional[int] = None) -> Dict[int, str]:
+    """One LLM call for a list of (description, amount); maps item index to category.
+
+    Items the model skipped or answered unintelligibly are left out. Errors
+    from the model propagate to the caller. Pass user_id when every item
+    belongs to one user, so the call counts against that user's rate limit.
+    """
+    lines = "\n".join(f"{n}. {description} ${amount}" for n, (description, amount) in enumerate(items, start=1))
+    response = model.generate_content(BATCH_CATEGORIZE_PROMPT.format(items=lines), user_id=user_id)
+    answers = {}
+    for match in _NUMBERED_LINE_RE.finditer(response.text):
+        n = int(match.group(1))
+        category = normalize_category(match.group(2))
+        if category and 1 <= n <= len(items):
+            answers[n - 1] = category
+    return answers
+
+
+def categorize_many(db: Session, items: List[Tuple[str, float]], user_id: int, model=None) -> List[CategoryResult]:
+    """Batch version of categorize_expense: one LLM call covers every low-confidence item."""
+    ensure_history_loaded(db, user_id)
+    results = [categorizer.categorize(description, user_id) for description, _ in items]
+    unsure = [i for i, r in enumerate(results) if r.confidence < categorizer.threshold]
+    if not unsure or not model:
+        return results
+
+    try:
+        for n, category in ask_llm_categories([items[i] for i in unsure], model, user_id).items():
+            results[unsure[n]] = CategoryResult(category, 1.0, "llm")
+    except Exception as e:
+        logger.warning("LLM batch categorization failed", extra={"error": str(e), "items": len(unsure)})
+
+    return results
@@ -0,0 +1,152 @@
+"""Chat prompt built from bounded, indexed queries.
+
+The prompt carries this month's totals, a month-over-month comparison per
+category, budget progress, recurring charges and unusual spending, and a few
+recent expenses. Every query is limited by the number of categories, budgets
+or CHAT_RECENT_EXPENSES, never by the length of the user's history. The
+patterns are whatever services.spending_patterns has already computed: when
+that is cold the sections are left out and the analysis is warmed in the
+background for a later turn. Sections are filled in priority order until the
+token budget runs out, and the formatting is deterministic so identical data
+yields an identical prompt (and an LLM cache hit).
+"""
+import calendar
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from config.settings import config
+from models.budget import Budget
+from models.expense import Expense
+from services.aggregates import month_key, monthly_breakdowns, previous_month
+from services.budget_service import get_budget_statuses
+from services.spending_patterns import cached_spending_patterns
+from utils.money import from_cents
+from app.providers import CHARS_PER_TOKEN, estimate_tokens
+
+MAX_DESCRIPTION_CHARS = 40
+# Share of the budget the user's question may take before it is cut
+MAX_QUESTION_SHARE = 0.25
+
+INSTRUCTIONS = (
+    "You are a personal finance mentor. Using the data above, give helpful, personalized advice. "
+    "Keep the answer concise and actionable."
+)
+
+
+def _money(cents: int) -> str:
+    return f"${from_cents(cents):,.2f}"
+
+
+def _change(current: int, previous: int) -> str:
+    if not previous:
+        return "new" if current else "-"
+    return f"{(current - previous) * 100 / previous:+.0f}%"
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def _has_any_data(db: Session, user_id: int) -> bool:
+    return (
+        db.query(Expense.id).filter(Expense.user_id == user_id).first() is not None
+        or db.query(Budget.id).filter(Budget.user_id == user_id).first() is not None
+    )
+
+
+class _PromptBuilder:
+    def __init__(self, budget_tokens: int):
+        self.remaining = budget_tokens
+        self.lines: List[str] = []
+
+    def add(self, line: str) -> bool:
+        cost = estimate_tokens(line) + 1
+        if cost > self.remaining:
+            return False
+        self.lines.append(line)
+        self.remaining -= cost
+        return True
+
+    def section(self, title: str, rows: List[str]):
+        """Add a titled list, as many rows as fit, noting how many were left out."""
+        if not rows or not self.add(title):
+            return
+        for shown, row in enumerate(rows):
+            # Keep room for the "+N more" marker
+            if self.remaining < estimate_tokens(row) + 4 or not self.add(row):
+                self.add(f"- (+{len(rows) - shown} more)")
+                return
+
+
+def build_chat_context(
+    user_message: str, db: Session, user_id: int, token_budget: Optional[int] = None
+) -> Optional[Tuple[str, dict]]:
+    """Prompt and insights for a chat turn, or None when the user has no data."""
+    token_budget = token_budget or config["CHAT_CONTEXT_TOKENS"]
+    now = datetime.now()
+    current, previous = month_key(now), previous_month(month_key(now))
+
+    totals: Dict[str, Dict[str, Tuple[int, int]]] = {current: {}, previous: {}}
+    for row in monthly_breakdowns(db, user_id, [current, previous]):
+        totals[row.month][row.category] = (row.total_cents, row.count)
+    budgets = get_budget_statuses(db, user_id, current)
+    if not totals[current] and not totals[previous] and not budgets and not _has_any_data(db, user_id):
+        return None
+
+    this_month, last_month = totals[current], totals[previous]
+    spent = sum(total for total, _ in this_month.values())
+    count = sum(n for _, n in this_month.values())
+    categories = sorted(
+        this_month.keys() | last_month.keys(),
+        key=lambda c: (-this_month.get(c, (0, 0))[0], -last_month.get(c, (0, 0))[0], c)
+    )
+
+    question = _clip(user_message, int(token_budget * MAX_QUESTION_SHARE) * CHARS_PER_TOKEN)
+    prompt = _PromptBuilder(token_budget - estimate_tokens(question) - estimate_tokens(INSTRUCTIONS) - 4)
+    days = calendar.monthrange(now.year, now.month)[1]
+    prompt.add(f"Month: {current} (day {now.day} of {days})")
+    prompt.add(f"Spent this month: {_money(spent)} in {count} transactions; "
+               f"last month: {_money(sum(t for t, _ in last_month.values()))}")
+    prompt.section("By category (this month | last month | change):", [
+        f"- {c}: {_money(this_month.get(c, (0, 0))[0])} | {_money(last_month.get(c, (0, 0))[0])} | "
+        f"{_change(this_month.get(c, (0, 0))[0], last_month.get(c, (0, 0))[0])}"
+        for c in categories
+    ])
+    prompt.section("Budgets (spent / limit, projected month end):", [
+        f"- {b['category']}: ${b['spent']:,.2f} / ${b['budget']:,.2f}, projected ${b['projected_spend']:,.2f}"
+        + (" OVER" if b["projected_overspend"] > 0 else "")
+        for b in sorted(budgets, key=lambda b: (-(b["percent_used"] or 0), b["category"]))
+    ])
+    patterns = cached_spending_patterns(user_id) or {"recurring": [], "category_spikes": [], "unusual_expenses": []}
+    prompt.section("Recurring charges (amount, cadence, next expected):", [
+        f"- {_clip(r['description'], MAX_DESCRIPTION_CHARS)} ({r['category']}): ${r['amount']:,.2f} {r['cadence']}, "
+        f"next {r['next_expected'][5:]}"
+        for r in patterns["recurring"] if r["active"]
+    ])
+    prompt.section("Unusual spending:", [
+        f"- {s['category']} in {s['month']}: ${s['total']:,.2f} vs typical ${s['typical_total']:,.2f}"
+        for s in reversed(patterns["category_spikes"])
+    ] + [
+        f"- {u['date'][5:]} {u['category']}: ${u['amount']:,.2f} vs typical ${u['typical_amount']:,.2f} "
+        f"{_clip(u['description'], MAX_DESCRIPTION_CHARS)}"
+        for u in patterns["unusual_expenses"]
+    ])
+    recent = db.query(Expense).filter(
+        Expense.user_id == user_id,
+        Expense.date >= now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    ).order_by(Expense.date.desc(), Expense.id.desc()).limit(config["CHAT_RECENT_EXPENSES"]).all()
+    prompt.section("Recent expenses:", [
+        f"- {e.date:%m-%d} {e.category}: {_money(e.amount_cents)} {_clip(e.description, MAX_DESCRIPTION_CHARS)}"
+        for e in recent
+    ])
+
+    context = "\n".join(["User's financial data:", *prompt.lines, "", f"Question: {question}", "", INSTRUCTIONS])
+    insights = {
+        "total_spent_this_month": from_cents(spent),
+        "transaction_count": count,
+        "top_category": categories[0] if this_month else "None",
+    }
+    if "recurring_monthly_cost" in patterns:
+        insights["recurring_monthly_cost"] = patterns["recurring_monthly_cost"]
+    return context, insights
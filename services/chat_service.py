@@ -1,48 +1,106 @@
-from datetime import datetime
+import json
+import logging
+import time
+from typing import AsyncIterator, Iterator, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from utils.dependencies import current_user_id
-from models.expense import Expense
-from models.budget import Budget
 from schemas.chat import ChatResponse
-from app.ai import model
+from services.chat_context import build_chat_context
+from app import ai
+from app.ai import user_cache_tag
 
-def chat_with_ai_service(user_message: str, db: Session):
-    # Ensure user data
-    expenses = db.query(Expense).filter(Expense.user_id == current_user_id).all()
-    budgets = db.query(Budget).filter(Budget.user_id == current_user_id).all()
+logger = logging.getLogger(__name__)
 
-    if not expenses and not budgets:
-        return ChatResponse(response="You have no financial data yet. Please add some expenses or budgets first.")
+NO_DATA_REPLY = "You have no financial data yet. Please add some expenses or budgets first."
+UNAVAILABLE_REPLY = "I'm having trouble accessing the AI service right now. Please try again later."
 
-    current_month = datetime.now().strftime("%Y-%m")
-    monthly_expenses = [e for e in expenses if e.date.strftime("%Y-%m") == current_month]
-    total_spent = sum(e.amount for e in monthly_expenses)
+def chat_with_ai_service(user_message: str, db: Session, user_id: int):
+    built = build_chat_context(user_message, db, user_id)
+    if built is None:
+        return ChatResponse(response=NO_DATA_REPLY)
+    context, insights = built
 
-    context = f"""
-    User's Financial Context:
-    - Total spent this month: ${total_spent:.2f}
-    - Number of transactions this month: {len(monthly_expenses)}
-    - Recent expenses: {[f"{e.category}: ${e.amount} ({e.description})" for e in monthly_expenses[-5:]]}
-    - Active budgets: {[f"{b.category}: ${b.amount}" for b in budgets]}
+    try:
+        response = ai.model.generate_content(context, cache_tag=user_cache_tag(user_id), user_id=user_id) if ai.model else None
+        reply_text = response.text if response else "AI service unavailable."
+        return ChatResponse(response=reply_text, insights=insights)
+    except Exception:
+        return ChatResponse(response=UNAVAILABLE_REPLY)
+
+async def chat_with_ai_service_async(user_message: str, db: AsyncSession, user_id: int):
+    built = await db.run_sync(lambda session: build_chat_context(user_message, session, user_id))
+    if built is None:
+        return ChatResponse(response=NO_DATA_REPLY)
+    context, insights = built
 
-    User Question: {user_message}
+    try:
+        response = await ai.model.generate_content_async(context, cache_tag=user_cache_tag(user_id), user_id=user_id) if ai.model else None
+        reply_text = response.text if response else "AI service unavailable."
+        return ChatResponse(response=reply_text, insights=insights)
+    except Exception:
+        return ChatResponse(response=UNAVAILABLE_REPLY)
 
-    Please provide helpful, personalized financial advice based on their data. Keep responses concise and actionable.
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _timings(started: float, first_token_at: Optional[float]) -> dict:
+    now = time.perf_counter()
+    return {
+        "time_to_first_token_ms": round((first_token_at - started) * 1000, 1) if first_token_at else None,
+        "total_ms": round((now - started) * 1000, 1),
+    }
+
+def stream_chat_events(built: Optional[Tuple[str, dict]], user_id: int) -> Iterator[str]:
+    """Server-Sent Events for a chat turn: start, token*, insights, done.
+
+    `start` goes out before the model is called so the client sees bytes
+    immediately; `done` carries the measured time to first token.
     """
+    started = time.perf_counter()
+    first_token_at = None
+    yield sse_event("start", {})
+    if built is None:
+        yield sse_event("token", {"text": NO_DATA_REPLY})
+        yield sse_event("done", _timings(started, None))
+        return
+    context, insights = built
 
     try:
-        response = model.generate_content(context) if model else None
-        reply_text = response.text if response else "AI service unavailable."
+        chunks = ai.model.stream_content(context, cache_tag=user_cache_tag(user_id), user_id=user_id) if ai.model else iter(["AI service unavailable."])
+        for text in chunks:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            yield sse_event("token", {"text": text})
+    except Exception:
+        yield sse_event("error", {"message": UNAVAILABLE_REPLY})
 
-        insights = {
-            "total_spent_this_month": total_spent,
-            "transaction_count": len(monthly_expenses),
-            "top_category": max(set(e.category for e in monthly_expenses),
-                                key=lambda x: sum(e.amount for e in monthly_expenses if e.category == x))
-                          if monthly_expenses else "None"
-        }
+    yield sse_event("insights", insights)
+    timings = _timings(started, first_token_at)
+    logger.info("Chat stream finished", extra=timings)
+    yield sse_event("done", timings)
 
-        return ChatResponse(response=reply_text, insights=insights)
+async def stream_chat_events_async(built: Optional[Tuple[str, dict]], user_id: int) -> AsyncIterator[str]:
+    started = time.perf_counter()
+    first_token_at = None
+    yield sse_event("start", {})
+    if built is None:
+        yield sse_event("token", {"text": NO_DATA_REPLY})
+        yield sse_event("done", _timings(started, None))
+        return
+    context, insights = built
 
+    try:
+        if ai.model:
+            async for text in ai.model.stream_content_async(context, cache_tag=user_cache_tag(user_id), user_id=user_id):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                yield sse_event("token", {"text": text})
+        else:
+            yield sse_event("token", {"text": "AI service unavailable."})
     except Exception:
-        return ChatResponse(response="I'm having trouble accessing the AI service right now. Please try again later.")
+        yield sse_event("error", {"message": UNAVAILABLE_REPLY})
+
+    yield sse_event("insights", insights)
+    timings = _timings(started, first_token_at)
+    logger.info("Chat stream finished", extra=timings)
+    yield sse_event("done", timings)
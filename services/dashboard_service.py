@@ -1,31 +1,34 @@
 from datetime import datetime
 from sqlalchemy.orm import Session
-from utils.dependencies import current_user_id
 from models.expense import Expense
+from services.aggregates import month_key, monthly_breakdown
+from services.budget_service import get_budget_statuses
+from utils.money import from_cents
 
-def get_dashboard_service(db: Session):
-    current_month = datetime.now().strftime("%Y-%m")
-    monthly_expenses = db.query(Expense).filter(
-        Expense.user_id == current_user_id,
-        Expense.date >= datetime.now().replace(day=1)
-    ).all()
+def get_dashboard_service(db: Session, user_id: int):
+    now = datetime.now()
+    breakdown = monthly_breakdown(db, user_id, month_key(now))
 
-    spending_by_category = {}
-    for expense in monthly_expenses:
-        spending_by_category[expense.category] = spending_by_category.get(expense.category, 0) + expense.amount
+    spending_by_category = {row.category: row.total for row in breakdown}
+    # Integer cents add up exactly; convert once at the end
+    total_spent = from_cents(sum(row.total_cents for row in breakdown))
 
-    total_spent = sum(exp.amount for exp in monthly_expenses)
+    recent_expenses = db.query(Expense).filter(
+        Expense.user_id == user_id,
+        Expense.date >= now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    ).order_by(Expense.date.desc()).limit(5).all()
 
     return {
         "total_spent": total_spent,
-        "transaction_count": len(monthly_expenses),
+        "transaction_count": sum(row.count for row in breakdown),
         "spending_by_category": spending_by_category,
+        "budgets": get_budget_statuses(db, user_id, month_key(now)),
         "recent_expenses": [
             {
                 "description": e.description,
                 "amount": e.amount,
                 "category": e.category,
                 "date": e.date.isoformat()
-            } for e in sorted(monthly_expenses, key=lambda x: x.date, reverse=True)[:5]
+            } for e in recent_expenses
         ]
     }
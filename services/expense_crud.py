@@ -1,29 +1,108 @@
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from models.expense import Expense
 from schemas.expense import ExpenseCreate
-from utils.dependencies import current_user_id
-from app.ai import model
-
-def create_expense(db: Session, expense: ExpenseCreate):
-    category = expense.category
-    if not category and model:
-        try:
-            prompt = f"Categorize this expense into one of these categories: Food, Transportation, Entertainment, Shopping, Bills, Other. Expense: '{expense.description} ${expense.amount}'. Respond with only the category name."
-            response = model.generate_content(prompt)
-            category = response.text.strip()
-        except:
-            category = "Other"
+from services.aggregates import record_expense
+from services.categorization_jobs import enqueue_categorization
+from services.categorizer import (
+    PENDING_CATEGORY, categorizer, categorize_expense, categorize_expense_async, categorize_locally
+)
+from utils.dates import naive_utc
+from utils.money import to_cents
+from app import ai, jobs
+from app.ai import invalidate_user_cache
 
+def store_expense(db: Session, expense: ExpenseCreate, user_id: int, category: str, source: str) -> Expense:
     db_expense = Expense(
         amount=expense.amount,
         description=expense.description,
-        category=category or "Other",
-        user_id=current_user_id
+        category=category,
+        user_id=user_id
     )
+    if expense.date:
+        db_expense.date = expense.date
     db.add(db_expense)
+    db.flush()
+    record_expense(db, db_expense)
     db.commit()
     db.refresh(db_expense)
+    invalidate_user_cache(user_id)
+    categorizer.learn(user_id, db_expense.description, db_expense.category)
+    db_expense.category_source = source
     return db_expense
 
-def get_user_expenses(db: Session):
-    return db.query(Expense).filter(Expense.user_id == current_user_id).order_by(Expense.date.desc()).all()
+def store_or_defer(db: Session, expense: ExpenseCreate, user_id: int) -> Expense:
+    """Store with the local category, or as Pending with an LLM job queued when unsure."""
+    result = categorize_locally(db, expense.description, user_id)
+    if result.confidence >= categorizer.threshold or not ai.model:
+        return store_expense(db, expense, user_id, result.category, result.source)
+    db_expense = store_expense(db, expense, user_id, PENDING_CATEGORY, "pending")
+    enqueue_categorization(db_expense)
+    return db_expense
+
+def create_expense(db: Session, expense: ExpenseCreate, user_id: int):
+    if expense.category:
+        return store_expense(db, expense, user_id, expense.category, "user")
+    if jobs.job_runner:
+        return store_or_defer(db, expense, user_id)
+    result = categorize_expense(db, expense.description, expense.amount, user_id, ai.model)
+    return store_expense(db, expense, user_id, result.category, result.source)
+
+async def create_expense_async(db: AsyncSession, expense: ExpenseCreate, user_id: int):
+    if expense.category:
+        return await db.run_sync(store_expense, expense, user_id, expense.category, "user")
+    if jobs.job_runner:
+        return await db.run_sync(store_or_defer, expense, user_id)
+    result = await categorize_expense_async(db, expense.description, expense.amount, user_id, ai.model)
+    return await db.run_sync(store_expense, expense, user_id, result.category, result.source)
+
+def encode_cursor(expense: Expense) -> str:
+    payload = json.dumps([expense.date.isoformat(), expense.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date, expense_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(date), int(expense_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def get_user_expenses(
+    db: Session,
+    user_id: int,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    category: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+) -> Tuple[List[Expense], Optional[str]]:
+    """One page of expenses, newest first, keyed on (date, id).
+
+    Returns the page and the cursor for the next one (None on the last page).
+    """
+    start, end = naive_utc(start), naive_utc(end)
+    query = db.query(Expense).filter(Expense.user_id == user_id)
+    if cursor:
+        query = query.filter(tuple_(Expense.date, Expense.id) < decode_cursor(cursor))
+    if start:
+        query = query.filter(Expense.date >= start)
+    if end:
+        query = query.filter(Expense.date < end)
+    if category:
+        query = query.filter(Expense.category == category)
+    if min_amount is not None:
+        query = query.filter(Expense.amount_cents >= to_cents(min_amount))
+    if max_amount is not None:
+        query = query.filter(Expense.amount_cents <= to_cents(max_amount))
+
+    rows = query.order_by(Expense.date.desc(), Expense.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
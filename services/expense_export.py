@@ -0,0 +1,204 @@
+"""Expense export streamed straight from the database.
+
+Rows come from a server-side cursor (a named cursor on Postgres; SQLite
+steps its cursor lazily anyway) in EXPORT_CHUNK_ROWS chunks, and each chunk
+is encoded and handed to the response before the next is fetched, so memory
+stays flat however many rows are exported. CSV and NDJSON need nothing
+extra. Parquet and Arrow IPC need pyarrow, which is optional: each chunk
+becomes one Parquet row group or one Arrow record batch.
+"""
+import csv
+import io
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Iterator, Optional
+from sqlalchemy import select
+from config import database
+from config.settings import config
+from models.expense import Expense
+from utils.dates import naive_utc
+from utils.money import from_cents
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ("id", "date", "amount", "category", "description")
+EXPORT_FORMATS = {
+    # format -> (media type, file extension)
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+COLUMNAR_FORMATS = ("parquet", "arrow")
+# Page cache for the export's own SQLite connection. A full-history scan
+# would otherwise fill the mmap window and the shared cache size with pages
+# no other request needs, and show up as the worker's RSS.
+EXPORT_SQLITE_CACHE_KB = 2048
+
+
+class ExportUnavailableError(RuntimeError):
+    """The format needs an optional package that is not installed."""
+
+
+def export_query(user_id: int, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                 category: Optional[str] = None):
+    """Oldest first, in ix_expenses_user_date order, so the database never sorts."""
+    query = select(
+        Expense.id, Expense.date, Expense.amount_cents, Expense.category, Expense.description
+    ).where(Expense.user_id == user_id)
+    if start:
+        query = query.where(Expense.date >= start)
+    if end:
+        query = query.where(Expense.date < end)
+    if category:
+        query = query.where(Expense.category == category)
+    return query.order_by(Expense.date, Expense.id)
+
+
+def _chunks(query, engine) -> Iterator[list]:
+    # A connection of its own: the response is still streaming after the
+    # request's session has been closed
+    with engine.connect() as conn:
+        sqlite = conn.dialect.name == "sqlite"
+        if sqlite:
+            conn.exec_driver_sql("PRAGMA mmap_size=0")
+            conn.exec_driver_sql(f"PRAGMA cache_size=-{EXPORT_SQLITE_CACHE_KB}")
+        try:
+            result = conn.execution_options(stream_results=True, yield_per=config["EXPORT_CHUNK_ROWS"]).execute(query)
+            yield from result.partitions()
+        finally:
+            if sqlite:
+                # Drop it rather than return it to the pool with these pragmas
+                conn.invalidate()
+
+
+def _csv(chunks) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for chunk in chunks:
+        writer.writerows(
+            (expense_id, date.isoformat(), from_cents(cents), category, description)
+            for expense_id, date, cents, category, description in chunk
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _ndjson(chunks) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield "".join(
+            json.dumps({
+                "id": expense_id, "date": date.isoformat(), "amount": from_cents(cents),
+                "category": category, "description": description,
+            }) + "\n"
+            for expense_id, date, cents, category, description in chunk
+        ).encode()
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ExportUnavailableError("Parquet and Arrow exports need pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+class _Sink:
+    """Write-only file the pyarrow writers fill; drained after every batch."""
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def _columnar(chunks, file_format: str) -> Iterator[bytes]:
+    # Availability was checked by stream_export()
+    import pyarrow as pa
+    import pyarrow.compute
+    import pyarrow.ipc
+    import pyarrow.parquet
+    schema = pa.schema([
+        ("id", pa.int64()), ("date", pa.timestamp("us")), ("amount", pa.float64()),
+        ("category", pa.string()), ("description", pa.string()),
+    ])
+    sink = _Sink()
+    if file_format == "parquet":
+        writer = pyarrow.parquet.ParquetWriter(sink, schema)
+        write = writer.write_table
+        to_batch = pa.Table.from_arrays
+    else:
+        writer = pyarrow.ipc.new_stream(sink, schema)
+        write = writer.write_batch
+        to_batch = pa.RecordBatch.from_arrays
+    with writer:
+        for chunk in chunks:
+            ids, dates, cents, categories, descriptions = zip(*chunk)
+            amounts = pa.array(cents, pa.int64()).cast(pa.float64())
+            write(to_batch([
+                pa.array(ids, pa.int64()), pa.array(dates, pa.timestamp("us")),
+                pyarrow.compute.divide(amounts, 100.0), pa.array(categories, pa.string()),
+                pa.array(descriptions, pa.string()),
+            ], schema=schema))
+            yield sink.drain()
+    # Closing writes the Parquet footer or the Arrow end-of-stream marker
+    yield sink.drain()
+
+
+def stream_export(user_id: int, file_format: str, start: Optional[datetime] = None,
+                  end: Optional[datetime] = None, category: Optional[str] = None, engine=None) -> Iterator[bytes]:
+    """Encoded export, chunk by chunk, read through `engine` (the app's reader by default).
+
+    Raises ValueError or ExportUnavailableError up front.
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported format '{file_format}'")
+    start, end = naive_utc(start), naive_utc(end)
+    if start and end and start >= end:
+        raise ValueError("start must be before end")
+    if file_format in COLUMNAR_FORMATS:
+        _require_pyarrow()
+    return _logged(_encode(file_format, _chunks(export_query(user_id, start, end, category), engine or database.engine)), user_id, file_format)
+
+
+def _encode(file_format: str, chunks) -> Iterator[bytes]:
+    if file_format == "csv":
+        return _csv(chunks)
+    if file_format == "ndjson":
+        return _ndjson(chunks)
+    return _columnar(chunks, file_format)
+
+
+def _logged(parts: Iterator[bytes], user_id: int, file_format: str) -> Iterator[bytes]:
+    started, size = time.perf_counter(), 0
+    try:
+        for part in parts:
+            size += len(part)
+            yield part
+    except Exception:
+        # Headers are already sent; the client sees a truncated body
+        logger.exception("Export failed", extra={"user_id": user_id, "format": file_format, "bytes": size})
+        raise
+    logger.info("Export finished", extra={
+        "user_id": user_id, "format": file_format, "bytes": size,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+    })
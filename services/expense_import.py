@@ -0,0 +1,129 @@
+import csv
+import io
+import json
+import time
+from collections import Counter
+from datetime import datetime
+from typing import BinaryIO, Iterator, List, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.ai import invalidate_user_cache
+from models.expense import Expense
+from schemas.expense import ExpenseCreate, ExpenseImportResponse
+from services.aggregates import record_expenses
+from services.categorizer import categorizer, categorize_many
+from utils.money import to_cents
+
+# Rows per INSERT transaction (and per LLM categorization call)
+BATCH_SIZE = 1000
+# Per-row errors reported back; the rest are only counted
+MAX_REPORTED_ERRORS = 500
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+
+def detect_format(filename: str, content_type: str) -> str:
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in (content_type or ""):
+        return "ndjson"
+    return "csv"
+
+
+def read_csv_rows(stream: BinaryIO) -> Iterator[Tuple[int, dict]]:
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    for row_number, row in enumerate(reader, start=1):
+        yield row_number, {
+            (key or "").strip().lower(): (value.strip() or None) if isinstance(value, str) else value
+            for key, value in row.items()
+        }
+
+
+def read_ndjson_rows(stream: BinaryIO) -> Iterator[Tuple[int, object]]:
+    for row_number, line in enumerate(io.TextIOWrapper(stream, encoding="utf-8"), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield row_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_number, ValueError(f"invalid JSON: {e.msg}")
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in e['loc']) or 'row'}: {e['msg']}" for e in error.errors()
+    )
+
+
+def import_expenses(db: Session, rows: Iterator[Tuple[int, object]], user_id: int, model=None) -> ExpenseImportResponse:
+    """Validate, categorize and insert rows in BATCH_SIZE transactions."""
+    started = time.perf_counter()
+    imported = 0
+    failed = 0
+    errors = []
+    sources = Counter()
+    batch: List[Tuple[ExpenseCreate, int]] = []  # (row, amount in cents)
+
+    def flush():
+        nonlocal imported
+        uncategorized = [e for e, _ in batch if not e.category]
+        results = iter(categorize_many(
+            db, [(e.description, e.amount) for e in uncategorized], user_id, model
+        ))
+        now = datetime.utcnow()
+        values = []
+        for expense, cents in batch:
+            if expense.category:
+                category, source = expense.category, "user"
+            else:
+                result = next(results)
+                category, source = result.category, result.source
+            sources[source] += 1
+            values.append({
+                "amount_cents": cents,
+                "description": expense.description,
+                "category": category,
+                "date": expense.date or now,
+                "user_id": user_id,
+            })
+        db.execute(insert(Expense), values)
+        record_expenses(db, [
+            (user_id, row["date"], row["category"], row["amount_cents"]) for row in values
+        ])
+        db.commit()
+        invalidate_user_cache(user_id)
+        for row in values:
+            categorizer.learn(user_id, row["description"], row["category"])
+        imported += len(values)
+        batch.clear()
+
+    for row_number, record in rows:
+        try:
+            if isinstance(record, Exception):
+                raise record
+            expense = ExpenseCreate.model_validate(record)
+            # Converted here so an amount that cannot be stored fails its row, not the batch
+            batch.append((expense, to_cents(expense.amount)))
+        except (ValidationError, ValueError) as e:
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                message = _validation_message(e) if isinstance(e, ValidationError) else str(e)
+                errors.append({"row": row_number, "error": message})
+            continue
+        if len(batch) >= BATCH_SIZE:
+            flush()
+    if batch:
+        flush()
+
+    elapsed = time.perf_counter() - started
+    return ExpenseImportResponse(
+        imported=imported,
+        failed=failed,
+        categorized_by=dict(sources),
+        errors=errors,
+        errors_truncated=failed > len(errors),
+        elapsed_seconds=round(elapsed, 4),
+        rows_per_second=round(imported / elapsed, 1) if elapsed > 0 else 0.0,
+    )
@@ -0,0 +1,405 @@
+"""Recurring charges and unusual spending, found in a user's whole history.
+
+A user's expenses are read once, in PATTERNS_CHUNK_ROWS chunks from a
+streaming cursor, into parallel NumPy arrays kept per user in an LRU. When
+the user's cache generation moves (a write bumped it), only rows with a
+higher id are fetched and appended, plus the rows that were still "Pending"
+so their final category is picked up; expenses are never edited otherwise.
+Every analysis is then a handful of vectorized passes over the arrays:
+
+* recurring: expenses grouped by normalized description (numbers dropped,
+  so "Invoice 1042" and "Invoice 1043" match) whose intervals and amounts
+  are both regular;
+* unusual expenses: amounts far above the rolling mean of the previous
+  ANOMALY_WINDOW expenses in the same category;
+* category spikes: a month's category total far above its trailing
+  SPIKE_MONTHS months.
+
+Loading a history grows with its length, so request paths that promise
+bounded work (the chat prompt) call cached_spending_patterns(), which only
+reads what is already computed and leaves refreshing to a background thread
+with its own session.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from config import database
+from config.settings import config
+from models.expense import Expense
+from services.categorizer import PENDING_CATEGORY, normalize_description
+from utils.money import from_cents
+from app import state
+from app.ai import user_cache_tag
+
+logger = logging.getLogger(__name__)
+
+DAY_SECONDS = 86400
+# Recurring: at least this many charges, at most a week's wobble per month of
+# interval and 15% in amount (coefficients of variation)
+MIN_OCCURRENCES = 3
+MIN_INTERVAL_DAYS = 5
+MAX_INTERVAL_CV = 0.25
+MAX_AMOUNT_CV = 0.15
+# (mean interval in days, label, tolerance in days)
+CADENCES = ((7, "weekly", 1.5), (14, "biweekly", 2.5), (30.44, "monthly", 4),
+            (91.31, "quarterly", 10), (365.25, "yearly", 20))
+AVERAGE_MONTH_DAYS = 30.44
+# Unusual expense: z-score over the previous ANOMALY_WINDOW expenses of its
+# category (at least ANOMALY_MIN_HISTORY of them), and at least this multiple
+# of their mean; only expenses from the last ANOMALY_LOOKBACK_DAYS are reported
+ANOMALY_WINDOW = 30
+ANOMALY_MIN_HISTORY = 5
+ANOMALY_Z = 3.0
+ANOMALY_MIN_RATIO = 2.0
+ANOMALY_LOOKBACK_DAYS = 90
+# Category spike: the current or previous month against the SPIKE_MONTHS before it
+SPIKE_MONTHS = 6
+SPIKE_MIN_ACTIVE_MONTHS = 3
+SPIKE_Z = 2.0
+SPIKE_MIN_RATIO = 1.5
+MAX_ITEMS = 20
+# Results depend on today's date too ("active", lookback), so they are
+# recomputed from the arrays at least this often even without new expenses
+RESULT_MAX_AGE = 3600
+# Rows refetched per query when refreshing pending categories
+PENDING_BATCH = 500
+
+
+def recurring_key(description: Optional[str]) -> str:
+    return " ".join(token for token in normalize_description(description).split() if not token.isdigit())
+
+
+class _Codes:
+    """Small-integer codes for strings, so groups can be compared as arrays."""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def code(self, value: str) -> int:
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+    def find(self, value: str) -> int:
+        return self._index.get(value, -1)
+
+
+class _History:
+    """One user's expenses as parallel arrays, in the order they were read.
+
+    Descriptions are interned: each row keeps the code of its raw
+    description, which maps to the code of its recurring key, so the Python
+    work per row is a dictionary lookup and everything else is vectorized.
+    """
+
+    def __init__(self):
+        self.ids = np.empty(0, np.int64)
+        self.days = np.empty(0, np.float64)  # days since the epoch
+        self.cents = np.empty(0, np.int64)
+        self.category = np.empty(0, np.int32)
+        self.description = np.empty(0, np.int32)
+        self.categories = _Codes()
+        self.descriptions = _Codes()
+        self.keys = _Codes()
+        self.key_of: List[int] = []  # description code -> recurring key code, -1 when empty
+        self.pending: Dict[int, int] = {}  # expense id -> position, while Pending
+        self.max_id = 0
+        self.generation: Optional[int] = None
+        self.result: Optional[dict] = None
+        self.computed_at = 0.0
+        self.lock = threading.Lock()
+
+    @property
+    def key(self) -> np.ndarray:
+        return np.asarray(self.key_of, np.int32)[self.description]
+
+    def append(self, rows):
+        ids, dates, cents, categories, descriptions = zip(*rows)
+        size, start = len(ids), len(self.ids)
+        description = np.fromiter(
+            (self.descriptions.code(" ".join((text or "").split())) for text in descriptions), np.int32, size
+        )
+        for text in self.descriptions.values[len(self.key_of):]:
+            key = recurring_key(text)
+            self.key_of.append(self.keys.code(key) if key else -1)
+        category = np.fromiter((self.categories.code(c or "Other") for c in categories), np.int32, size)
+        ids = np.array(ids, np.int64)
+        for n in np.flatnonzero(category == self.categories.find(PENDING_CATEGORY)):
+            self.pending[int(ids[n])] = start + int(n)
+
+        self.ids = np.concatenate([self.ids, ids])
+        self.days = np.concatenate([self.days, np.array(dates, "datetime64[s]").astype(np.int64) / DAY_SECONDS])
+        self.cents = np.concatenate([self.cents, np.array([c or 0 for c in cents], np.int64)])
+        self.category = np.concatenate([self.category, category])
+        self.description = np.concatenate([self.description, description])
+        self.max_id = max(self.max_id, int(ids.max()))
+
+    def recategorize(self, rows):
+        for expense_id, category in rows:
+            if category != PENDING_CATEGORY:
+                self.category[self.pending.pop(expense_id)] = self.categories.code(category or "Other")
+
+
+_histories: "OrderedDict[int, _History]" = OrderedDict()
+_histories_lock = threading.Lock()
+
+
+def _history(user_id: int) -> _History:
+    with _histories_lock:
+        history = _histories.pop(user_id, None) or _History()
+        _histories[user_id] = history
+        while len(_histories) > config["PATTERNS_CACHE_USERS"]:
+            _histories.popitem(last=False)
+        return history
+
+
+def forget(user_id: int):
+    with _histories_lock:
+        _histories.pop(user_id, None)
+
+
+def _refresh(db: Session, user_id: int, history: _History):
+    """Append expenses added since the last read and pick up finished categorizations."""
+    query = select(
+        Expense.id, Expense.date, Expense.amount_cents, Expense.category, Expense.description
+    ).where(Expense.user_id == user_id, Expense.id > history.max_id).execution_options(
+        yield_per=config["PATTERNS_CHUNK_ROWS"]
+    )
+    pending = list(history.pending)
+    for chunk in db.execute(query).partitions():
+        history.append(chunk)
+    for start in range(0, len(pending), PENDING_BATCH):
+        history.recategorize(db.execute(
+            select(Expense.id, Expense.category).where(Expense.id.in_(pending[start:start + PENDING_BATCH]))
+        ).all())
+
+
+def _group_starts(values: np.ndarray) -> np.ndarray:
+    return np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+
+
+def _cadence(period: float) -> str:
+    for days, label, tolerance in CADENCES:
+        if abs(period - days) <= tolerance:
+            return label
+    return f"every {period:.0f} days"
+
+
+def find_recurring(history: _History, today: float) -> List[dict]:
+    key = history.key
+    rows = np.flatnonzero(key >= 0)
+    rows = rows[np.lexsort((history.days[rows], key[rows]))]
+    if not len(rows):
+        return []
+    key, days, cents = key[rows], history.days[rows], history.cents[rows].astype(np.float64)
+    starts = _group_starts(key)
+    ends = np.r_[starts[1:], len(rows)]
+    counts = ends - starts
+    last = ends - 1
+
+    # Within a group the intervals are consecutive differences, so their sum is
+    # last - first and their squares come from a prefix sum over all gaps
+    gaps = np.diff(days)
+    squares = np.r_[0.0, np.cumsum(gaps * gaps)]
+    intervals = np.maximum(counts - 1, 1)
+    period = (days[last] - days[starts]) / intervals
+    period_var = (squares[last] - squares[starts]) / intervals - period ** 2
+    amount_sum = np.add.reduceat(cents, starts)
+    amount_mean = amount_sum / counts
+    amount_var = np.add.reduceat(cents * cents, starts) / counts - amount_mean ** 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        period_cv = np.sqrt(np.maximum(period_var, 0)) / period
+        amount_cv = np.sqrt(np.maximum(amount_var, 0)) / np.abs(amount_mean)
+    regular = np.flatnonzero(
+        (counts >= MIN_OCCURRENCES) & (period >= MIN_INTERVAL_DAYS)
+        & (period_cv <= MAX_INTERVAL_CV) & (amount_cv <= MAX_AMOUNT_CV)
+    )
+
+    found = []
+    for group in regular:
+        row, amount = rows[last[group]], int(cents[last[group]])
+        next_day = days[last[group]] + period[group]
+        found.append({
+            "description": history.descriptions.values[history.description[row]],
+            "category": history.categories.values[history.category[row]],
+            "amount": from_cents(amount),
+            "cadence": _cadence(period[group]),
+            "period_days": round(float(period[group]), 1),
+            "occurrences": int(counts[group]),
+            "last_date": _date(days[last[group]]),
+            "next_expected": _date(next_day),
+            "monthly_cost": from_cents(round(amount * AVERAGE_MONTH_DAYS / period[group])),
+            # Still active unless at least half a period overdue
+            "active": bool(today <= next_day + max(period[group] / 2, 3)),
+        })
+    found.sort(key=lambda r: (not r["active"], -r["monthly_cost"], r["description"]))
+    return found
+
+
+def find_unusual_expenses(history: _History, today: float) -> List[dict]:
+    pending = history.categories.find(PENDING_CATEGORY)
+    rows = np.flatnonzero(history.category != pending)
+    rows = rows[np.lexsort((history.ids[rows], history.days[rows], history.category[rows]))]
+    if not len(rows):
+        return []
+    # Dollars keep the squared prefix sums well inside float precision
+    amounts = history.cents[rows] / 100
+    position = np.arange(len(rows))
+    group_start = np.maximum.accumulate(np.where(np.r_[True, np.diff(history.category[rows]) != 0], position, 0))
+    window_start = np.maximum(group_start, position - ANOMALY_WINDOW)
+    seen = position - window_start
+    sums = np.r_[0.0, np.cumsum(amounts)]
+    squares = np.r_[0.0, np.cumsum(amounts * amounts)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = (sums[position] - sums[window_start]) / seen
+        std = np.sqrt(np.maximum((squares[position] - squares[window_start]) / seen - mean ** 2, 0))
+        # A category of identical amounts has no spread; judge it against a tenth of the mean
+        z = (amounts - mean) / np.maximum(std, np.abs(mean) / 10)
+    flagged = np.flatnonzero(
+        (seen >= ANOMALY_MIN_HISTORY) & (z >= ANOMALY_Z) & (amounts >= ANOMALY_MIN_RATIO * mean)
+        & (history.days[rows] >= today - ANOMALY_LOOKBACK_DAYS)
+    )
+    flagged = flagged[np.argsort(-z[flagged], kind="stable")][:MAX_ITEMS]
+    return [{
+        "id": int(history.ids[rows[n]]),
+        "date": _date(history.days[rows[n]]),
+        "category": history.categories.values[history.category[rows[n]]],
+        "amount": from_cents(int(history.cents[rows[n]])),
+        "typical_amount": round(float(mean[n]), 2),
+        "z_score": round(float(z[n]), 1),
+    } for n in flagged]
+
+
+def find_category_spikes(history: _History, now: datetime) -> List[dict]:
+    if not len(history.ids):
+        return []
+    months = (history.days * DAY_SECONDS).astype("datetime64[s]").astype("datetime64[M]").astype(np.int64)
+    current = np.datetime64(now, "M").astype(np.int64)
+    first = min(int(months.min()), current - SPIKE_MONTHS - 1)
+    span = current - first + 1
+    keep = months <= current
+    cells = history.category[keep].astype(np.int64) * span + (months[keep] - first)
+    totals = np.bincount(
+        cells, weights=history.cents[keep], minlength=len(history.categories.values) * span
+    ).reshape(-1, span)
+    spikes = []
+    for month in (current - 1, current):
+        trailing = totals[:, month - first - SPIKE_MONTHS:month - first]
+        mean, std = trailing.mean(axis=1), trailing.std(axis=1)
+        total = totals[:, month - first]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = (total - mean) / np.maximum(std, mean / 10)
+        for category in np.flatnonzero(
+            ((trailing > 0).sum(axis=1) >= SPIKE_MIN_ACTIVE_MONTHS) & (total >= SPIKE_MIN_RATIO * mean) & (z >= SPIKE_Z)
+        ):
+            name = history.categories.values[category]
+            if name == PENDING_CATEGORY:
+                continue
+            spikes.append({
+                "category": name,
+                "month": str(np.datetime64(int(month), "M")),
+                "total": from_cents(int(total[category])),
+                "typical_total": from_cents(round(mean[category])),
+                "ratio": round(float(total[category] / mean[category]), 1),
+            })
+    spikes.sort(key=lambda s: (s["month"], -s["ratio"]))
+    return spikes[-MAX_ITEMS:]
+
+
+def _date(days: float) -> str:
+    return str(np.datetime64(int(days * DAY_SECONDS), "s").astype("datetime64[D]"))
+
+
+def _describe(db: Session, unusual: List[dict]):
+    """Descriptions are not kept in the arrays; fetch the few that are reported."""
+    if not unusual:
+        return
+    descriptions = dict(db.execute(
+        select(Expense.id, Expense.description).where(Expense.id.in_([u["id"] for u in unusual]))
+    ).all())
+    for item in unusual:
+        item["description"] = descriptions.get(item["id"]) or ""
+
+
+def _analyze(db: Session, history: _History) -> dict:
+    now = datetime.now()
+    today = (now - datetime(1970, 1, 1)) / timedelta(days=1)
+    recurring = find_recurring(history, today)
+    unusual = find_unusual_expenses(history, today)
+    _describe(db, unusual)
+    return {
+        "as_of": now.replace(microsecond=0).isoformat(),
+        "expenses_analyzed": int(len(history.ids)),
+        "recurring": recurring[:MAX_ITEMS],
+        "recurring_monthly_cost": round(sum(r["monthly_cost"] for r in recurring if r["active"]), 2),
+        "unusual_expenses": unusual,
+        "category_spikes": find_category_spikes(history, now),
+    }
+
+
+def _is_current(history: Optional[_History], user_id: int) -> bool:
+    return (
+        history is not None and history.result is not None
+        and history.generation == state.shared_state.generation(user_cache_tag(user_id))
+        and time.monotonic() - history.computed_at <= RESULT_MAX_AGE
+    )
+
+
+def get_spending_patterns(db: Session, user_id: int) -> dict:
+    """Refresh the user's history if needed and return the analysis.
+
+    Blocks on the history's lock while it reads the database, so it must not
+    run on an event loop thread (e.g. inside AsyncSession.run_sync).
+    """
+    history = _history(user_id)
+    with history.lock:
+        # Read the generation before the rows: a write landing in between bumps
+        # it again, so the next call still refreshes
+        generation = state.shared_state.generation(user_cache_tag(user_id))
+        stale = generation != history.generation
+        if stale:
+            _refresh(db, user_id, history)
+            history.generation = generation
+        if stale or history.result is None or time.monotonic() - history.computed_at > RESULT_MAX_AGE:
+            history.result = _analyze(db, history)
+            history.computed_at = time.monotonic()
+        return history.result
+
+
+# One thread: refreshes are rare and each one is a full scan at worst
+_refresher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="spending-patterns")
+_refreshing = set()
+
+
+def _refresh_in_background(user_id: int):
+    try:
+        with database.SessionLocal() as db:
+            get_spending_patterns(db, user_id)
+    except Exception:
+        logger.exception("Spending patterns refresh failed", extra={"user_id": user_id})
+    finally:
+        _refreshing.discard(user_id)
+
+
+def cached_spending_patterns(user_id: int) -> Optional[dict]:
+    """The last analysis computed for the user, without touching the database or taking a lock.
+
+    When it is missing or out of date a refresh is scheduled in the
+    background and the old result (or None) is returned meanwhile, so the
+    caller's cost does not depend on the length of the history.
+    """
+    history = _histories.get(user_id)
+    if not _is_current(history, user_id) and user_id not in _refreshing:
+        _refreshing.add(user_id)
+        _refresher.submit(_refresh_in_background, user_id)
+    return history.result if history else None
@@ -0,0 +1,39 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import create_app
+
+# Offline and self-contained: the stub LLM, in-process caches and state, no job workers
+TEST_SETTINGS = {
+    "LLM_PROVIDER": "stub",
+    "LLM_CACHE_BACKEND": "memory",
+    "SHARED_STATE_BACKEND": "memory",
+    "JOB_QUEUE_BACKEND": "none",
+    "AI_HEALTH_INTERVAL": 0,
+    "MIGRATE_ON_STARTUP": True,
+    "LOG_LEVEL": "WARNING",
+}
+
+
+def pytest_addoption(parser):
+    parser.addoption("--postgres-url", help="scratch Postgres database for tests/test_backends.py (its tables are dropped)")
+
+
+@pytest.fixture
+def make_client(tmp_path):
+    """make_client(**settings): a started TestClient for an app on a fresh SQLite file."""
+    clients = []
+
+    def make(**settings):
+        app = create_app({**TEST_SETTINGS, "DATABASE_URL": f"sqlite:///{tmp_path / 'test.db'}", **settings})
+        client = TestClient(app)
+        client.__enter__()
+        clients.append(client)
+        return client
+    yield make
+    for client in clients:
+        client.__exit__(None, None, None)
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client()
@@ -0,0 +1,30 @@
+from app.main import create_app
+from config.settings import DEFAULTS, config
+from tests.conftest import TEST_SETTINGS
+from utils import dependencies
+
+
+def build(tmp_path, **settings):
+    return create_app({**TEST_SETTINGS, "DATABASE_URL": f"sqlite:///{tmp_path / 'app.db'}", **settings})
+
+
+def test_overrides_do_not_carry_over(tmp_path):
+    build(tmp_path, TRUST_USER_HEADER=True, CHAT_RATE_PER_MINUTE=1)
+    assert config["TRUST_USER_HEADER"] is True
+    build(tmp_path)
+    assert config["TRUST_USER_HEADER"] == DEFAULTS["TRUST_USER_HEADER"]
+    assert config["CHAT_RATE_PER_MINUTE"] == DEFAULTS["CHAT_RATE_PER_MINUTE"]
+
+
+def test_user_cache_follows_the_app_settings(tmp_path):
+    build(tmp_path, USER_CACHE_TTL=0, USER_CACHE_MAX_ENTRIES=7)
+    assert (dependencies.user_cache.ttl, dependencies.user_cache.max_entries) == (0, 7)
+    build(tmp_path)
+    assert dependencies.user_cache.ttl == DEFAULTS["USER_CACHE_TTL"]
+    assert dependencies.user_cache.max_entries == DEFAULTS["USER_CACHE_MAX_ENTRIES"]
+
+
+def test_disabled_user_cache_is_honoured(make_client):
+    client = make_client(USER_CACHE_TTL=0)
+    assert client.get("/expenses").status_code == 200
+    assert len(dependencies.user_cache) == 0
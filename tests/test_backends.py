@@ -0,0 +1,256 @@
+"""Route handlers end to end on SQLite and PostgreSQL.
+
+Every test gets an empty schema built by run_migrations on each backend and
+seeds what it reads, so tests run alone or in any order. Postgres comes
+from, in order:
+
+- `--postgres-url`, a scratch database whose tables are dropped;
+- a throwaway `initdb`/`pg_ctl` cluster when the binaries are on PATH;
+- a `postgres` container via docker;
+
+and its tests are skipped when none is available.
+"""
+import io
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+import pytest
+from fastapi import Response
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from api import route_budgets, route_expenses, routes_analytics, routes_chat, routes_dashboard
+from app import jobs
+from config.database import Base, create_engines, session_class
+from config.migrations import run_migrations
+from config.settings import config
+from schemas.budget import BudgetCreate
+from schemas.chat import ChatMessage
+from schemas.expense import ExpenseCreate
+from services import aggregates, spending_patterns
+from services.categorizer import categorizer
+from services.expense_crud import create_expense
+from services.expense_export import stream_export
+from services.expense_import import import_expenses, read_csv_rows
+from utils.dependencies import DEFAULT_USER_ID, provision_user
+
+POSTGRES_IMAGE = "postgres:16-alpine"
+IMPORT_CSV = "amount,description,category,date\n12.50,Uber ride,,2024-03-02\n40,Groceries,Food,2024-03-05\n9.99,Netflix,,\n"
+# Two this month (no date), two in March 2024
+SEED = [
+    ExpenseCreate(amount=4.5, description="Starbucks coffee", category="Food"),
+    ExpenseCreate(amount=12.5, description="Uber ride", category="Transportation", date=datetime(2024, 3, 2)),
+    ExpenseCreate(amount=40, description="Groceries", category="Food", date=datetime(2024, 3, 5)),
+    ExpenseCreate(amount=9.99, description="Netflix", category="Entertainment"),
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    engine = create_engine(url)
+    try:
+        while True:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+                return
+            except Exception:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.5)
+    finally:
+        engine.dispose()
+
+
+@contextmanager
+def pg_ctl_cluster() -> Iterator[str]:
+    workdir = tempfile.mkdtemp(prefix="pg_cluster_")
+    data, port = os.path.join(workdir, "data"), free_port()
+    subprocess.run(["initdb", "-D", data, "-U", "postgres", "--auth=trust", "-E", "UTF8"],
+                   check=True, stdout=subprocess.DEVNULL)
+    # fsync off: the cluster is thrown away afterwards
+    subprocess.run(["pg_ctl", "-D", data, "-l", os.path.join(workdir, "log"), "-w", "start",
+                    "-o", f"-p {port} -k {workdir} -c listen_addresses='' -F"],
+                   check=True, stdout=subprocess.DEVNULL)
+    try:
+        yield f"postgresql+psycopg2://postgres@/postgres?host={workdir}&port={port}"
+    finally:
+        subprocess.run(["pg_ctl", "-D", data, "-m", "immediate", "stop"], stdout=subprocess.DEVNULL)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+@contextmanager
+def docker_postgres() -> Iterator[str]:
+    port = free_port()
+    container = subprocess.run(
+        ["docker", "run", "-d", "--rm", "-p", f"127.0.0.1:{port}:5432",
+         "-e", "POSTGRES_HOST_AUTH_METHOD=trust", POSTGRES_IMAGE, "-c", "fsync=off"],
+        check=True, capture_output=True, text=True,
+    ).stdout.strip()
+    try:
+        url = f"postgresql+psycopg2://postgres@127.0.0.1:{port}/postgres"
+        wait_for(url)
+        yield url
+    finally:
+        subprocess.run(["docker", "stop", container], stdout=subprocess.DEVNULL)
+
+
+@contextmanager
+def postgres_server(url: Optional[str] = None) -> Iterator[str]:
+    if url:
+        yield url
+    elif shutil.which("pg_ctl") and shutil.which("initdb"):
+        with pg_ctl_cluster() as cluster_url:
+            yield cluster_url
+    elif shutil.which("docker"):
+        with docker_postgres() as container_url:
+            yield container_url
+    else:
+        pytest.skip("No Postgres available: pass --postgres-url or install pg_ctl or docker")
+
+
+@contextmanager
+def database_url(backend: str, tmp_path_factory, postgres_url: Optional[str]) -> Iterator[str]:
+    if backend == "sqlite":
+        yield f"sqlite:///{tmp_path_factory.mktemp('backends') / 'checks.db'}"
+    else:
+        with postgres_server(postgres_url) as url:
+            yield url
+
+
+@pytest.fixture(scope="module", params=["sqlite", "postgresql"])
+def engines(request, tmp_path_factory):
+    """(reader, writer) for one backend, shared by the module's tests."""
+    with database_url(request.param, tmp_path_factory, request.config.getoption("--postgres-url")) as url:
+        reader, writer = create_engines(url, config["SQLITE_PROFILE"])
+        try:
+            yield reader, writer
+        finally:
+            Base.metadata.drop_all(writer)
+            reader.dispose()
+            writer.dispose()
+
+
+@pytest.fixture
+def db(engines, monkeypatch):
+    reader, writer = engines
+    Base.metadata.drop_all(writer)
+    run_migrations(writer)
+    categorizer.forget(DEFAULT_USER_ID)
+    spending_patterns.forget(DEFAULT_USER_ID)
+    # Categorize inline rather than through whichever job runner an earlier app left
+    monkeypatch.setattr(jobs, "job_runner", None)
+    SessionLocal = sessionmaker(class_=session_class(reader, writer), bind=reader, autoflush=False)
+    with SessionLocal() as session:
+        provision_user(session, DEFAULT_USER_ID)
+        yield session
+    categorizer.forget(DEFAULT_USER_ID)
+    spending_patterns.forget(DEFAULT_USER_ID)
+
+
+@pytest.fixture
+def seeded(db):
+    for expense in SEED:
+        create_expense(db, expense, DEFAULT_USER_ID)
+    return db
+
+
+def list_expenses(db, **filters):
+    params = dict(limit=50, cursor=None, start=None, end=None, category=None, min_amount=None, max_amount=None)
+    params.update(filters)
+    response = Response()
+    page = route_expenses.list_expenses(response, db=db, user_id=DEFAULT_USER_ID, **params)
+    return page, response.headers.get("X-Next-Cursor")
+
+
+def test_create_expense(db):
+    created = route_expenses.add_expense(ExpenseCreate(amount=4.5, description="Starbucks coffee"), db, DEFAULT_USER_ID)
+    assert created.id is not None
+    assert created.category == "Food"
+
+
+def test_import(db):
+    result = import_expenses(db, read_csv_rows(io.BytesIO(IMPORT_CSV.encode())), DEFAULT_USER_ID, None)
+    assert (result.imported, result.errors) == (3, [])
+    assert sorted(e.amount for e in list_expenses(db)[0]) == [9.99, 12.5, 40.0]
+
+
+def test_keyset_pages(seeded):
+    seen, cursor = [], None
+    while True:
+        page, cursor = list_expenses(seeded, limit=2, cursor=cursor)
+        seen += [(expense.date, expense.id) for expense in page]
+        if not cursor:
+            break
+    assert len(seen) == 4 and len(set(seen)) == 4
+    assert seen == sorted(seen, reverse=True)
+
+
+def test_filters(seeded):
+    page, _ = list_expenses(seeded, category="Food", min_amount=5.0)
+    assert [e.amount for e in page] == [40.0]
+
+
+def test_budgets(db):
+    route_budgets.create_budget(BudgetCreate(category="Food", amount=300, month="2024-03"), db, DEFAULT_USER_ID)
+    assert [(b.category, b.amount) for b in route_budgets.get_budgets(db, DEFAULT_USER_ID)] == [("Food", 300)]
+
+
+def test_budget_status(seeded):
+    route_budgets.create_budget(BudgetCreate(category="Food", amount=100, month="2024-03"), seeded, DEFAULT_USER_ID)
+    [status] = route_budgets.get_budget_status("2024-03", seeded, DEFAULT_USER_ID)
+    assert (status["spent"], status["remaining"]) == (40.0, 60.0)
+
+
+def test_dashboard(seeded):
+    result = routes_dashboard.get_dashboard(seeded, DEFAULT_USER_ID)
+    assert result["transaction_count"] == 2
+    assert result["total_spent"] == 14.49
+
+
+def test_analytics(seeded):
+    weeks = routes_analytics.get_analytics(
+        "week", datetime(2024, 2, 28), datetime(2024, 3, 11), None, seeded, DEFAULT_USER_ID
+    )
+    assert weeks["periods"] == ["2024-02-26", "2024-03-04"]
+    assert weeks["total"] == [12.5, 40.0]
+    months = routes_analytics.get_analytics("month", datetime(2024, 3, 1), None, "Food", seeded, DEFAULT_USER_ID)
+    assert months["total"][0] == 40.0
+
+
+def test_chat(seeded):
+    reply = routes_chat.chat_with_ai(ChatMessage(message="How am I doing?"), seeded, DEFAULT_USER_ID)
+    assert reply.response
+
+
+def test_export(seeded, monkeypatch):
+    # One row per fetch, so a Postgres named cursor is read over several round trips
+    monkeypatch.setitem(config, "EXPORT_CHUNK_ROWS", 1)
+    march = b"".join(stream_export(
+        DEFAULT_USER_ID, "csv", datetime(2024, 3, 1, tzinfo=timezone.utc), datetime(2024, 4, 1),
+        engine=seeded.get_bind(),
+    )).decode().splitlines()
+    assert [line.split(",")[2] for line in march[1:]] == ["12.5", "40.0"]
+    food = b"".join(stream_export(DEFAULT_USER_ID, "ndjson", category="Food", engine=seeded.get_bind()))
+    assert len(food.splitlines()) == 2
+
+
+def test_insights(seeded, monkeypatch):
+    monkeypatch.setitem(config, "PATTERNS_CHUNK_ROWS", 1)
+    assert spending_patterns.get_spending_patterns(seeded, DEFAULT_USER_ID)["expenses_analyzed"] == 4
+
+
+def test_aggregates_match_expenses(seeded):
+    import_expenses(seeded, read_csv_rows(io.BytesIO(IMPORT_CSV.encode())), DEFAULT_USER_ID, None)
+    assert aggregates.verify(seeded) == []
@@ -0,0 +1,123 @@
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from config.migrations import run_migrations
+from config.settings import config
+from models.expense import Expense
+from models.user import User
+from services.categorizer import (
+    Categorizer, categorize_expense, categorize_many, categorizer, ensure_history_loaded, normalize_category,
+)
+
+USER_ID = 1
+
+
+class FakeModel:
+    def __init__(self, text="Bills", error=None):
+        self.text = text
+        self.error = error
+        self.prompts = []
+
+    def generate_content(self, prompt, user_id=None):
+        self.prompts.append(prompt)
+        if self.error:
+            raise self.error
+        return SimpleNamespace(text=self.text)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'categorizer.db'}")
+    run_migrations(engine)
+    with Session(engine) as session:
+        session.add(User(id=USER_ID, username="test"))
+        session.commit()
+        yield session
+    engine.dispose()
+    categorizer.forget(USER_ID)
+
+
+def add(db, description, category, times=1):
+    db.add_all(Expense(amount=5, description=description, category=category, user_id=USER_ID) for _ in range(times))
+    db.commit()
+
+
+def test_merchants_win_over_keywords():
+    result = Categorizer().categorize("Uber Eats dinner")
+    assert (result.category, result.source) == ("Food", "merchant")
+    assert Categorizer().categorize("uber to airport").category == "Transportation"
+
+
+def test_keywords_and_unknown_descriptions():
+    result = Categorizer().categorize("monthly rent")
+    assert (result.category, result.source) == ("Bills", "keyword")
+    assert Categorizer().categorize("zzz").source == "default"
+    assert Categorizer().categorize("").category == "Other"
+
+
+def test_normalize_category():
+    assert normalize_category(" **food.** ") == "Food"
+    assert normalize_category("It's Shopping") == "Shopping"
+    assert normalize_category("no idea") is None
+
+
+def test_history_loads_grouped_counts(db):
+    add(db, "Yoga class", "Entertainment", times=4)
+    add(db, "Yoga class", "Bills")
+    add(db, "Mystery", "Other", times=3)
+    statements = []
+    event.listen(db.bind, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    ensure_history_loaded(db, USER_ID)
+
+    assert len(statements) == 1 and "GROUP BY" in statements[0]
+    history = categorizer._users[USER_ID]
+    assert history.exact == {"yoga class": {"Entertainment": 4, "Bills": 1}}
+    result = categorizer.categorize("yoga class", USER_ID)
+    assert (result.category, result.source) == ("Entertainment", "history")
+
+
+def test_learn_only_updates_loaded_users():
+    local = Categorizer()
+    local.learn(USER_ID, "Pottery", "Shopping")
+    assert not local.is_loaded(USER_ID)
+
+    local.load_history(USER_ID, [("pottery", "Entertainment", 1)])
+    local.learn(USER_ID, "Pottery", "Entertainment")
+    local.learn(USER_ID, "Pottery", "Other")
+    assert local._users[USER_ID].exact["pottery"] == {"Entertainment": 2}
+
+
+def test_histories_are_evicted_least_recently_used(monkeypatch):
+    monkeypatch.setitem(config, "CATEGORIZER_CACHE_USERS", 2)
+    local = Categorizer()
+    local.load_history(1, [])
+    local.load_history(2, [])
+    local.categorize("coffee", 1)
+    local.load_history(3, [])
+    assert [local.is_loaded(user_id) for user_id in (1, 2, 3)] == [True, False, True]
+
+
+def test_llm_is_only_asked_below_the_threshold(db):
+    model = FakeModel("Bills")
+    assert categorize_expense(db, "Starbucks", 5, USER_ID, model).source == "merchant"
+    assert model.prompts == []
+
+    result = categorize_expense(db, "zzz", 5, USER_ID, model)
+    assert (result.category, result.source) == ("Bills", "llm")
+    assert len(model.prompts) == 1
+
+
+def test_llm_errors_fall_back_to_the_local_answer(db):
+    result = categorize_expense(db, "zzz", 5, USER_ID, FakeModel(error=TimeoutError()))
+    assert (result.category, result.source) == ("Other", "default")
+
+
+def test_categorize_many_asks_once_for_the_unsure_items(db):
+    model = FakeModel("1. Bills\n2. banana\n")
+    results = categorize_many(db, [("zzz", 1), ("Netflix", 2), ("qqq", 3)], USER_ID, model)
+    assert [(r.category, r.source) for r in results] == [
+        ("Bills", "llm"), ("Entertainment", "merchant"), ("Other", "default"),
+    ]
+    assert len(model.prompts) == 1
@@ -0,0 +1,84 @@
+import base64
+import json
+from datetime import datetime
+import pytest
+from models.expense import Expense
+from services.expense_crud import decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def february_budget(client):
+    client.post("/budgets", json={"category": "Food", "amount": 100, "month": "2024-02"})
+
+
+def spent_in(client, month: str) -> float:
+    statuses = client.get("/budgets/status", params={"month": month}).json()
+    return sum(status["spent"] for status in statuses)
+
+
+@pytest.mark.parametrize("async_mode", [False, True])
+def test_offset_dates_are_stored_as_utc(make_client, async_mode):
+    client = make_client(ASYNC_MODE=async_mode)
+    client.post("/budgets", json={"category": "Food", "amount": 100, "month": "2024-02"})
+    created = client.post("/expenses", json={
+        "amount": 12.5, "description": "Late dinner", "category": "Food", "date": "2024-01-31T23:30:00-05:00",
+    }).json()
+    assert created["date"] == "2024-02-01T04:30:00"
+    assert spent_in(client, "2024-02") == 12.5
+    assert spent_in(client, "2024-01") == 0
+
+
+def test_import_stores_offset_dates_as_utc(client, february_budget):
+    rows = [
+        {"amount": 12.5, "description": "Late dinner", "category": "Food", "date": "2024-01-31T23:30:00-05:00"},
+        {"amount": 7.5, "description": "Breakfast", "category": "Food", "date": "2024-02-01T08:00:00Z"},
+    ]
+    body = "".join(json.dumps(row) + "\n" for row in rows)
+    result = client.post("/expenses/import", files={"file": ("expenses.ndjson", body, "application/x-ndjson")}).json()
+    assert result["imported"] == 2
+    assert [e["date"] for e in client.get("/expenses").json()] == ["2024-02-01T08:00:00", "2024-02-01T04:30:00"]
+    assert spent_in(client, "2024-02") == 20
+
+
+def test_naive_dates_are_taken_as_utc(client):
+    created = client.post("/expenses", json={
+        "amount": 3, "description": "Coffee", "category": "Food", "date": "2024-01-31T23:30:00",
+    }).json()
+    assert created["date"] == "2024-01-31T23:30:00"
+
+
+def encode_text(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode()).decode()
+
+
+def test_cursor_round_trips():
+    expense = Expense(id=42, date=datetime(2024, 3, 1, 12, 30, 15, 500))
+    cursor = encode_cursor(expense)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (datetime(2024, 3, 1, 12, 30, 15, 500), 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "!!!", "bm90IGpzb24", encode_text("[1]"), encode_text("null"), encode_text('["soon", 1]')])
+def test_bad_cursors_raise_value_error(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+
+def test_pages_cover_every_expense_once(client):
+    # Equal dates are ordered by id, so a page boundary between them loses nothing
+    for n in range(7):
+        client.post("/expenses", json={
+            "amount": n + 1, "description": f"Item {n}", "category": "Food", "date": f"2024-03-0{1 + n // 3}T09:00:00",
+        })
+    seen, cursor = [], None
+    while True:
+        response = client.get("/expenses", params={"limit": 2, **({"cursor": cursor} if cursor else {})})
+        seen += [expense["amount"] for expense in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == [7, 6, 5, 4, 3, 2, 1]
+
+
+def test_invalid_cursor_is_a_bad_request(client):
+    assert client.get("/expenses", params={"cursor": "!!!"}).status_code == 400
@@ -0,0 +1,170 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from app import state
+from app.guard import CircuitBreaker, CircuitOpenError, GuardedModel, LLMRateLimitedError
+from config.settings import config
+
+
+class LLMBusyError(RuntimeError):
+    """Named like the concurrency limiter's error, which the breaker ignores."""
+
+
+class FakeModel:
+    model_name = "fake"
+
+    def __init__(self, error=None, release=None):
+        self.error = error
+        self.release = release
+        self.calls = 0
+        self.timeouts = []
+
+    def generate_content(self, contents, timeout=None, **kwargs):
+        self.calls += 1
+        self.timeouts.append(timeout)
+        if self.release is not None:
+            self.release.wait(5)
+        if self.error:
+            raise self.error
+        return SimpleNamespace(text=f"answer to {contents}")
+
+    async def generate_content_async(self, contents, timeout=None, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.error:
+            raise self.error
+        return SimpleNamespace(text=f"answer to {contents}")
+
+    def stream_content(self, contents, timeout=None, **kwargs):
+        self.calls += 1
+        yield "partial"
+        if self.error:
+            raise self.error
+
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch):
+    monkeypatch.setattr(state, "shared_state", state.MemoryState())
+    monkeypatch.setitem(config, "LLM_USER_RATE_PER_MINUTE", 0)
+    monkeypatch.setitem(config, "LLM_GLOBAL_RATE_PER_MINUTE", 0)
+
+
+def guarded(model, failures=2, reset=60.0):
+    return GuardedModel(model, CircuitBreaker(failures, reset), timeout=7)
+
+
+def test_breaker_opens_after_consecutive_failures():
+    model = FakeModel(error=TimeoutError("slow"))
+    guard = guarded(model)
+    for _ in range(2):
+        with pytest.raises(TimeoutError):
+            guard.generate_content("hi")
+    with pytest.raises(CircuitOpenError):
+        guard.generate_content("hi")
+    assert model.calls == 2
+    stats = guard.stats()
+    assert stats["breaker"]["state"] == "open"
+    assert stats["timeouts"] == 2
+    assert stats["rejected"]["circuit_open"] == 1
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(2, 60)
+    breaker.record_failure(ValueError())
+    breaker.record_success()
+    breaker.record_failure(ValueError())
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker(1, 0)
+    breaker.record_failure(ValueError())
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_failure(ValueError())
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 2
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_local_back_pressure_does_not_open_the_breaker():
+    guard = guarded(FakeModel(error=LLMBusyError()), failures=1)
+    for _ in range(3):
+        with pytest.raises(LLMBusyError):
+            guard.generate_content("hi")
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_stream_failures_count_against_the_breaker():
+    guard = guarded(FakeModel(error=ConnectionError()), failures=1)
+    with pytest.raises(ConnectionError):
+        list(guard.stream_content("hi"))
+    assert guard.breaker.state == CircuitBreaker.OPEN
+
+
+def test_calls_carry_the_deadline():
+    model = FakeModel()
+    guarded(model).generate_content("hi")
+    assert model.timeouts == [7]
+
+
+def test_identical_prompts_in_flight_are_coalesced():
+    release = threading.Event()
+    model = FakeModel(release=release)
+    guard = guarded(model)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(guard.generate_content("same").text)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while guard.counts["coalesced"] < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["answer to same"] * 4
+    assert model.calls == 1
+
+
+def test_async_identical_prompts_are_coalesced():
+    model = FakeModel()
+    guard = guarded(model)
+
+    async def ask():
+        return await asyncio.gather(*(guard.generate_content_async("same") for _ in range(3)))
+
+    assert [r.text for r in asyncio.run(ask())] == ["answer to same"] * 3
+    assert model.calls == 1
+    assert guard.counts["coalesced"] == 2
+
+
+def test_user_bucket_limits_each_user(monkeypatch):
+    monkeypatch.setitem(config, "LLM_USER_RATE_PER_MINUTE", 1)
+    monkeypatch.setitem(config, "LLM_USER_RATE_BURST", 2)
+    model = FakeModel()
+    guard = guarded(model)
+    guard.generate_content("a", user_id=1)
+    guard.generate_content("b", user_id=1)
+    with pytest.raises(LLMRateLimitedError) as rejected:
+        guard.generate_content("c", user_id=1)
+    assert rejected.value.scope == "user"
+    assert rejected.value.retry_after > 0
+    guard.generate_content("c", user_id=2)
+    assert model.calls == 3
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_global_bucket_covers_calls_without_a_user(monkeypatch):
+    monkeypatch.setitem(config, "LLM_GLOBAL_RATE_PER_MINUTE", 1)
+    monkeypatch.setitem(config, "LLM_GLOBAL_RATE_BURST", 1)
+    guard = guarded(FakeModel())
+    guard.generate_content("a")
+    with pytest.raises(LLMRateLimitedError) as rejected:
+        guard.generate_content("b", user_id=1)
+    assert rejected.value.scope == "global"
+    assert guard.stats()["rejected"]["rate_limited_global"] == 1
@@ -0,0 +1,117 @@
+import time
+import pytest
+from app.jobs import Job, JobRunner, MemoryJobQueue, SQLiteJobQueue
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def queue(request, tmp_path):
+    if request.param == "memory":
+        return MemoryJobQueue()
+    return SQLiteJobQueue(str(tmp_path / "jobs.db"))
+
+
+def make_runner(queue, **options):
+    settings = dict(workers=1, batch_size=10, linger=0, max_attempts=3, retry_base=0, retry_max=0)
+    return JobRunner(queue, **{**settings, **options})
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_take_returns_ready_jobs_in_batches(queue):
+    for n in range(5):
+        queue.put(Job("echo", {"n": n}))
+    first = queue.take(3, timeout=1, linger=0)
+    second = queue.take(3, timeout=1, linger=0)
+    assert [job.payload["n"] for job in first + second] == [0, 1, 2, 3, 4]
+    assert queue.take(3, timeout=0.05, linger=0) == []
+
+
+def test_delayed_jobs_wait_their_turn(queue):
+    queue.put(Job("echo", {"n": 1}), delay=60)
+    assert queue.take(10, timeout=0.05, linger=0) == []
+    assert len(queue) == 1
+
+
+def test_completed_jobs_leave_the_queue(queue):
+    queue.put(Job("echo", {}))
+    queue.complete(queue.take(1, timeout=1, linger=0))
+    assert len(queue) == 0
+
+
+def test_sqlite_leases_of_dead_workers_expire(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    SQLiteJobQueue(path, lease=0.05).put(Job("echo", {"n": 1}))
+    assert len(SQLiteJobQueue(path, lease=0.05).take(1, timeout=1, linger=0)) == 1
+    # A second worker process sees nothing while the lease holds, then takes it over
+    other = SQLiteJobQueue(path, lease=0.05)
+    assert other.take(1, timeout=0, linger=0) == []
+    time.sleep(0.1)
+    assert [job.payload for job in other.take(1, timeout=1, linger=0)] == [{"n": 1}]
+
+
+def test_failed_batches_are_retried_then_given_up(queue):
+    calls, given_up = [], []
+
+    def handler(payloads):
+        calls.append(payloads)
+        raise ConnectionError("provider down")
+
+    runner = make_runner(queue)
+    runner.register("flaky", handler, give_up=given_up.extend)
+    runner.submit("flaky", {"n": 1})
+    for _ in range(3):
+        runner.run_batch(queue.take(10, timeout=1, linger=0))
+
+    assert len(calls) == 3
+    assert given_up == [{"n": 1}]
+    assert len(queue) == 0
+    stats = runner.stats()
+    assert (stats["retried"], stats["gave_up"], stats["completed"]) == (2, 1, 0)
+    assert stats["recent_errors"][-1]["error"] == "ConnectionError: provider down"
+
+
+def test_batches_are_split_by_kind(queue):
+    seen = {}
+    runner = make_runner(queue)
+    runner.register("a", lambda payloads: seen.setdefault("a", payloads))
+    runner.register("b", lambda payloads: seen.setdefault("b", payloads))
+    for kind, n in [("a", 1), ("b", 2), ("a", 3)]:
+        runner.submit(kind, {"n": n})
+    runner.run_batch(queue.take(10, timeout=1, linger=0))
+    assert seen == {"a": [{"n": 1}, {"n": 3}], "b": [{"n": 2}]}
+    assert runner.stats()["batches"] == 2
+
+
+def test_backoff_doubles_up_to_the_cap():
+    runner = make_runner(MemoryJobQueue(), retry_base=1, retry_max=5)
+    assert [runner.backoff(n) for n in range(1, 6)] == [1, 2, 4, 5, 5]
+
+
+def test_workers_drain_the_queue(queue):
+    done = []
+    runner = make_runner(queue, workers=2, batch_size=4)
+    runner.register("echo", done.extend)
+    runner.start()
+    try:
+        for n in range(10):
+            runner.submit("echo", {"n": n})
+        wait_until(lambda: len(done) == 10)
+    finally:
+        runner.stop()
+    assert sorted(p["n"] for p in done) == list(range(10))
+    assert runner.stats()["workers_alive"] == 0
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_uncertain_expenses_are_categorized_in_the_background(make_client, tmp_path, backend):
+    client = make_client(JOB_QUEUE_BACKEND=backend, JOB_QUEUE_PATH=str(tmp_path / "jobs.db"), JOB_BATCH_WAIT_MS=0)
+    # The categorizer's learned histories outlive an app, so each run uses its own description
+    created = client.post("/expenses", json={"amount": 4, "description": f"Zorblax {backend}"}).json()
+    assert created["category"] == "Pending"
+    wait_until(lambda: client.get("/expenses").json()[0]["category"] != "Pending")
+    assert client.get("/health/jobs").json()["completed"] == 1
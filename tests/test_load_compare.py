@@ -0,0 +1,34 @@
+from bench.load import compare
+
+META = {"duration_s": 5, "concurrency": 8, "users": 10, "llm_latency_ms": 200, "seed_version": 3}
+
+
+def report(routes: dict, **meta) -> dict:
+    stats = {route: {"p95_ms": p95, "throughput_rps": rps} for route, (p95, rps) in routes.items()}
+    return {"meta": {**META, **meta}, "results": {"1k": {**stats, "_server": {"peak_rss_mb": 100}}}}
+
+
+def test_within_tolerance_passes():
+    baseline = report({"GET /dashboard": (40, 300)})
+    assert compare(report({"GET /dashboard": (45, 280)}), baseline, 0.25) == []
+
+
+def test_slower_routes_are_regressions():
+    baseline = report({"GET /dashboard": (40, 300)})
+    assert compare(report({"GET /dashboard": (60, 200)}), baseline, 0.25) == [
+        "[1k] GET /dashboard: p95 40 -> 60 ms",
+        "[1k] GET /dashboard: throughput 300 -> 200 rps",
+    ]
+
+
+def test_routes_without_a_baseline_are_reported():
+    baseline = report({"GET /dashboard": (40, 300)})
+    current = report({"GET /dashboard": (40, 300), "GET /insights": (10, 900)})
+    assert compare(current, baseline, 0.25) == ["[1k] GET /insights: no baseline"]
+
+
+def test_baselines_from_other_settings_or_seed_data_are_reported():
+    baseline = report({"GET /dashboard": (40, 300)}, seed_version=2)
+    assert compare(report({"GET /dashboard": (40, 300)}), baseline, 0.25) == [
+        "seed_version is 3 but the baseline was taken with 2",
+    ]
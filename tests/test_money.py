@@ -0,0 +1,40 @@
+from decimal import Decimal
+import pytest
+from utils.money import MAX_AMOUNT, from_cents, to_cents
+
+
+@pytest.mark.parametrize("amount, cents", [
+    (0.1 + 0.2, 30),
+    (19.99, 1999),
+    ("0.005", 1),
+    (-0.005, -1),
+    (Decimal("2.675"), 268),
+    (12, 1200),
+    (MAX_AMOUNT - 0.01, MAX_AMOUNT * 100 - 1),
+])
+def test_to_cents_rounds_half_up(amount, cents):
+    assert to_cents(amount) == cents
+
+
+@pytest.mark.parametrize("amount", [float("nan"), float("inf"), "-Infinity", MAX_AMOUNT, -MAX_AMOUNT, "12,50", None])
+def test_to_cents_rejects_bad_amounts(amount):
+    with pytest.raises(ValueError):
+        to_cents(amount)
+
+
+def test_from_cents():
+    assert from_cents(1999) == 19.99
+    assert from_cents(None) is None
+    assert sum(from_cents(to_cents(0.1)) for _ in range(3)) == pytest.approx(0.3)
+
+
+def test_sums_are_exact_in_cents(client):
+    for _ in range(10):
+        client.post("/expenses", json={"amount": 0.1, "description": "Gum", "category": "Food"})
+    assert client.get("/dashboard").json()["total_spent"] == 1.0
+
+
+@pytest.mark.parametrize("amount", [MAX_AMOUNT, 1e308])
+def test_routes_reject_amounts_out_of_range(client, amount):
+    assert client.post("/expenses", json={"amount": amount, "description": "Yacht", "category": "Other"}).status_code == 422
+    assert client.post("/budgets", json={"category": "Food", "amount": amount, "month": "2024-02"}).status_code == 422
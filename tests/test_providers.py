@@ -0,0 +1,173 @@
+"""GeminiProvider against the real google-generativeai GenerativeModel.
+
+Only the transport is faked: requests are still built by the SDK, so a
+keyword it does not accept fails here as it would against the API.
+"""
+import asyncio
+import time
+import google.ai.generativelanguage as glm
+import google.generativeai as genai
+import pytest
+from app import ai
+from app.providers import AIHealth, GeminiProvider
+from config.settings import config
+
+
+def reply(text: str):
+    return glm.GenerateContentResponse(candidates=[{
+        "content": {"parts": [{"text": text}], "role": "model"}, "finish_reason": 1, "index": 0,
+    }])
+
+
+class FakeClient:
+    def __init__(self, words=("Save", " more"), delay=0.0, chunk_delay=0.0, error=None):
+        self.words = words
+        self.delay = delay
+        self.chunk_delay = chunk_delay
+        self.error = error
+        self.requests = []
+
+    def generate_content(self, request):
+        self.requests.append(request)
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return reply("".join(self.words))
+
+    def stream_generate_content(self, request):
+        self.requests.append(request)
+        time.sleep(self.delay)
+
+        def chunks():
+            for word in self.words:
+                time.sleep(self.chunk_delay)
+                yield reply(word)
+        return chunks()
+
+
+class FakeAsyncClient(FakeClient):
+    async def generate_content(self, request):
+        self.requests.append(request)
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return reply("".join(self.words))
+
+    async def stream_generate_content(self, request):
+        self.requests.append(request)
+        await asyncio.sleep(self.delay)
+
+        async def chunks():
+            for word in self.words:
+                await asyncio.sleep(self.chunk_delay)
+                yield reply(word)
+        return chunks()
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    """Returns make(**client_options) -> (provider, sync client, async client)."""
+    monkeypatch.setattr(genai, "configure", lambda **kwargs: None)
+
+    def make(**options):
+        client, async_client = FakeClient(**options), FakeAsyncClient(**options)
+
+        class FakeTransportModel(genai.GenerativeModel):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self._client = client
+                self._async_client = async_client
+
+        monkeypatch.setattr(genai, "GenerativeModel", FakeTransportModel)
+        return GeminiProvider("test-key", AIHealth(["gemini-pro"])), client, async_client
+    return make
+
+
+def test_generate_content_with_timeout(gemini):
+    provider, client, _ = gemini()
+    assert provider.generate_content("Where can I save?", timeout=5).text == "Save more"
+    assert client.requests[0].model == "models/gemini-pro"
+
+
+def test_stream_with_timeout(gemini):
+    provider, _, _ = gemini()
+    chunks = provider.generate_content("Where can I save?", stream=True, timeout=5)
+    assert "".join(chunk.text for chunk in chunks) == "Save more"
+
+
+def test_slow_call_times_out(gemini):
+    provider, _, _ = gemini(delay=1)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        provider.generate_content("Where can I save?", timeout=0.1)
+    assert time.monotonic() - started < 0.5
+
+
+def test_stream_deadline_covers_the_whole_reply(gemini):
+    provider, _, _ = gemini(words=("a", "b", "c", "d"), chunk_delay=0.1)
+    chunks = provider.generate_content("Where can I save?", stream=True, timeout=0.25)
+    with pytest.raises(TimeoutError):
+        list(chunks)
+
+
+def test_sdk_deadline_becomes_timeout_error(gemini):
+    class DeadlineExceeded(Exception):
+        pass
+    provider, _, _ = gemini(error=DeadlineExceeded("deadline"))
+    with pytest.raises(TimeoutError):
+        provider.generate_content("Where can I save?", timeout=5)
+
+
+def test_other_errors_pass_through(gemini):
+    provider, _, _ = gemini(error=ValueError("bad request"))
+    with pytest.raises(ValueError):
+        provider.generate_content("Where can I save?", timeout=5)
+
+
+def test_generate_content_async(gemini):
+    provider, _, async_client = gemini()
+    response = asyncio.run(provider.generate_content_async("Where can I save?", timeout=5))
+    assert response.text == "Save more"
+    assert async_client.requests[0].model == "models/gemini-pro"
+
+
+def test_stream_async(gemini):
+    provider, _, _ = gemini()
+
+    async def collect():
+        chunks = await provider.generate_content_async("Where can I save?", stream=True, timeout=5)
+        return "".join([chunk.text async for chunk in chunks])
+    assert asyncio.run(collect()) == "Save more"
+
+
+def test_slow_async_call_times_out(gemini):
+    provider, _, _ = gemini(delay=1)
+    with pytest.raises(TimeoutError):
+        asyncio.run(provider.generate_content_async("Where can I save?", timeout=0.1))
+
+
+def test_slow_async_stream_times_out(gemini):
+    provider, _, _ = gemini(words=("a", "b", "c", "d"), chunk_delay=0.1)
+
+    async def collect():
+        chunks = await provider.generate_content_async("Where can I save?", stream=True, timeout=0.25)
+        return [chunk async for chunk in chunks]
+    with pytest.raises(TimeoutError):
+        asyncio.run(collect())
+
+
+def test_guarded_chain_reaches_gemini(gemini, monkeypatch):
+    # The chat and categorizer path: cache -> guard (passes its timeout) -> provider
+    _, client, _ = gemini()
+    for name in ("llm_cache", "provider", "guard", "model"):
+        monkeypatch.setattr(ai, name, getattr(ai, name))
+    monkeypatch.setitem(config, "LLM_PROVIDER", "gemini")
+    monkeypatch.setitem(config, "GOOGLE_AI_API_KEY", "test-key")
+    monkeypatch.setitem(config, "GEMINI_MODELS", ["gemini-pro"])
+    monkeypatch.setitem(config, "LLM_CACHE_BACKEND", "none")
+    ai.init_ai()
+    for _ in range(config["LLM_BREAKER_FAILURES"] + 1):
+        assert ai.model.generate_content("Where can I save?", user_id=1).text == "Save more"
+    assert "".join(ai.model.stream_content("Any tips?", user_id=1)) == "Save more"
+    assert ai.guard.breaker.state == ai.guard.breaker.CLOSED
+    assert len(client.requests) == config["LLM_BREAKER_FAILURES"] + 2
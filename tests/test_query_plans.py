@@ -0,0 +1,188 @@
+"""EXPLAIN QUERY PLAN checks for the SQL each route actually runs.
+
+Each scenario calls a route handler against a scratch SQLite database while
+recording the SELECTs it issues, then asks SQLite how it would execute them.
+A full table scan or a temp B-tree sort on a hot path fails the scenario.
+"""
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterable, List, Tuple
+import pytest
+from fastapi import Response
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import Session
+from api import route_budgets, route_expenses, routes_analytics, routes_chat, routes_dashboard, routes_insights
+from config.migrations import run_migrations
+from models.budget import Budget
+from models.expense import Expense
+from models.user import User
+from schemas.chat import ChatMessage
+from schemas.expense import ExpenseCreate
+from services import spending_patterns
+from services.categorizer import categorizer
+from services.expense_crud import get_user_expenses
+from services.expense_export import export_query
+from utils.dependencies import DEFAULT_USER_ID
+
+# "SCAN expenses" is a full table scan and "SCAN expenses USING INDEX ..." an
+# unbounded index walk; both grow with the table and must not reach a route.
+FULL_SCAN_RE = re.compile(r"^SCAN (\w+)")
+TEMP_SORT_RE = re.compile(r"USE TEMP B-TREE FOR (ORDER|GROUP) BY")
+
+# Plan steps a scenario needs by design. Analytics groups by a computed day or
+# week, which no index can order; the sort only sees one user's rows in range.
+ACCEPTED_STEPS = {
+    "GET /analytics?bucket=day": {"USE TEMP B-TREE FOR GROUP BY"},
+    "GET /analytics?bucket=week&category": {"USE TEMP B-TREE FOR GROUP BY"},
+}
+
+
+@contextmanager
+def capture_selects(engine):
+    statements: List[Tuple[str, tuple]] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def explain(engine, statement: str, parameters) -> List[str]:
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        return [row[3] for row in cursor.fetchall()]
+    finally:
+        raw.close()
+
+
+def plan_problems(plan: List[str], accepted: Iterable[str] = ()) -> List[str]:
+    return [
+        step for step in plan
+        if (FULL_SCAN_RE.match(step) or TEMP_SORT_RE.search(step)) and step not in accepted
+    ]
+
+
+def seed(db: Session, users: int = 20):
+    # Enough users and rows that ANALYZE statistics resemble production
+    db.execute(insert(User), [
+        {"id": DEFAULT_USER_ID + n, "username": f"user_{n}"} for n in range(users)
+    ])
+    now = datetime.utcnow()
+    db.execute(insert(Expense), [
+        {
+            "amount_cents": (10 + i % 50) * 100,
+            "description": f"expense {i}",
+            "category": ["Food", "Bills", "Shopping"][i % 3],
+            "date": now - timedelta(days=i % 400),
+            "user_id": DEFAULT_USER_ID + i % users,
+        }
+        for i in range(200 * users)
+    ])
+    db.execute(insert(Budget), [
+        {"category": category, "amount_cents": 30000, "month": f"2024-{m:02d}", "user_id": DEFAULT_USER_ID + n}
+        for n in range(users)
+        for m in range(1, 13)
+        for category in ("Food", "Bills", "Shopping", "Transportation", "Entertainment")
+    ])
+    db.commit()
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('query_plans') / 'plans.db'}")
+    run_migrations(engine)
+    with Session(engine) as db:
+        seed(db)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    yield engine
+    engine.dispose()
+    categorizer.forget(DEFAULT_USER_ID)
+    spending_patterns.forget(DEFAULT_USER_ID)
+
+
+def list_expenses(db, **filters):
+    params = dict(limit=50, cursor=None, start=None, end=None, category=None, min_amount=None, max_amount=None)
+    params.update(filters)
+    return route_expenses.list_expenses(Response(), db=db, user_id=DEFAULT_USER_ID, **params)
+
+
+def second_page(db):
+    _, cursor = get_user_expenses(db, DEFAULT_USER_ID, limit=50)
+    return list_expenses(db, cursor=cursor, category="Food", min_amount=5.0)
+
+
+def create_expense(db):
+    categorizer.forget(DEFAULT_USER_ID)
+    return route_expenses.add_expense(ExpenseCreate(amount=4.5, description="corner cafe"), db, DEFAULT_USER_ID)
+
+
+def insights(db):
+    # Start from an empty history so the full read is what gets checked
+    spending_patterns.forget(DEFAULT_USER_ID)
+    return routes_insights.get_insights(db, DEFAULT_USER_ID)
+
+
+def chat(db):
+    # Chat only reads computed patterns; compute them on this database first
+    # so the prompt has them and no background refresh goes to the app's database
+    spending_patterns.get_spending_patterns(db, DEFAULT_USER_ID)
+    return routes_chat.chat_with_ai(ChatMessage(message="How am I doing?"), db, DEFAULT_USER_ID)
+
+
+SCENARIOS = [
+    ("GET /expenses", list_expenses),
+    ("GET /expenses?start&end", lambda db: list_expenses(
+        db, start=datetime.utcnow() - timedelta(days=90), end=datetime.utcnow()
+    )),
+    ("GET /expenses?cursor&category&min_amount", second_page),
+    ("POST /expenses", create_expense),
+    # The route streams this query on its own connection; run the same statement here
+    ("GET /expenses/export", lambda db: db.execute(export_query(DEFAULT_USER_ID)).all()),
+    ("GET /expenses/export?start&category", lambda db: db.execute(export_query(
+        DEFAULT_USER_ID, start=datetime.utcnow() - timedelta(days=90), category="Food"
+    )).all()),
+    ("GET /budgets", lambda db: route_budgets.get_budgets(db, DEFAULT_USER_ID)),
+    ("GET /budgets/status?month", lambda db: route_budgets.get_budget_status("2024-03", db, DEFAULT_USER_ID)),
+    ("GET /budgets/alerts", lambda db: route_budgets.get_budget_alerts_route(80, "2024-03", db, DEFAULT_USER_ID)),
+    ("GET /dashboard", lambda db: routes_dashboard.get_dashboard(db, DEFAULT_USER_ID)),
+    ("GET /analytics?bucket=day", lambda db: routes_analytics.get_analytics(
+        "day", datetime.utcnow() - timedelta(days=90), None, None, db, DEFAULT_USER_ID
+    )),
+    ("GET /analytics?bucket=week&category", lambda db: routes_analytics.get_analytics(
+        "week", None, None, "Food", db, DEFAULT_USER_ID
+    )),
+    ("GET /analytics?bucket=month", lambda db: routes_analytics.get_analytics(
+        "month", None, None, None, db, DEFAULT_USER_ID
+    )),
+    ("GET /insights", insights),
+    ("POST /chat", chat),
+]
+
+
+@pytest.mark.parametrize("name, scenario", SCENARIOS, ids=[name for name, _ in SCENARIOS])
+def test_route_queries_use_indexes(engine, name, scenario):
+    with Session(engine) as db, capture_selects(engine) as statements:
+        scenario(db)
+    assert statements, "the scenario ran no SELECT"
+    failures = []
+    for statement, parameters in statements:
+        plan = explain(engine, statement, parameters)
+        if plan_problems(plan, ACCEPTED_STEPS.get(name, ())):
+            failures.append(f"{' '.join(statement.split())}\n    plan: {' | '.join(plan)}")
+    assert not failures, "queries scan or sort without an index:\n" + "\n".join(failures)
+
+
+def test_plan_problems_flags_scans_and_temp_sorts():
+    assert plan_problems(["SCAN expenses"]) == ["SCAN expenses"]
+    assert plan_problems(["SEARCH expenses USING INDEX ix_expenses_user_date (user_id=?)"]) == []
+    assert plan_problems(["USE TEMP B-TREE FOR ORDER BY"]) == ["USE TEMP B-TREE FOR ORDER BY"]
+    assert plan_problems(["USE TEMP B-TREE FOR GROUP BY"], {"USE TEMP B-TREE FOR GROUP BY"}) == []
@@ -0,0 +1,46 @@
+import pytest
+
+FRONTEND = "https://finance-mentor-frontend.vercel.app"
+
+
+@pytest.mark.parametrize("origin", ["http://localhost:3000", FRONTEND])
+def test_cors_preflight_from_the_frontends(client, origin):
+    response = client.options("/expenses", headers={
+        "Origin": origin, "Access-Control-Request-Method": "POST", "Access-Control-Request-Headers": "content-type",
+    })
+    assert response.status_code == 200
+    assert response.headers["access-control-allow-origin"] == origin
+
+
+def test_cors_rejects_other_origins(client):
+    response = client.options("/expenses", headers={"Origin": "https://example.com", "Access-Control-Request-Method": "POST"})
+    assert response.status_code == 400
+
+
+def test_cors_origins_setting(make_client):
+    client = make_client(CORS_ORIGINS=["https://example.com"])
+    response = client.options("/expenses", headers={"Origin": "https://example.com", "Access-Control-Request-Method": "POST"})
+    assert response.headers["access-control-allow-origin"] == "https://example.com"
+
+
+@pytest.mark.parametrize("async_mode", [False, True])
+@pytest.mark.parametrize("method, path, body", [
+    ("POST", "/expenses", {"amount": 12.5, "description": "Lunch", "category": "Food"}),
+    ("GET", "/expenses", None),
+    ("POST", "/budgets", {"category": "Food", "amount": 100, "month": "2026-10"}),
+    ("GET", "/budgets", None),
+    ("POST", "/chat", {"message": "Where can I save?"}),
+    ("GET", "/dashboard", None),
+    ("GET", "/analytics", None),
+    ("GET", "/insights", None),
+])
+def test_collections_answer_with_and_without_slash(make_client, async_mode, method, path, body):
+    client = make_client(ASYNC_MODE=async_mode)
+    for url in (path, path + "/"):
+        response = client.request(method, url, json=body, follow_redirects=False)
+        assert response.status_code == 200, (url, response.text)
+
+
+def test_schema_lists_the_slash_form_only(client):
+    paths = client.app.openapi()["paths"]
+    assert "/expenses/" in paths and "/expenses" not in paths
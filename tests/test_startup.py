@@ -0,0 +1,41 @@
+"""Cold start of a worker: `import app.main`, create_app() and the startup hooks.
+
+Each measurement is a fresh interpreter (see bench/startup.py, which also
+breaks the import time down by package).
+"""
+import statistics
+import subprocess
+import sys
+import pytest
+from bench.startup import MAX_IMPORT_MS, MAX_STARTUP_MS, ROOT, child_env, measure
+
+RUNS = 3
+
+
+@pytest.fixture(scope="module")
+def runs():
+    return measure(RUNS)
+
+
+def test_import_and_factory_have_no_side_effects(runs):
+    assert [r["side_effects"] for r in runs] == [[]] * RUNS
+
+
+def test_import_time(runs):
+    assert statistics.median(r["import_ms"] for r in runs) <= MAX_IMPORT_MS
+
+
+def test_create_app_and_startup_time(runs):
+    assert statistics.median(r["create_ms"] + r["startup_ms"] for r in runs) <= MAX_STARTUP_MS
+
+
+def test_factory_leaves_the_gemini_sdk_unloaded(tmp_path):
+    # With a key configured, the SDK is imported by the background probe or the first call, not by create_app()
+    env = {**child_env(str(tmp_path), 0), "LLM_PROVIDER": "gemini", "GOOGLE_AI_API_KEY": "test-key"}
+    probe = (
+        "import sys, app.main\n"
+        "app.main.create_app()\n"
+        "print('google.generativeai' in sys.modules)\n"
+    )
+    out = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.strip().splitlines()[-1] == "False"
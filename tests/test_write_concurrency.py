@@ -0,0 +1,98 @@
+"""The production SQLite profile under concurrent writers and readers.
+
+Writers run the POST /expenses transaction (expense row plus monthly rollup
+upsert) and POST /budgets while readers run the dashboard queries. Every
+transaction must commit: no "database is locked", no lost rows, and the
+rollups must still match the expenses. Throughput against the default
+profile is measured by `python -m bench.write_concurrency`.
+"""
+import random
+import threading
+import pytest
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import sessionmaker
+from config.database import create_engines, session_class
+from config.migrations import run_migrations
+from models.budget import Budget
+from models.expense import Expense
+from models.user import User
+from services import aggregates
+from bench.write_concurrency import USERS, read_dashboard, write_budget, write_expense
+
+WRITERS = 8
+READERS = 4
+TRANSACTIONS_PER_WRITER = 40
+
+
+@pytest.fixture
+def engines(tmp_path):
+    reader, writer = create_engines(f"sqlite:///{tmp_path / 'writes.db'}", "production")
+    run_migrations(writer)
+    with writer.begin() as conn:
+        conn.execute(insert(User), [{"id": uid, "username": f"user_{uid}"} for uid in range(1, USERS + 1)])
+    yield reader, writer
+    reader.dispose()
+    writer.dispose()
+
+
+@pytest.fixture
+def Session(engines):
+    reader, writer = engines
+    return sessionmaker(class_=session_class(reader, writer), bind=reader, autoflush=False)
+
+
+def test_concurrent_writes_all_commit(Session):
+    errors, writers_done = [], threading.Event()
+
+    def write(seed: int):
+        rng = random.Random(seed)
+        for n in range(TRANSACTIONS_PER_WRITER):
+            with Session() as db:
+                try:
+                    (write_budget if n % 4 == 3 else write_expense)(db, rng)
+                except Exception as e:
+                    errors.append(e)
+
+    def read(seed: int):
+        rng = random.Random(seed)
+        while not writers_done.is_set():
+            with Session() as db:
+                try:
+                    read_dashboard(db, rng)
+                except Exception as e:
+                    errors.append(e)
+
+    writers = [threading.Thread(target=write, args=(n,)) for n in range(WRITERS)]
+    readers = [threading.Thread(target=read, args=(1000 + n,)) for n in range(READERS)]
+    for thread in writers + readers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    writers_done.set()
+    for thread in readers:
+        thread.join()
+
+    assert errors == []
+    budgets_per_writer = TRANSACTIONS_PER_WRITER // 4
+    with Session() as db:
+        assert db.scalar(select(func.count()).select_from(Expense)) == WRITERS * (TRANSACTIONS_PER_WRITER - budgets_per_writer)
+        assert db.scalar(select(func.count()).select_from(Budget)) == WRITERS * budgets_per_writer
+        assert aggregates.verify(db) == []
+
+
+def test_reads_use_the_reader_until_the_transaction_writes(engines, Session):
+    reader, writer = engines
+    with Session() as db:
+        assert db.get_bind() is reader
+        db.add(Budget(category="Food", amount=10.0, month="2030-01", user_id=1))
+        db.flush()
+        # Later reads in this transaction must see its own uncommitted row
+        assert db.get_bind() is writer
+        assert db.scalar(select(func.count()).select_from(Budget)) == 1
+        db.commit()
+        assert db.get_bind() is reader
+
+
+def test_writer_is_a_single_connection(engines):
+    _, writer = engines
+    assert writer.pool.size() == 1 and writer.pool._max_overflow == 0
@@ -0,0 +1,13 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """A datetime as stored in the database: UTC without tzinfo.
+
+    Request bodies and query parameters may carry an offset ("...Z",
+    "+02:00"); naive values are taken to be UTC already.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
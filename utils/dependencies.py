@@ -1,6 +1,15 @@
-from fastapi import Depends, HTTPException
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from fastapi import Depends, Header, HTTPException
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from config.database import SessionLocal
+from config.database import SessionLocal, AsyncSessionLocal
+from config.settings import config
+from app import state
 from models.user import User
 
 # DB session dependency
@@ -11,21 +20,126 @@ def get_db():
     finally:
         db.close()
 
-# Simple MVP user session
-current_user_id = 1
+# Async DB session dependency (ASYNC_MODE only)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Requests act as the MVP demo user unless TRUST_USER_HEADER lets X-User-Id choose
+DEFAULT_USER_ID = 1
+
+
+class UserCache:
+    """User ids known to exist, so resolving a user costs no query on a hit."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._expires = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, user_id: int) -> bool:
+        with self._lock:
+            expires = self._expires.get(user_id)
+            if expires is not None and expires < time.monotonic():
+                del self._expires[user_id]
+                expires = None
+            if expires is None:
+                self.misses += 1
+                return False
+            self._expires.move_to_end(user_id)
+            self.hits += 1
+            return True
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+    def add(self, user_id: int):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._expires[user_id] = time.monotonic() + self.ttl
+            self._expires.move_to_end(user_id)
+            while len(self._expires) > self.max_entries:
+                self._expires.popitem(last=False)
+
+    def invalidate(self, user_id: Optional[int] = None):
+        """Forget one user (e.g. after deleting it) or, with no id, everyone."""
+        with self._lock:
+            if user_id is None:
+                self._expires.clear()
+            else:
+                self._expires.pop(user_id, None)
+
+
+# Replaced by init_user_cache() in create_app(); read it as dependencies.user_cache
+user_cache = UserCache(config["USER_CACHE_TTL"], config["USER_CACHE_MAX_ENTRIES"])
+
+
+def init_user_cache():
+    global user_cache
+    user_cache = UserCache(config["USER_CACHE_TTL"], config["USER_CACHE_MAX_ENTRIES"])
+    return user_cache
 
-def ensure_default_user(db: Session):
+
+def provision_user(db: Session, user_id: int) -> User:
+    """The user with this id, created on first use."""
+    user = db.get(User, user_id)
+    if user:
+        return user
     try:
-        user = db.query(User).filter(User.id == current_user_id).first()
-        if not user:
-            user = User(id=current_user_id, username="demo_user")
-            db.add(user)
-            db.commit()
+        user = User(id=user_id, username="demo_user" if user_id == DEFAULT_USER_ID else f"user_{user_id}")
+        db.add(user)
+        db.commit()
         return user
-    except Exception as e:
-        print(f"Database error: {e}")
+    except IntegrityError:
+        # Another request created it first
         db.rollback()
-        user = db.query(User).filter(User.id == current_user_id).first()
-        if user:
-            return user
-        raise HTTPException(status_code=500, detail="Database initialization failed")
+        return db.get(User, user_id)
+
+
+def resolve_user_id(db: Session, user_id: int) -> int:
+    if user_id in user_cache:
+        return user_id
+    if user_id == DEFAULT_USER_ID:
+        provision_user(db, user_id)
+    elif db.get(User, user_id) is None:
+        raise HTTPException(status_code=404, detail="Unknown user; call POST /user/init first")
+    user_cache.add(user_id)
+    return user_id
+
+
+def requested_user_id(x_user_id: Optional[int] = Header(None, ge=1)) -> int:
+    # The header is unauthenticated: honoured only when a trusted proxy sets it
+    if not config["TRUST_USER_HEADER"]:
+        return DEFAULT_USER_ID
+    return x_user_id or DEFAULT_USER_ID
+
+
+def chat_rate_limit(user_id: int = Depends(requested_user_id)):
+    """Per-user limit on chat requests (CHAT_RATE_PER_MINUTE), enforced across all workers."""
+    if config["CHAT_RATE_PER_MINUTE"] <= 0:
+        return
+    wait = state.shared_state.take(f"chat:{user_id}", config["CHAT_RATE_PER_MINUTE"] / 60, config["CHAT_RATE_BURST"])
+    if wait:
+        raise HTTPException(
+            status_code=429, detail="Too many chat requests; try again later",
+            headers={"Retry-After": str(math.ceil(wait))}
+        )
+
+
+# Resolved once per request; on a cache hit the session never touches the database
+def get_current_user_id(
+    user_id: int = Depends(requested_user_id), db: Session = Depends(get_db)
+) -> int:
+    return resolve_user_id(db, user_id)
+
+
+async def get_current_user_id_async(
+    user_id: int = Depends(requested_user_id), db: AsyncSession = Depends(get_async_db)
+) -> int:
+    if user_id in user_cache:
+        return user_id
+    return await db.run_sync(resolve_user_id, user_id)
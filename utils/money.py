@@ -0,0 +1,26 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Optional
+
+CENT = Decimal("0.01")
+# Largest amount accepted, in dollars (exclusive). Far above any real expense,
+# and its cents, summed over millions of rows, still fit a BIGINT.
+MAX_AMOUNT = 10 ** 12
+
+
+def to_cents(amount) -> int:
+    """Dollars (float, str or Decimal) to integer cents, rounding half up.
+
+    Goes through str() so 0.1 + 0.2 style float noise never reaches storage.
+    Raises ValueError for amounts that are not finite or not below MAX_AMOUNT.
+    """
+    try:
+        value = Decimal(str(amount))
+        if not value.is_finite() or abs(value) >= MAX_AMOUNT:
+            raise ValueError(f"amount must be a finite number between -{MAX_AMOUNT} and {MAX_AMOUNT}")
+        return int(value.quantize(CENT, rounding=ROUND_HALF_UP) * 100)
+    except InvalidOperation:
+        raise ValueError(f"invalid amount: {amount!r}")
+
+
+def from_cents(cents: Optional[int]) -> Optional[float]:
+    return None if cents is None else cents / 100